@@ -7,6 +7,7 @@ from sqlalchemy import func
 from src.auth import get_current_user, require_role
 from src.db import get_session, User
 from src.cache import get_cache, set_cache
+from src.cache_keys import ADMIN_USERS_LIST, ADMIN_USER, ADMIN_METRICS
 from src import cache
 from src.controller import get_metrics
 from src.metrics import admin_user_operations_total
@@ -44,7 +45,7 @@ def require_admin(credentials: HTTPAuthorizationCredentials = Security(require_r
 
 
 @admin_router.get("/users", response_model=UsersListResponse)
-async def list_users(
+def list_users(
     page: int = 1,
     page_size: int = 10,
     current_user: dict = Security(require_role("admin"))
@@ -64,11 +65,11 @@ async def list_users(
     if page_size < 1 or page_size > 100:
         page_size = 10
 
-    cache_key = f"admin:users:list:{page}:{page_size}"
+    cache_key = ADMIN_USERS_LIST.key(page, page_size)
 
     # Try to get from cache
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
+        cached_result = get_cache(cache_key, entity_type=ADMIN_USERS_LIST.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
@@ -109,7 +110,7 @@ async def list_users(
 
         # Cache the response for 5 minutes
         try:
-            set_cache(cache_key, response.model_dump(), entity_type="api", ttl=300)
+            set_cache(cache_key, response.model_dump(), entity_type=ADMIN_USERS_LIST.entity_type, ttl=300)
         except Exception:
             pass
 
@@ -122,7 +123,7 @@ async def list_users(
 
 
 @admin_router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: int,
     current_user: dict = Security(require_role("admin"))
 ):
@@ -134,11 +135,11 @@ async def get_user(
 
     Requires: Bearer token with admin role in Authorization header
     """
-    cache_key = f"admin:user:{user_id}"
+    cache_key = ADMIN_USER.key(user_id)
 
     # Try to get from cache
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
+        cached_result = get_cache(cache_key, entity_type=ADMIN_USER.entity_type)
         if cached_result is not None:
             return UserResponse(**cached_result)
     except Exception:
@@ -165,7 +166,7 @@ async def get_user(
 
         # Cache the response for 5 minutes
         try:
-            set_cache(cache_key, response.model_dump(), entity_type="api", ttl=300)
+            set_cache(cache_key, response.model_dump(), entity_type=ADMIN_USER.entity_type, ttl=300)
         except Exception:
             pass
 
@@ -180,7 +181,7 @@ async def get_user(
 
 
 @admin_router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     request: UpdateUserRequest,
     current_user: dict = Security(require_role("admin"))
@@ -226,15 +227,12 @@ async def update_user(
         session.refresh(user)
 
         # Invalidate cache for this user
-        cache_key = f"admin:user:{user_id}"
         try:
             # Clear specific user cache
             if cache._redis_client:
-                cache._redis_client.delete(f"api:{cache_key}")
+                cache.delete_many([ADMIN_USER.key(user_id)], entity_type=ADMIN_USER.entity_type)
                 # Also invalidate the users list cache
-                pattern = "api:admin:users:list:*"
-                for key in cache._redis_client.scan_iter(match=pattern):
-                    cache._redis_client.delete(key)
+                cache.delete_matching(ADMIN_USERS_LIST.pattern(), entity_type=ADMIN_USERS_LIST.entity_type)
         except Exception:
             pass
 
@@ -259,7 +257,7 @@ async def update_user(
 
 
 @admin_router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     current_user: dict = Security(require_role("admin"))
 ):
@@ -292,12 +290,9 @@ async def delete_user(
         try:
             if cache._redis_client:
                 # Clear specific user cache
-                cache_key = f"api:admin:user:{user_id}"
-                cache._redis_client.delete(cache_key)
+                cache.delete_many([ADMIN_USER.key(user_id)], entity_type=ADMIN_USER.entity_type)
                 # Also invalidate the users list cache
-                pattern = "api:admin:users:list:*"
-                for key in cache._redis_client.scan_iter(match=pattern):
-                    cache._redis_client.delete(key)
+                cache.delete_matching(ADMIN_USERS_LIST.pattern(), entity_type=ADMIN_USERS_LIST.entity_type)
         except Exception:
             pass
 
@@ -320,7 +315,7 @@ async def delete_user(
 
 
 @admin_router.get("/metrics")
-async def get_admin_metrics(
+def get_admin_metrics(
     current_user: dict = Security(require_role("admin"))
 ):
     """
@@ -332,11 +327,11 @@ async def get_admin_metrics(
 
     Requires: Bearer token with admin role in Authorization header
     """
-    cache_key = "admin:metrics"
+    cache_key = ADMIN_METRICS.key()
 
     # Try to get from cache
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
+        cached_result = get_cache(cache_key, entity_type=ADMIN_METRICS.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
@@ -371,7 +366,7 @@ async def get_admin_metrics(
 
         # Cache the response for 5 minutes
         try:
-            set_cache(cache_key, response, entity_type="api", ttl=300)
+            set_cache(cache_key, response, entity_type=ADMIN_METRICS.entity_type, ttl=300)
         except Exception:
             pass
 
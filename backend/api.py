@@ -1,18 +1,30 @@
 from fastapi import APIRouter, HTTPException, Security, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from datetime import date
 from pydantic import BaseModel, EmailStr, Field
 from uuid import uuid4
-
-from src.controller import search_companies, get_company_by_id, get_search_suggestions, get_metrics, get_company_network, search_companies_amount, get_available_cities
-from src.cache import get_cache, set_cache
+import asyncio
+import json
+import os
+import time
+
+from src.controller import search_companies_async, get_company_by_id, get_company_by_id_async, get_cached_company_async, get_company_names, get_search_suggestions, get_metrics, get_company_network_async, search_companies_amount, get_available_cities_async, search_persons, iter_companies_by_ids, get_company_financial_history
+from src.cache import get_cache, set_cache, get_cache_async, set_cache_async, get_or_compute, get_or_compute_async, get_computed_async, is_not_found, refresh_in_background
+from src.cache_keys import COMPANY, SEARCH, SEARCH_SUGGESTIONS, PERSON_SEARCH, CITIES, METRICS, TRENDING, NETWORK
 from src import cache
+from src.singleflight import coalesce_async
 from src.auth import hash_password, verify_password, create_jwt_token, get_current_user, require_any_role
 from src.db import get_session, User
 from src.pdf_generator import create_company_pdf
 from src.metrics import (
     company_searches_total,
     company_detail_views_total,
+    company_batch_requests_total,
+    company_batch_size,
+    person_searches_total,
     search_suggestions_total,
     network_graph_requests_total,
     pdf_exports_total,
@@ -29,27 +41,32 @@ from src.metrics import (
 
 api_router = APIRouter(prefix="/api/v1")
 
+# Maximum number of companies per batch lookup
+COMPANY_BATCH_MAX = int(os.getenv("BIZRAY_COMPANY_BATCH_MAX", "100"))
+# Trending companies looked up per batch when building recommendations
+RECOMMENDATIONS_BATCH = 20
+
 
 # Helper function for visit tracking
-def _track_company_visit(company_id: str) -> None:
+async def _track_company_visit(company_id: str) -> None:
     """
     Track a company visit in Redis for recommendation system
     Uses sorted set to maintain visit counts with 24-hour expiration
     """
-    if cache._redis_client is None:
-        print("Redis client is not initialized")
+    if not cache.redis_available():
+        # Visits are not counted while Redis is unreachable
         return
 
     try:
-        import time
         current_timestamp = int(time.time())
 
-        # Increment visit count in sorted set
-        cache._redis_client.zincrby("visits:trending", 1, company_id)
+        async with cache.pipeline_async("track_visit") as pipe:
+            # Increment visit count in sorted set
+            pipe.zincrby("visits:trending", 1, company_id)
 
-        # Store last access timestamp with 24-hour TTL
-        visit_key = f"visits:ts:{company_id}"
-        cache._redis_client.setex(visit_key, 86400, current_timestamp)
+            # Store last access timestamp with 24-hour TTL
+            visit_key = f"visits:ts:{company_id}"
+            pipe.setex(visit_key, 86400, current_timestamp)
 
         # Track metric
         visit_tracking_total.inc()
@@ -85,6 +102,10 @@ class ChangeUsernameRequest(BaseModel):
     username: str = Field(..., min_length=3, max_length=128)
 
 
+class CompanyBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=COMPANY_BATCH_MAX)
+
+
 @api_router.get("/")
 async def root():
     return {"message": "Welcome to BizRay API"}
@@ -95,7 +116,7 @@ async def health_check():
 
 
 @api_router.post("/auth/register", response_model=AuthResponse)
-async def register(request: RegisterRequest):
+def register(request: RegisterRequest):
     """
     Register a new user
     Parameters:
@@ -159,7 +180,7 @@ async def register(request: RegisterRequest):
 
 
 @api_router.post("/auth/login", response_model=AuthResponse)
-async def login(request: LoginRequest):
+def login(request: LoginRequest):
     """
     Login a user
     Parameters:
@@ -210,7 +231,7 @@ async def login(request: LoginRequest):
 
 
 @api_router.get("/auth/me")
-async def get_me(current_user: dict = Security(get_current_user)):
+def get_me(current_user: dict = Security(get_current_user)):
     """
     Get current user information from JWT token
     Requires: Bearer token in Authorization header
@@ -239,7 +260,7 @@ async def get_me(current_user: dict = Security(get_current_user)):
 
 
 @api_router.put("/auth/password")
-async def change_password(
+def change_password(
     request: ChangePasswordRequest,
     current_user: dict = Security(get_current_user)
 ):
@@ -293,7 +314,7 @@ async def change_password(
 
 
 @api_router.put("/auth/username")
-async def change_username(
+def change_username(
     request: ChangeUsernameRequest,
     current_user: dict = Security(get_current_user)
 ):
@@ -335,7 +356,7 @@ async def change_username(
 
 
 @api_router.delete("/auth/profile")
-async def delete_profile(current_user: dict = Security(get_current_user)):
+def delete_profile(current_user: dict = Security(get_current_user)):
     """
     Delete own user profile
     Requires: Bearer token in Authorization header
@@ -372,7 +393,7 @@ async def delete_profile(current_user: dict = Security(get_current_user)):
 
 
 @api_router.post("/auth/subscription/toggle", response_model=AuthResponse)
-async def toggle_subscription(current_user: dict = Security(get_current_user)):
+def toggle_subscription(current_user: dict = Security(get_current_user)):
     """
     Toggle subscription status between registered and subscriber roles
     Users can only change their own role
@@ -457,12 +478,11 @@ async def get_companies(
     if l < 1 or l > 100:
         l = 10
 
-    # Create cache key with sorted cities for consistency
-    cities_key = ":".join(sorted(city)) if city else None
-    cache_key = f"search:{q}:{p}:{l}:{cities_key}"
+    # The search is case-insensitive, the city filter is not (the key sorts the cities)
+    cache_key = SEARCH.key(q.lower(), p, l, city)
 
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
+        cached_result = await get_cache_async(cache_key, entity_type=SEARCH.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
@@ -472,8 +492,11 @@ async def get_companies(
         # Track company search metric
         company_searches_total.labels(has_city_filter=str(city is not None)).inc()
 
-        total_companies = search_companies_amount(q, city)
-        companies = search_companies(q, p, l, city)
+        # The count runs in the thread pool while the page is loaded with the async engine
+        total_companies, companies = await asyncio.gather(
+            run_in_threadpool(search_companies_amount, q, city),
+            search_companies_async(q, p, l, city),
+        )
         if isinstance(companies, dict):
             results = companies.get("results") or companies.get("companies") or []
         elif isinstance(companies, list):
@@ -484,7 +507,7 @@ async def get_companies(
         response = {"companies": results, "total": total_companies}
 
         try:
-            set_cache(cache_key, response, entity_type="api", ttl=3600)
+            await set_cache_async(cache_key, response, entity_type=SEARCH.entity_type, ttl=3600)
         except Exception:
             pass
 
@@ -498,38 +521,103 @@ async def get_company(company_id: str):
     Get a specific company by ID
     Parameters:
     - company_id: firmenbuchnummer
+
+    Company views are cached by the controller with a soft and a hard expiry: after
+    BIZRAY_COMPANY_SOFT_TTL the cached view is still returned and refreshed in the background;
+    only after BIZRAY_COMPANY_HARD_TTL does a request wait for the database. Unknown IDs are
+    cached as not found for BIZRAY_COMPANY_NOT_FOUND_TTL.
     """
-    cache_key = f"company:{company_id}"
+    cache_key = COMPANY.key(company_id)
 
-    _track_company_visit(company_id)
+    # Track visit for recommendation system
+    await _track_company_visit(company_id)
 
+    unknown = False
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
-        if cached_result is not None:
-            # Track visit for recommendation system
-            return cached_result
+        cached_company, stale = await get_cached_company_async(company_id)
+        unknown = is_not_found(cached_company)
+        if cached_company is not None and not unknown:
+            if stale:
+                # get_company_by_id writes the refreshed view itself
+                await run_in_threadpool(
+                    refresh_in_background,
+                    cache_key,
+                    lambda: get_company_by_id(company_id, refresh=True),
+                    entity_type=COMPANY.entity_type,
+                    store=False,
+                )
+            return {"company": cached_company}
     except Exception:
         pass
+    if unknown:
+        raise HTTPException(status_code=404, detail="Company not found")
+
+    async def _compute():
+        company = await get_company_by_id_async(company_id, refresh=True)
+        return {"company": company} if company else None
+
+    async def _lookup():
+        company, _ = await get_cached_company_async(company_id)
+        if company is None:
+            return None
+        # The leader found the company, or cached it as unknown
+        return {"company": None if is_not_found(company) else company}
 
     try:
-        company = get_company_by_id(company_id)
-        if not company:
+        # Concurrent misses for the same company share one computation
+        response = await coalesce_async(cache_key, _compute, cache_lookup=_lookup, operation="company")
+        if response is None or response["company"] is None:
             raise HTTPException(status_code=404, detail="Company not found")
 
         # Track company detail view metric
         company_detail_views_total.inc()
 
-        response = {"company": company}
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/company/batch")
+def get_company_batch(request: CompanyBatchRequest):
+    """
+    Get several companies by ID in one request
+    Body:
+    - ids: List[str] - firmenbuchnummern (1 to BIZRAY_COMPANY_BATCH_MAX, default 100)
+
+    Streams newline-delimited JSON, one line per company in completion order:
+    {"firmenbuchnummer": "...", "company": {...}} or {"firmenbuchnummer": "...", "error": "Company not found"}
+    """
+    company_batch_requests_total.inc()
+    company_batch_size.observe(len(request.ids))
 
+    def _stream():
         try:
-            set_cache(cache_key, response, entity_type="api", ttl=7200)
-        except Exception:
-            pass
+            for company_id, company in iter_companies_by_ids(request.ids):
+                if company is None:
+                    line = {"firmenbuchnummer": company_id, "error": "Company not found"}
+                else:
+                    company_detail_views_total.inc()
+                    line = {"firmenbuchnummer": company_id, "company": company}
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            print(f"Error in batch company lookup: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
 
-        # Track visit for recommendation system
-        _track_company_visit(company_id)
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
 
-        return response
+@api_router.get("/company/{company_id}/history")
+def get_company_history(company_id: str):
+    """
+    Get all filed financial statements of a company, oldest first
+    Parameters:
+    - company_id: firmenbuchnummer
+    """
+    try:
+        history = get_company_financial_history(company_id)
+        if history is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        return history
     except HTTPException:
         raise
     except Exception as e:
@@ -550,10 +638,10 @@ async def get_network_graph(
 
     Requires: Bearer token with subscriber or admin role in Authorization header
     """
-    cache_key = f"network:{company_id}:{hops}"
+    cache_key = NETWORK.key(company_id, hops)
 
     try:
-        cached_result = get_cache(cache_key, entity_type="network")
+        cached_result = await get_cache_async(cache_key, entity_type=NETWORK.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
@@ -563,25 +651,83 @@ async def get_network_graph(
         # Track network graph request metric (premium feature)
         network_graph_requests_total.labels(user_role=current_user.get("role", "unknown")).inc()
 
-        company = get_company_network(company_id)
-        if not company:
+        async def _compute():
+            company = await get_company_network_async(company_id)
+            if not company:
+                return None
+            response = {"company": company}
+            try:
+                await set_cache_async(cache_key, response, entity_type=NETWORK.entity_type, ttl=7200)
+            except Exception:
+                pass
+            return response
+
+        async def _lookup():
+            return await get_cache_async(cache_key, entity_type=NETWORK.entity_type)
+
+        response = await coalesce_async(cache_key, _compute, cache_lookup=_lookup, operation="network")
+        if response is None:
             raise HTTPException(status_code=404, detail="Company not found")
 
-        response = {"company": company}
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/person")
+def get_persons(
+    q: Optional[str] = None,
+    p: Optional[int] = 1,
+    l: Optional[int] = 10,
+    birth_date: Optional[date] = None,
+    fuzzy: Optional[bool] = False
+):
+    """
+    Person (managing director / shareholder) search
+    Parameters:
+    - q: str - name query (required, min 3 characters); every word must prefix-match the first or last name
+    - p: int - page number (default: 1)
+    - l: int - page size (default: 10, max: 100)
+    - birth_date: date - filter by exact birth date, YYYY-MM-DD (optional)
+    - fuzzy: bool - use trigram similarity on the full name instead of prefix matching (default: false)
+    """
+    if q is None:
+        raise HTTPException(status_code=400, detail="Query parameter is required")
+    q = q.strip()
+    if len(q) < 3:
+        raise HTTPException(status_code=400, detail="Query parameter must be at least 3 characters long")
+    if p < 1:
+        p = 1
+    if l < 1 or l > 100:
+        l = 10
+
+    cache_key = PERSON_SEARCH.key(q.lower(), p, l, birth_date, fuzzy)
+
+    try:
+        cached_result = get_cache(cache_key, entity_type=PERSON_SEARCH.entity_type)
+        if cached_result is not None:
+            return cached_result
+    except Exception:
+        pass
+
+    try:
+        # Track person search metric
+        person_searches_total.labels(fuzzy=str(bool(fuzzy))).inc()
+
+        response = search_persons(q, p, l, birth_date=birth_date, fuzzy=bool(fuzzy))
 
         try:
-            set_cache(cache_key, response, entity_type="network", ttl=7200)
+            set_cache(cache_key, response, entity_type=PERSON_SEARCH.entity_type, ttl=3600)
         except Exception:
             pass
 
         return response
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/search")
-async def search_suggestions(q: Optional[str] = None):
+def search_suggestions(q: Optional[str] = None):
     """
     Get search suggestions
     Parameters:
@@ -592,9 +738,9 @@ async def search_suggestions(q: Optional[str] = None):
     if len(q) < 3:
         raise HTTPException(status_code=400, detail="Query parameter must be at least 3 characters long")
     
-    cache_key = f"search_suggestions:{q}"
+    cache_key = SEARCH_SUGGESTIONS.key(q.lower())
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
+        cached_result = get_cache(cache_key, entity_type=SEARCH_SUGGESTIONS.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
@@ -615,7 +761,7 @@ async def search_suggestions(q: Optional[str] = None):
         response = {"suggestions": results}
 
         try:
-            set_cache(cache_key, response, entity_type="api", ttl=3600)
+            set_cache(cache_key, response, entity_type=SEARCH_SUGGESTIONS.entity_type, ttl=3600)
         except Exception:
             pass
 
@@ -633,34 +779,29 @@ async def get_cities(q: Optional[str] = None):
     - q: search query (optional) - when provided, returns only cities from companies matching the query
 
     Returns cities sorted by company count (descending)
+
+    The response is recomputed shortly before it expires by a single request (see
+    cache.get_or_compute); concurrent misses share one computation.
     """
     print(f"Cities endpoint called with q={q}")
-    cache_key = f"api_cities:{q}"
-
-    try:
-        cached_result = get_cache(cache_key, entity_type="api")
-        if cached_result is not None:
-            print(f"Returning cached result for cities (q={q})")
-            return cached_result
-    except Exception as e:
-        print(f"Cache read error in cities endpoint: {e}")
+    cache_key = CITIES.key(q.lower() if q else None)
+    # Cache for different durations based on whether it's query-specific or global
+    ttl = 3600 if q else 86400  # 1 hour for query-specific, 24 hours for all cities
 
-    try:
+    async def _compute():
         print(f"Calling get_available_cities(q={q})")
-        cities = get_available_cities(q)
+        cities = await get_available_cities_async(q)
         print(f"Got {len(cities)} cities from controller")
-        response = {"cities": cities}
+        return {"cities": cities}
 
-        # Cache for different durations based on whether it's query-specific or global
-        ttl = 3600 if q else 86400  # 1 hour for query-specific, 24 hours for all cities
+    async def _lookup():
+        return await get_computed_async(cache_key, entity_type=CITIES.entity_type)
 
-        try:
-            set_cache(cache_key, response, entity_type="api", ttl=ttl)
-            print(f"Cached cities response (q={q}, ttl={ttl})")
-        except Exception as e:
-            print(f"Cache write error in cities endpoint: {e}")
+    async def _coalesced():
+        return await coalesce_async(cache_key, _compute, cache_lookup=_lookup, operation="cities")
 
-        return response
+    try:
+        return await get_or_compute_async(cache_key, _coalesced, ttl=ttl, entity_type=CITIES.entity_type, lease=True)
     except Exception as e:
         print(f"Error in cities endpoint: {e}")
         import traceback
@@ -669,34 +810,67 @@ async def get_cities(q: Optional[str] = None):
 
 
 @api_router.get("/metrics")
-async def get_metrics_endpoint():
+def get_metrics_endpoint():
     """
     Get metrics - counts of each entry type in the database
+    Cached for 12 hours and recomputed shortly before by a single request
     """
-    cache_key = "api_metrics"
-
     try:
-        cached_result = get_cache(cache_key, entity_type="api")
-        if cached_result is not None:
-            return cached_result
-    except Exception:
-        pass
+        return get_or_compute(
+            METRICS.key(), lambda: {"metrics": get_metrics()},
+            ttl=43200, entity_type=METRICS.entity_type, lease=True,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    try:
-        metrics = get_metrics()
-        response = {"metrics": metrics}
+def _compute_recommendations() -> Dict[str, Any]:
+    """Top 5 companies by visits within the last 24 hours, from the visit tracking sorted set."""
+    current_timestamp = int(time.time())
+    cutoff_timestamp = current_timestamp - 86400  # 24 hours ago
 
-        try:
-            set_cache(cache_key, response, entity_type="api", ttl=43200)
-        except Exception:
-            pass
+    # Get all companies from the sorted set (sorted by visit count descending)
+    trending_companies = cache._redis_client.zrevrange("visits:trending", 0, -1, withscores=True)
+    if not trending_companies:
+        return {"recommendations": []}
 
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Last visit timestamps of all trending companies in one round-trip
+    last_visits = cache._redis_client.mget([f"visits:ts:{company_id}" for company_id, _ in trending_companies])
+
+    # Timestamp keys expired, remove from trending set
+    expired = [company_id for (company_id, _), last_visit in zip(trending_companies, last_visits) if last_visit is None]
+    if expired:
+        cache._redis_client.zrem("visits:trending", *expired)
+
+    # Companies visited within the last 24 hours
+    candidates = [
+        (company_id, visit_count)
+        for (company_id, visit_count), last_visit in zip(trending_companies, last_visits)
+        if last_visit is not None and int(last_visit) >= cutoff_timestamp
+    ]
+
+    # Names in batches until there are 5 recommendations (unknown ids are skipped)
+    recommendations = []
+    for start in range(0, len(candidates), RECOMMENDATIONS_BATCH):
+        batch = candidates[start:start + RECOMMENDATIONS_BATCH]
+        try:
+            names = get_company_names([company_id for company_id, _ in batch])
+        except Exception as e:
+            print(f"Error fetching companies for recommendations: {e}")
+            break
+        for company_id, visit_count in batch:
+            if company_id in names and len(recommendations) < 5:
+                recommendations.append({
+                    "company_id": company_id,
+                    "name": names[company_id],
+                    "visit_count": int(visit_count)
+                })
+        if len(recommendations) >= 5:
+            break
+
+    return {"recommendations": recommendations}
 
 @api_router.get("/recommendations")
-async def get_recommendations():
+def get_recommendations():
     """
     Get top 5 most viewed companies in the last 24 hours
     Returns company names, IDs, and visit counts
@@ -704,76 +878,19 @@ async def get_recommendations():
     # Track recommendations request metric
     recommendations_requests_total.inc()
 
-    # Try cache first (5 minute TTL)
-    cache_key = "recommendations:trending"
-    try:
-        cached_result = get_cache(cache_key, entity_type="api")
-        if cached_result is not None:
-            return cached_result
-    except Exception:
-        pass
-
-    if cache._redis_client is None:
+    if not cache.redis_available():
         return {"recommendations": []}
 
     try:
-        import time
-        current_timestamp = int(time.time())
-        cutoff_timestamp = current_timestamp - 86400  # 24 hours ago
-
-        # Get all companies from the sorted set (sorted by visit count descending)
-        trending_companies = cache._redis_client.zrevrange("visits:trending", 0, -1, withscores=True)
-
-        recommendations = []
-        for company_id, visit_count in trending_companies:
-            # Check if this company's last visit is within 24 hours
-            visit_key = f"visits:ts:{company_id}"
-            last_visit_timestamp = cache._redis_client.get(visit_key)
-
-            if last_visit_timestamp is None:
-                # Timestamp key expired, remove from trending set
-                cache._redis_client.zrem("visits:trending", company_id)
-                continue
-
-            last_visit = int(last_visit_timestamp)
-            if last_visit < cutoff_timestamp:
-                # Visit is older than 24 hours, skip
-                continue
-
-            # Get company details
-            try:
-                company_data = get_company_by_id(company_id)
-                if company_data:
-                    recommendations.append({
-                        "company_id": company_id,
-                        "name": company_data.get("name", "Unknown"),
-                        "visit_count": int(visit_count)
-                    })
-
-                    # Stop once we have 5 recommendations
-                    if len(recommendations) >= 5:
-                        break
-            except Exception as e:
-                print(f"Error fetching company {company_id} for recommendations: {e}")
-                continue
-
-        response = {"recommendations": recommendations}
-
-        # Cache recommendations for 5 minutes
-        try:
-            set_cache(cache_key, response, entity_type="api", ttl=300)
-        except Exception:
-            pass
-
-        return response
-
+        # Cached for 5 minutes, recomputed shortly before by a single request
+        return get_or_compute(TRENDING.key(), _compute_recommendations, ttl=300, entity_type=TRENDING.entity_type, lease=True)
     except Exception as e:
         print(f"Error generating recommendations: {e}")
         return {"recommendations": []}
 
 
 @api_router.get("/company/{company_id}/export")
-async def export_company_summary(company_id: str):
+def export_company_summary(company_id: str):
     """
     Fetches all company data and returns a downloadable summary report in PDF format
     """
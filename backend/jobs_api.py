@@ -0,0 +1,145 @@
+from fastapi import APIRouter, HTTPException, Security, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import csv
+import io
+import json
+import os
+
+from src.auth import require_any_role
+from src.jobs import (
+    CSV_COLUMNS,
+    create_screening_job,
+    get_job,
+    iter_job_results,
+    parse_fnr_csv,
+    result_to_csv_row,
+)
+
+jobs_router = APIRouter(prefix="/api/v1/jobs")
+
+# Maximum number of FNRs per screening job
+SCREENING_MAX_FNRS = int(os.getenv("BIZRAY_SCREENING_MAX_FNRS", "50000"))
+
+
+def _get_owned_job(job_id: str, current_user: dict) -> dict:
+    """Load a job and make sure the current user may access it"""
+    try:
+        job = get_job(job_id)
+    except RuntimeError:
+        raise HTTPException(status_code=503, detail="Job queue is not available")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.get("role") != "admin" and job.get("owner_id") != current_user.get("user_id"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@jobs_router.post("/screening", status_code=202)
+async def create_screening(
+    request: Request,
+    current_user: dict = Security(require_any_role("subscriber", "admin"))
+):
+    """
+    Create an asynchronous bulk risk screening job
+
+    Body (either):
+    - text/csv: one firmenbuchnummer per row in the first column (header row optional)
+    - application/json: {"fnrs": ["123456a", ...]}
+
+    Returns the job id. Poll GET /jobs/{job_id} for progress and download the results
+    from GET /jobs/{job_id}/results once the job is completed.
+
+    Requires: Bearer token with subscriber or admin role in Authorization header
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        if "json" in content_type:
+            payload = json.loads(body or b"{}")
+            fnrs = payload.get("fnrs") if isinstance(payload, dict) else None
+            if not isinstance(fnrs, list) or not all(isinstance(f, str) for f in fnrs):
+                raise HTTPException(status_code=400, detail="Body must contain a list of FNRs in 'fnrs'")
+        else:
+            fnrs = parse_fnr_csv(body.decode("utf-8-sig", errors="replace"))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Could not parse request body")
+
+    if not fnrs:
+        raise HTTPException(status_code=400, detail="No FNRs provided")
+    if len(fnrs) > SCREENING_MAX_FNRS:
+        raise HTTPException(status_code=400, detail=f"At most {SCREENING_MAX_FNRS} FNRs per job")
+
+    try:
+        job_id = await run_in_threadpool(create_screening_job, fnrs, owner_id=current_user.get("user_id"))
+    except RuntimeError:
+        raise HTTPException(status_code=503, detail="Job queue is not available")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"job": await run_in_threadpool(get_job, job_id)}
+
+
+@jobs_router.get("/{job_id}")
+def get_screening_job(
+    job_id: str,
+    current_user: dict = Security(require_any_role("subscriber", "admin"))
+):
+    """
+    Get status and progress of a screening job
+
+    Requires: Bearer token with subscriber or admin role in Authorization header
+    """
+    return {"job": _get_owned_job(job_id, current_user)}
+
+
+@jobs_router.get("/{job_id}/results")
+def get_screening_results(
+    job_id: str,
+    format: str = "csv",
+    current_user: dict = Security(require_any_role("subscriber", "admin"))
+):
+    """
+    Download the results of a screening job
+
+    Parameters:
+    - format: 'csv' (default) or 'ndjson'
+
+    Results are streamed in submission order. For a running job only the FNRs
+    processed so far are included.
+
+    Requires: Bearer token with subscriber or admin role in Authorization header
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    _get_owned_job(job_id, current_user)
+
+    if format == "ndjson":
+        def _stream_ndjson():
+            for result in iter_job_results(job_id):
+                yield json.dumps(result) + "\n"
+
+        return StreamingResponse(
+            _stream_ndjson(),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="screening_{job_id}.ndjson"'}
+        )
+
+    def _stream_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        for result in iter_job_results(job_id):
+            writer.writerow(result_to_csv_row(result))
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        _stream_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="screening_{job_id}.csv"'}
+    )
@@ -1,25 +1,36 @@
+import os
 from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 from api import api_router
 from admin_api import admin_router
-from src.cache import init
+from jobs_api import jobs_router
+from src.cache import init, close_async_client
+from src.db import dispose_async_engine
 from src.metrics import redis_connected
 
+# Route handlers are plain functions (blocking DB, Redis, SOAP and bcrypt calls), so FastAPI runs
+# them in this thread pool instead of on the event loop. Keep it in line with the DB pool size.
+THREADPOOL_SIZE = int(os.getenv("BIZRAY_THREADPOOL_SIZE", "60"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
     # Initialize Redis cache
     try:
         init()
-        redis_connected.set(1)
         print("Redis cache initialized successfully")
     except Exception as e:
-        redis_connected.set(0)
-        print(f"Warning: Redis cache initialization failed: {e}. Continuing without cache.")
+        # init() keeps retrying in the background; redis_connected reports when Redis is back
+        print(f"Warning: Redis cache initialization failed: {e}. Using the in-process fallback cache until Redis is reachable.")
     yield
     # Cleanup on shutdown
+    await dispose_async_engine()
+    await close_async_client()
     redis_connected.set(0)
 
 
@@ -58,6 +69,7 @@ instrumentator.instrument(app).expose(app, endpoint="/metrics")
 # Include API routers
 app.include_router(api_router)
 app.include_router(admin_router)
+app.include_router(jobs_router)
 
 if __name__ == "__main__":
     import uvicorn
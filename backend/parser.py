@@ -8,7 +8,7 @@ from datetime import datetime
 from typing import Iterator, List, Dict, Any
 
 from tqdm import tqdm
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, literal_column
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from src.db import (
     get_session,
@@ -19,6 +19,9 @@ from src.db import (
     init_db,
     engine,
 )
+from src import cache
+from src.cache_keys import COMPANY
+from src.api.queries import invalidate_urkunde_listings
 
 ns = {"ns1": "ns://firmenbuch.justiz.gv.at/Abfrage/v2/AuszugResponse"}
 
@@ -255,11 +258,17 @@ def _batch_write(parsed_batch: List[Dict[str, Any]]) -> int:
                 "seat": stmt.excluded.seat,
                 "reference_date": stmt.excluded.reference_date,
             },
-        ).returning(Company.__table__.c.id, Company.__table__.c.firmenbuchnummer)
+        ).returning(
+            Company.__table__.c.id,
+            Company.__table__.c.firmenbuchnummer,
+            # xmax is 0 for rows inserted (not updated) by this statement
+            literal_column("(xmax = 0)").label("inserted"),
+        )
 
         result = conn.execute(upsert)
         id_rows = result.fetchall()
         fnr_to_id = {row.firmenbuchnummer: row.id for row in id_rows}
+        new_fnrs = [row.firmenbuchnummer for row in id_rows if row.inserted]
 
         # Ensure we have IDs for any rows that might have been inserted earlier concurrently
         missing_fnrs = [r["firmenbuchnummer"] for r in companies_rows if r["firmenbuchnummer"] not in fnr_to_id]
@@ -267,9 +276,18 @@ def _batch_write(parsed_batch: List[Dict[str, Any]]) -> int:
             sel = select(Company.__table__.c.id, Company.__table__.c.firmenbuchnummer).where(Company.__table__.c.firmenbuchnummer.in_(missing_fnrs))
             for row in conn.execute(sel):
                 fnr_to_id[row.firmenbuchnummer] = row.id
+            new_fnrs.extend(missing_fnrs)
 
         company_ids = list({fnr_to_id[d["firmenbuchnummer"]] for d in parsed_batch})
 
+        # Remember the known registry entries to detect companies with new filings
+        existing_entries = set()
+        if company_ids:
+            sel = select(RegistryEntry.__table__.c.company_id, RegistryEntry.__table__.c.file_number).where(
+                RegistryEntry.__table__.c.company_id.in_(company_ids)
+            )
+            existing_entries = {(row.company_id, row.file_number) for row in conn.execute(sel)}
+
         # Delete existing children for idempotent reload
         if company_ids:
             conn.execute(delete(Address.__table__).where(Address.__table__.c.company_id.in_(company_ids)))
@@ -281,12 +299,16 @@ def _batch_write(parsed_batch: List[Dict[str, Any]]) -> int:
         partner_rows: List[Dict[str, Any]] = []
         reg_rows: List[Dict[str, Any]] = []
 
+        changed_fnrs: List[str] = []
+
         for d in parsed_batch:
             company_id = fnr_to_id[d["firmenbuchnummer"]]
             ch = _normalize_children_rows(d, company_id)
             addr_rows.extend(ch["addresses"])
             partner_rows.extend(ch["partners"])
             reg_rows.extend(ch["registry_entries"])
+            if any((r["company_id"], r["file_number"]) not in existing_entries for r in ch["registry_entries"]):
+                changed_fnrs.append(d["firmenbuchnummer"])
 
         if addr_rows:
             conn.execute(Address.__table__.insert(), addr_rows)
@@ -294,12 +316,36 @@ def _batch_write(parsed_batch: List[Dict[str, Any]]) -> int:
             conn.execute(Partner.__table__.insert(), partner_rows)
         if reg_rows:
             conn.execute(RegistryEntry.__table__.insert(), reg_rows)
+        if changed_fnrs:
+            # Registry entries feed the compliance indicator: let the risk worker recompute these companies
+            conn.execute(
+                update(Company.__table__)
+                .where(Company.__table__.c.firmenbuchnummer.in_(changed_fnrs))
+                .values(risk_computed_at=None)
+            )
+
+    # New registry entries usually mean new documents: drop the cached SUCHEURKUNDE listings
+    if changed_fnrs and cache._redis_client is not None:
+        invalidate_urkunde_listings(changed_fnrs)
+
+    # New companies may have been looked up before, and cached as not found
+    if new_fnrs and cache._redis_client is not None:
+        try:
+            cache.delete_many([COMPANY.key(fnr) for fnr in new_fnrs], entity_type=COMPANY.entity_type)
+        except Exception as e:
+            print(f"Warning: could not invalidate cached lookups of new companies: {e}")
 
     return len(parsed_batch)
 
 if __name__ == "__main__":
     init_db()
 
+    # Redis is optional here; it is only used to invalidate cached data of changed companies
+    try:
+        cache.init()
+    except Exception as e:
+        print(f"Warning: Redis cache initialization failed: {e}. Cached listings will not be invalidated.")
+
     directory = os.getenv(
         "BIZRAY_XML_DIR",
         '/Users/bencetoth/Downloads/bizrayds/node0/data1/fbp/appl_java/gesamtstand/auszuegeKurz/',
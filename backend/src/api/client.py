@@ -1,9 +1,59 @@
-from zeep import Client
-from zeep.transports import Transport
+from zeep import AsyncClient, Client
+from zeep.exceptions import Fault, TransportError
+from zeep.transports import AsyncTransport, Transport
 from requests import Session
+from requests.adapters import HTTPAdapter
 from datetime import date
+import asyncio
+import importlib.util
 import os
+import random
 import threading
+import time
+import weakref
+
+try:
+    import httpx
+except ImportError:
+    # Only the async client needs httpx; without it all calls go through ZeepClient
+    httpx = None
+
+from ..circuit_breaker import CircuitOpenError, justiz_breaker
+from ..metrics import track_external_api_call, soap_retries_total
+
+# Per-call timeouts in seconds and the size of the HTTP connection pool.
+# The pool should be at least as large as the number of parallel Urkunde downloads.
+SOAP_CONNECT_TIMEOUT = float(os.getenv("BIZRAY_SOAP_CONNECT_TIMEOUT", "10"))
+SOAP_TIMEOUT = float(os.getenv("BIZRAY_SOAP_TIMEOUT", "30"))
+SOAP_POOL_SIZE = int(os.getenv("BIZRAY_SOAP_POOL_SIZE", "32"))
+
+# Endpoint of the SOAP service; point it at the local stand-in (src/api/standin.py) for load tests
+SOAP_ADDRESS = os.getenv("BIZRAY_SOAP_ADDRESS") or "https://justizonline.gv.at/jop/api/at.gv.justiz.fbw/ws"
+
+# Async client: all Justiz calls of a process share one event loop and one httpx pool.
+# Idle connections kept open for reuse, and how long they may stay idle.
+SOAP_ASYNC = os.getenv("BIZRAY_SOAP_ASYNC", "1") == "1"
+SOAP_KEEPALIVE = int(os.getenv("BIZRAY_SOAP_KEEPALIVE", str(SOAP_POOL_SIZE)))
+SOAP_KEEPALIVE_EXPIRY = float(os.getenv("BIZRAY_SOAP_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 multiplexes the calls over few connections; needs the h2 package
+SOAP_HTTP2 = os.getenv("BIZRAY_SOAP_HTTP2", "1") == "1"
+# Retries of failed connections, timeouts and 429/5xx answers, with exponential backoff and full jitter
+SOAP_RETRIES = int(os.getenv("BIZRAY_SOAP_RETRIES", "2"))
+SOAP_RETRY_BACKOFF = float(os.getenv("BIZRAY_SOAP_RETRY_BACKOFF", "0.5"))
+SOAP_RETRY_MAX_BACKOFF = float(os.getenv("BIZRAY_SOAP_RETRY_MAX_BACKOFF", "5"))
+# Timeout of a single attempt per operation: listings are small, documents can be large
+SOAP_OPERATION_TIMEOUTS = {
+    "SUCHEURKUNDE": float(os.getenv("BIZRAY_SOAP_TIMEOUT_SUCHEURKUNDE", str(SOAP_TIMEOUT))),
+    "URKUNDE": float(os.getenv("BIZRAY_SOAP_TIMEOUT_URKUNDE", str(SOAP_TIMEOUT))),
+}
+_RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+def _record_breaker_outcome(error, duration):
+    """SOAP faults are answers of a working service; other errors count against the breaker"""
+    if isinstance(error, Fault):
+        justiz_breaker.record_success(duration)
+    else:
+        justiz_breaker.record_failure(duration)
 
 # Global SOAP client instance and lock for thread-safety
 _global_zeep_client = None
@@ -23,13 +73,17 @@ class ZeepClient:
         """
         self.session = Session()
         self.session.headers.update({'X-API-KEY': f'{self.API_KEY}', 'Content-Type': 'application/soap+xml;charset=UTF-8'})
+        # Size the connection pool for parallel Urkunde downloads from several threads
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=SOAP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         # Configure session timeout
-        self.session.timeout = (10, 30)  # (connect timeout, read timeout)
-        self.transport = Transport(session=self.session, timeout=30, operation_timeout=30)
+        self.session.timeout = (SOAP_CONNECT_TIMEOUT, SOAP_TIMEOUT)  # (connect timeout, read timeout)
+        self.transport = Transport(session=self.session, timeout=SOAP_TIMEOUT, operation_timeout=SOAP_TIMEOUT)
         client = Client(wsdl=self.WSDL_URL, transport=self.transport)
         for service in client.wsdl.services.values():
             for port in service.ports.values():
-                port.binding_options['address'] = "https://justizonline.gv.at/jop/api/at.gv.justiz.fbw/ws"
+                port.binding_options['address'] = SOAP_ADDRESS
 
         return client
 
@@ -57,11 +111,19 @@ class ZeepClient:
         Returns:
             urkunde_response: the response from the search_urkunde_by_fnr function
         """
+        # While the circuit breaker is open, fail fast instead of waiting for the timeout
+        if not justiz_breaker.allow_request("SUCHEURKUNDE"):
+            return None
+        start = time.time()
         try:
             urkunde_response = self.client.service.SUCHEURKUNDE(FNR=fnr)
+            justiz_breaker.record_success(time.time() - start)
+            track_external_api_call("justiz", "SUCHEURKUNDE", time.time() - start)
             return urkunde_response.ERGEBNIS
         except Exception as e:
             # Silently handle errors
+            _record_breaker_outcome(e, time.time() - start)
+            track_external_api_call("justiz", "SUCHEURKUNDE", time.time() - start, error=True)
             return None
     
     def get_urkunde(self, key):
@@ -74,12 +136,19 @@ class ZeepClient:
         """
         if not key.endswith('XML'):
             return None
+        if not justiz_breaker.allow_request("URKUNDE"):
+            return None
+        start = time.time()
         try:
             response = self.client.service.URKUNDE(KEY=key)
+            justiz_breaker.record_success(time.time() - start)
+            track_external_api_call("justiz", "URKUNDE", time.time() - start)
             return response
 
         except Exception as e:
             # Silently handle errors
+            _record_breaker_outcome(e, time.time() - start)
+            track_external_api_call("justiz", "URKUNDE", time.time() - start, error=True)
             return None
         
     def close(self):
@@ -125,4 +194,202 @@ def get_shared_client():
 
                 _global_zeep_client = ZeepClient(api_key, wsdl_url)
 
-    return _global_zeep_client
\ No newline at end of file
+    return _global_zeep_client
+
+
+def async_client_available():
+    """Whether Justiz calls should go through the async client"""
+    return SOAP_ASYNC and httpx is not None
+
+
+def _is_retryable(error):
+    """Connection problems, timeouts and overload answers are retried; SOAP faults are not"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, TransportError):
+        return error.status_code in _RETRY_STATUS_CODES
+    return False
+
+
+def _retry_delay(attempt):
+    """Exponential backoff with full jitter, so retries of many callers do not line up"""
+    return random.uniform(0, min(SOAP_RETRY_MAX_BACKOFF, SOAP_RETRY_BACKOFF * 2 ** attempt))
+
+
+class AsyncZeepClient:
+    """
+    Async variant of ZeepClient: zeep's AsyncClient over a pooled httpx client
+    (keep-alive, HTTP/2 where available), with retries and per-operation timeouts.
+    The httpx pool belongs to the event loop the client was created on, so use
+    get_shared_async_client() instead of creating instances directly.
+    """
+
+    def __init__(self, API_KEY, WSDL_URL):
+        if httpx is None:
+            raise RuntimeError("The async SOAP client needs httpx (pip install httpx)")
+        self.API_KEY = API_KEY
+        self.WSDL_URL = WSDL_URL
+        self.http_client = None
+        self.wsdl_client = None
+        self.transport = None
+        # Calls wait here for a connection, so the operation timeout only covers the call itself
+        self._slots = asyncio.Semaphore(SOAP_POOL_SIZE)
+        self.client = self._create_client()
+
+    def _create_client(self):
+        """
+        Create an async client for the WSDL URL (the WSDL itself is loaded synchronously, once)
+        """
+        headers = {'X-API-KEY': f'{self.API_KEY}', 'Content-Type': 'application/soap+xml;charset=UTF-8'}
+        limits = httpx.Limits(
+            max_connections=SOAP_POOL_SIZE,
+            max_keepalive_connections=SOAP_KEEPALIVE,
+            keepalive_expiry=SOAP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(SOAP_TIMEOUT, connect=SOAP_CONNECT_TIMEOUT)
+        http2 = SOAP_HTTP2 and importlib.util.find_spec("h2") is not None
+        self.http_client = httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+        self.wsdl_client = httpx.Client(timeout=timeout)
+        self.transport = AsyncTransport(client=self.http_client, wsdl_client=self.wsdl_client)
+        # AsyncTransport replaces the client headers with its User-Agent
+        self.http_client.headers.update(headers)
+        self.wsdl_client.headers.update(headers)
+        client = AsyncClient(wsdl=self.WSDL_URL, transport=self.transport)
+        for service in client.wsdl.services.values():
+            for port in service.ports.values():
+                port.binding_options['address'] = SOAP_ADDRESS
+
+        return client
+
+    async def _call(self, operation, **kwargs):
+        """
+        Call a SOAP operation, retrying transient failures
+        Args:
+            operation: name of the operation, e.g. 'URKUNDE'
+            kwargs: arguments of the operation
+        Returns:
+            the response of the operation; raises the last error once the retries are used up,
+            or CircuitOpenError while the Justiz API is considered unavailable
+        """
+        method = getattr(self.client.service, operation)
+        timeout = SOAP_OPERATION_TIMEOUTS.get(operation, SOAP_TIMEOUT)
+        attempt = 0
+        while True:
+            async with self._slots:
+                # While the circuit breaker is open, fail fast instead of waiting for the timeout
+                if not justiz_breaker.allow_request(operation):
+                    raise CircuitOpenError(f"Justiz API unavailable, {operation} not called")
+                start = time.time()
+                try:
+                    response = await asyncio.wait_for(method(**kwargs), timeout)
+                except asyncio.CancelledError:
+                    justiz_breaker.release()
+                    raise
+                except Exception as e:
+                    _record_breaker_outcome(e, time.time() - start)
+                    track_external_api_call("justiz", operation, time.time() - start, error=True)
+                    if attempt >= SOAP_RETRIES or not _is_retryable(e):
+                        raise
+                else:
+                    justiz_breaker.record_success(time.time() - start)
+                    track_external_api_call("justiz", operation, time.time() - start)
+                    return response
+            soap_retries_total.labels(operation=operation).inc()
+            await asyncio.sleep(_retry_delay(attempt))
+            attempt += 1
+
+    async def search_urkunde_by_fnr(self, fnr):
+        """
+        Search the urkunden of a company by fnr
+        Args:
+            fnr: the fnr of the company
+        Returns:
+            the ERGEBNIS entries of the response, None if the call failed
+        """
+        try:
+            urkunde_response = await self._call("SUCHEURKUNDE", FNR=fnr)
+            return urkunde_response.ERGEBNIS
+        except Exception:
+            return None
+
+    async def get_urkunde(self, key):
+        """
+        Get the content of an urkunde
+        Args:
+            key: the key of the urkunde
+        Returns:
+            the URKUNDE response, None for non-XML keys or if the call failed
+        """
+        if not key.endswith('XML'):
+            return None
+        try:
+            return await self._call("URKUNDE", KEY=key)
+        except Exception:
+            return None
+
+    async def aclose(self):
+        """Close the connection pool"""
+        try:
+            if self.http_client is not None:
+                await self.http_client.aclose()
+                self.http_client = None
+            if self.wsdl_client is not None:
+                self.wsdl_client.close()
+                self.wsdl_client = None
+            self.transport = None
+            self.client = None
+        except Exception:
+            pass
+
+
+# One async client per event loop (the httpx pool cannot be shared between loops)
+_async_clients = weakref.WeakKeyDictionary()
+
+# Event loop thread that runs the Justiz calls of synchronous callers
+_soap_loop = None
+_soap_loop_lock = threading.Lock()
+
+
+def get_shared_async_client():
+    """
+    Get or create the async SOAP client of the running event loop.
+
+    Returns:
+        AsyncZeepClient: Shared async SOAP client instance
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        api_key = os.getenv("API_KEY")
+        wsdl_url = os.getenv("WSDL_URL")
+
+        if not api_key or not wsdl_url:
+            raise ValueError("API_KEY and WSDL_URL environment variables must be set")
+
+        client = AsyncZeepClient(api_key, wsdl_url)
+        _async_clients[loop] = client
+    return client
+
+
+def _get_soap_loop():
+    global _soap_loop
+    if _soap_loop is None:
+        with _soap_loop_lock:
+            if _soap_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="soap-loop", daemon=True).start()
+                _soap_loop = loop
+    return _soap_loop
+
+
+def run_in_soap_loop(coro):
+    """
+    Run a coroutine on the shared SOAP event loop from synchronous code (worker threads).
+    All threads of the process then share one connection pool instead of holding a socket each.
+
+    Returns:
+        concurrent.futures.Future with the result; cancelling it cancels the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_soap_loop())
@@ -1,90 +1,427 @@
-from .client import get_shared_client
+from .client import get_shared_client, get_shared_async_client, async_client_available, run_in_soap_loop
 from .xml_parse import extract_bilanz_fields
+from ..cache import NOT_FOUND, is_not_found, get_cache, set_cache, delete_many
+from ..cache_keys import URKUNDE_LISTING
+from ..metrics import cache_negative_entries_total, urkunde_listing_revalidations_total
+from ..document_store import get_documents as get_stored_documents, put_documents as put_stored_documents, refresh_store_stats
+from ..financials import get_statements_by_keys, save_financial_statements
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime
 import numpy as np
 import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
 from ..indicators import *
 
-def get_company_urkunde(fnr):
+# Parallel Urkunde downloads per process, and the total time budget for one company's documents
+URKUNDE_FETCH_WORKERS = int(os.getenv("BIZRAY_URKUNDE_WORKERS", "16"))
+URKUNDE_FETCH_DEADLINE = float(os.getenv("BIZRAY_URKUNDE_DEADLINE", "45"))
+
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+# A company's document list changes a few times per year: serve the cached SUCHEURKUNDE listing
+# for up to 30 days, but revalidate it in the background once it is older than a day
+URKUNDE_LISTING_SOFT_TTL = int(os.getenv("BIZRAY_URKUNDE_LISTING_SOFT_TTL", "86400"))
+URKUNDE_LISTING_TTL = int(os.getenv("BIZRAY_URKUNDE_LISTING_TTL", str(30 * 86400)))
+# Companies without XML documents are cached as NOT_FOUND for a shorter time (failed calls are
+# not cached); ingestion drops the entry when it sees new registry entries of the company
+URKUNDE_LISTING_EMPTY_TTL = int(os.getenv("BIZRAY_URKUNDE_LISTING_EMPTY_TTL", "3600"))
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+# Number of most recent periods the indicator set needs: the latest statement plus the previous
+# one, which balance_sheet_volatility, growth_revenue and operational_result_profit compare against
+RISK_INDICATOR_PERIODS = 2
+
+# Date fields of a SUCHEURKUNDE result entry, in order of preference
+_URKUNDE_DATE_FIELDS = ('STICHTAG', 'GJ_ENDE', 'DATUM', 'EINGELANGTAM', 'VOLLZUGSDATUM')
+# Running document number in a KEY like '563319_0070752553502_000___000_30_36887434_XML'
+_URKUNDE_KEY_NUMBER = re.compile(r'_(\d+)_XML$')
+
+# Keys of the indicator dict returned by calculate_risk_indicators, in display order
+RISK_INDICATOR_KEYS = (
+    'debt_to_equity_ratio',
+    'concentration_risk',
+    'deferred_income_reliance',
+    'balance_sheet_volatility',
+    'irregular_fiscal_year',
+    'compliance_status',
+    'cash_ratio',
+    'debt_to_assets_ratio',
+    'equity_ratio',
+    'growth_revenue',
+    'operational_result_profit',
+)
+
+def _fetch_company_urkunde(fnr):
     """
-    Search for the latest urkunde by fnr and return the response
+    Call SUCHEURKUNDE for a company and return its XML urkunde entries
     Args:
         fnr: the fnr of the company
     Returns:
-        urkunde_response: the response from the search_urkunde_by_fnr function
+        list of urkunde objects (empty if there are none), or None if the call failed
     """
-    client = get_shared_client()
-    urkunde_response = client.search_urkunde_by_fnr(fnr)
-    if urkunde_response is None or len(urkunde_response) == 0:
-        return None
-    urkunde_response_xmls = [urkunde for urkunde in urkunde_response if urkunde.KEY.endswith('XML')]
-    if len(urkunde_response_xmls) == 0:
+    if async_client_available():
+        urkunde_response = run_in_soap_loop(_search_urkunde_async(fnr)).result()
+    else:
+        urkunde_response = get_shared_client().search_urkunde_by_fnr(fnr)
+    if urkunde_response is None:
         return None
     # Don't close the shared client
-    return urkunde_response_xmls
+    return [urkunde for urkunde in urkunde_response if urkunde.KEY.endswith('XML')]
 
-def get_urkunde_content(key):
+def _serialize_urkunde_listing(urkunde_list):
+    """Keep the fields of the urkunde entries that are used later (KEY and the date metadata)"""
+    items = []
+    for urkunde in urkunde_list:
+        item = {"KEY": urkunde.KEY}
+        for field in _URKUNDE_DATE_FIELDS:
+            value = getattr(urkunde, field, None)
+            if value is not None:
+                item[field] = value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+        items.append(item)
+    return items
+
+def _store_urkunde_listing(fnr, urkunde_list):
+    try:
+        set_cache(
+            URKUNDE_LISTING.key(fnr),
+            {"fetched_at": time.time(), "items": _serialize_urkunde_listing(urkunde_list)},
+            entity_type=URKUNDE_LISTING.entity_type,
+            ttl=URKUNDE_LISTING_TTL,
+        )
+    except Exception:
+        pass
+
+def _store_empty_urkunde_listing(fnr):
+    try:
+        set_cache(URKUNDE_LISTING.key(fnr), NOT_FOUND, entity_type=URKUNDE_LISTING.entity_type, ttl=URKUNDE_LISTING_EMPTY_TTL)
+        cache_negative_entries_total.labels(family=URKUNDE_LISTING.name, event="stored").inc()
+    except Exception:
+        pass
+
+def _revalidate_urkunde_listing(fnr):
+    try:
+        urkunde_list = _fetch_company_urkunde(fnr)
+        if urkunde_list:
+            _store_urkunde_listing(fnr, urkunde_list)
+        urkunde_listing_revalidations_total.labels(result="ok" if urkunde_list else "empty").inc()
+    except Exception as e:
+        urkunde_listing_revalidations_total.labels(result="error").inc()
+        print(f"Error revalidating urkunde listing for {fnr}: {e}")
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(fnr)
+
+def _revalidate_urkunde_listing_in_background(fnr):
+    """Refresh a stale listing without blocking the request; at most one refresh per FNR at a time"""
+    with _revalidating_lock:
+        if fnr in _revalidating:
+            return
+        _revalidating.add(fnr)
+    _get_fetch_executor().submit(_revalidate_urkunde_listing, fnr)
+
+def get_company_urkunde(fnr, force_refresh=False):
     """
-    Get the content of the urkunde and return the extracted data
+    Return the XML urkunde entries of a company (the SUCHEURKUNDE listing).
+    The listing is cached per FNR. After the soft TTL the cached listing is still returned,
+    and it is revalidated in the background; force_refresh always calls the Justiz API.
+    An empty listing is cached as NOT_FOUND for URKUNDE_LISTING_EMPTY_TTL seconds.
     Args:
-        key: the key of the urkunde
+        fnr: the fnr of the company
+        force_refresh: skip the cache
     Returns:
-        extracted_data: the extracted data from the urkunde
+        list of urkunde objects (with KEY and date attributes), or None if there are none
     """
-    client = get_shared_client()
-    urkunde_content = client.get_urkunde(key)
-    if urkunde_content is None:
+    if not force_refresh:
+        cached = None
+        try:
+            cached = get_cache(URKUNDE_LISTING.key(fnr), entity_type=URKUNDE_LISTING.entity_type)
+        except Exception:
+            pass
+
+        if is_not_found(cached):
+            cache_negative_entries_total.labels(family=URKUNDE_LISTING.name, event="hit").inc()
+            return None
+        if isinstance(cached, dict) and cached.get("items"):
+            if time.time() - cached.get("fetched_at", 0) > URKUNDE_LISTING_SOFT_TTL:
+                _revalidate_urkunde_listing_in_background(fnr)
+            return [SimpleNamespace(**item) for item in cached["items"]]
+
+    urkunde_list = _fetch_company_urkunde(fnr)
+    if urkunde_list is None:
+        return None
+    if not urkunde_list:
+        _store_empty_urkunde_listing(fnr)
         return None
+    _store_urkunde_listing(fnr, urkunde_list)
+    return urkunde_list
 
+def invalidate_urkunde_listings(fnrs):
+    """
+    Drop the cached listings of companies (including empty ones), e.g. when ingestion saw new
+    registry entries for them, so the next detail view fetches a fresh listing.
+    Args:
+        fnrs: firmenbuchnummern
+    """
+    if not fnrs:
+        return 0
+    try:
+        return delete_many([URKUNDE_LISTING.key(fnr) for fnr in fnrs], entity_type=URKUNDE_LISTING.entity_type)
+    except Exception:
+        return 0
+
+def _urkunde_date(urkunde):
+    """Return the date of a SUCHEURKUNDE result entry from its metadata, or None if it has none"""
+    for field in _URKUNDE_DATE_FIELDS:
+        value = getattr(urkunde, field, None)
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        text = str(value).strip()
+        for fmt in ("%Y-%m-%d", "%Y%m%d", "%d.%m.%Y"):
+            try:
+                return datetime.strptime(text[:10], fmt).date()
+            except ValueError:
+                continue
+    return None
+
+def _urkunde_number(urkunde):
+    """Return the running document number encoded in the KEY, or None"""
+    match = _URKUNDE_KEY_NUMBER.search(urkunde.KEY or '')
+    return int(match.group(1)) if match else None
+
+def order_urkunden(urkunde_list):
+    """
+    Order Urkunden from oldest to newest using only the search metadata.
+    Uses the document date if every entry has one, otherwise the running document number
+    from the KEY, otherwise the order returned by SUCHEURKUNDE.
+    Args:
+        urkunde_list: list of urkunde objects with KEY attribute
+    Returns:
+        the urkunde objects, oldest first
+    """
+    if not urkunde_list:
+        return []
+
+    indexed = list(enumerate(urkunde_list))
+    dates = [_urkunde_date(u) for u in urkunde_list]
+    numbers = [_urkunde_number(u) for u in urkunde_list]
+
+    if all(d is not None for d in dates):
+        indexed.sort(key=lambda item: (dates[item[0]], numbers[item[0]] or 0, item[0]))
+    elif all(n is not None for n in numbers):
+        indexed.sort(key=lambda item: (numbers[item[0]], item[0]))
+
+    return [urkunde for _, urkunde in indexed]
+
+def plan_urkunde_fetch(urkunde_list, periods=RISK_INDICATOR_PERIODS):
+    """
+    Split the Urkunden of a company into the ones the indicators need and the rest.
+    Args:
+        urkunde_list: list of urkunde objects with KEY attribute
+        periods: number of most recent periods to fetch
+    Returns:
+        (needed, remaining): both ordered oldest first; needed holds the newest `periods` entries
+    """
+    ordered = order_urkunden(urkunde_list)
+    if periods <= 0:
+        return [], ordered
+    return ordered[-periods:], ordered[:-periods]
+
+def _decode_urkunde_response(urkunde_content):
+    """Return the XML document of an URKUNDE response as a string"""
     # Extract XML content from the response object
     content = urkunde_content.DOKUMENT.CONTENT
     if isinstance(content, bytes):
-        xml_content = content.decode('utf-8', errors='replace')
-    else:
-        xml_content = str(content)
+        return content.decode('utf-8', errors='replace')
+    return str(content)
 
-    extracted_data = extract_bilanz_fields(xml_content)
-    # Don't close the shared client
-    return extracted_data
+async def _search_urkunde_async(fnr):
+    return await get_shared_async_client().search_urkunde_by_fnr(fnr)
+
+async def _get_urkunde_async(key):
+    return await get_shared_async_client().get_urkunde(key)
 
-def get_all_urkunde_contents(urkunde_list):
+def _submit_urkunde_downloads(keys):
     """
-    Get the content of all urkunde entries and return a list of extracted data
+    Start the URKUNDE downloads of keys.
+    With the async client, the downloads of all requests and workers of the process share the
+    connection pool of the SOAP event loop; otherwise they run on the fetch executor.
+    Returns:
+        dict KEY -> future of the URKUNDE response (None if the download failed)
+    """
+    if async_client_available():
+        return {key: run_in_soap_loop(_get_urkunde_async(key)) for key in keys}
+    client = get_shared_client()
+    executor = _get_fetch_executor()
+    return {key: executor.submit(client.get_urkunde, key) for key in keys}
+
+def _parse_urkunde_document(key, urkunde_content):
+    """
+    Extract the Bilanz fields of a downloaded urkunde
+    Args:
+        key: the key of the urkunde
+        urkunde_content: the URKUNDE response
+    Returns:
+        (xml_content, extracted_data), extracted_data is None if the document is not a Bilanz
+    """
+    xml_content = _decode_urkunde_response(urkunde_content)
+    try:
+        extracted_data = extract_bilanz_fields(xml_content)
+    except (ValueError, ET.ParseError) as e:
+        print(f"Urkunde {key} is not a parseable Bilanz: {e}")
+        extracted_data = None
+    return xml_content, extracted_data
+
+def get_urkunde_content(key):
+    """
+    Get the content of the urkunde and return the extracted data
+    Args:
+        key: the key of the urkunde
+    Returns:
+        extracted_data: the extracted data from the urkunde
+    """
+    documents = _get_urkunde_documents([key])
+    return documents.get(key)
+
+def _get_fetch_executor():
+    """
+    Shared, bounded pool for Urkunde downloads. It is shared by all requests so the total
+    number of parallel calls to the Justiz API per process stays bounded.
+    """
+    global _fetch_executor
+    if _fetch_executor is None:
+        with _fetch_executor_lock:
+            if _fetch_executor is None:
+                _fetch_executor = ThreadPoolExecutor(
+                    max_workers=URKUNDE_FETCH_WORKERS,
+                    thread_name_prefix="urkunde-fetch",
+                )
+    return _fetch_executor
+
+def _get_urkunde_documents(keys, fnr=None, deadline=None):
+    """
+    Resolve Urkunde KEYs to their extracted data.
+    The financial_statements table and the persistent document store are consulted first; the
+    remaining documents are downloaded in parallel and written to both, so each document is
+    fetched from Justiz only once.
+    Args:
+        keys: urkunde KEYs
+        fnr: firmenbuchnummer the documents belong to (stored with new documents)
+        deadline: total time budget for the downloads in seconds
+    Returns:
+        dict KEY -> extracted_data for every document that is available (None if not a Bilanz)
+    """
+    if deadline is None:
+        deadline = URKUNDE_FETCH_DEADLINE
+
+    try:
+        documents = get_statements_by_keys(keys)
+    except Exception as e:
+        print(f"Financial statement lookup failed: {e}")
+        documents = {}
+    missing = [key for key in keys if key not in documents]
+    if not missing:
+        return documents
+
+    stored = get_stored_documents(missing)
+    documents.update(stored)
+    if fnr and any(parsed is not None for parsed in stored.values()):
+        # Documents stored before the statements table existed
+        save_financial_statements(fnr, stored.items())
+    missing = [key for key in missing if key not in documents]
+    if not missing:
+        return documents
+
+    futures = _submit_urkunde_downloads(missing)
+    done, not_done = wait(futures.values(), timeout=deadline)
+
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        print(f"Urkunde fetch deadline of {deadline}s exceeded, {len(not_done)} of {len(futures)} documents skipped")
+
+    downloaded = []
+    for key, future in futures.items():
+        if future not in done:
+            continue
+        try:
+            urkunde_content = future.result()
+        except Exception as e:
+            print(f"Error fetching urkunde {key}: {e}")
+            continue
+        if urkunde_content is None:
+            continue
+        xml_content, extracted_data = _parse_urkunde_document(key, urkunde_content)
+        documents[key] = extracted_data
+        downloaded.append({"key": key, "firmenbuchnummer": fnr, "xml": xml_content, "parsed": extracted_data})
+
+    if downloaded:
+        put_stored_documents(downloaded)
+        refresh_store_stats()
+        save_financial_statements(fnr, [(doc["key"], doc["parsed"]) for doc in downloaded])
+
+    return documents
+
+def get_all_urkunde_contents(urkunde_list, deadline=None, fnr=None):
+    """
+    Get the content of all urkunde entries and return a list of extracted data.
+    Stored documents are read from the document store, the others are downloaded in parallel;
+    the result keeps the order of urkunde_list.
+    Each call is limited by the SOAP client timeout, and all downloads together by the deadline;
+    documents that are not ready by then (or failed) are left out.
     Args:
         urkunde_list: list of urkunde objects with KEY attribute
+        deadline: total time budget in seconds (defaults to BIZRAY_URKUNDE_DEADLINE)
+        fnr: firmenbuchnummer the documents belong to
     Returns:
         list of extracted_data: list of extracted data from all urkunde entries
     """
     if urkunde_list is None or len(urkunde_list) == 0:
         return []
 
-    all_extracted_data = []
-    client = get_shared_client()
+    keys = [urkunde.KEY for urkunde in urkunde_list]
+    documents = _get_urkunde_documents(keys, fnr=fnr, deadline=deadline)
 
-    for urkunde in urkunde_list:
-        key = urkunde.KEY
-        urkunde_content = client.get_urkunde(key)
-        if urkunde_content is None:
-            continue
+    return [documents[key] for key in keys if documents.get(key) is not None]
 
-        content = urkunde_content.DOKUMENT.CONTENT
-        if isinstance(content, bytes):
-            xml_content = content.decode('utf-8', errors='replace')
-        else:
-            xml_content = str(content)
+def get_latest_urkunde_contents(urkunde_list, periods=RISK_INDICATOR_PERIODS, fnr=None):
+    """
+    Fetch only the newest `periods` Urkunden that parse successfully.
+    If one of the planned documents cannot be fetched or parsed, the next older one is tried.
+    Args:
+        urkunde_list: list of urkunde objects with KEY attribute
+        periods: number of periods needed
+        fnr: firmenbuchnummer the documents belong to
+    Returns:
+        list of extracted_data, oldest first (at most `periods` entries)
+    """
+    needed, remaining = plan_urkunde_fetch(urkunde_list, periods)
+    extracted = get_all_urkunde_contents(needed, fnr=fnr)
 
-        extracted_data = extract_bilanz_fields(xml_content)
-        if extracted_data is not None:
-            all_extracted_data.append(extracted_data)
+    while len(extracted) < periods and remaining:
+        missing = periods - len(extracted)
+        needed, remaining = remaining[-missing:], remaining[:-missing]
+        extracted = get_all_urkunde_contents(needed, fnr=fnr) + extracted
 
-    # Don't close the shared client
-    return all_extracted_data
+    return extracted
 
 def calculate_risk_indicators(extracted_data, historical_data=None, registry_entries=None):
     """
     Calculate the risk indicators from the extracted data
     Args:
         extracted_data: the extracted data from the latest urkunde (used for most indicators)
-        historical_data: optional list of historical extracted data (for future use with indicators that need historical context)
+        historical_data: optional list of extracted data ordered oldest first; historical_data[0] is used as the
+            previous period, so pass the periods planned by plan_urkunde_fetch (previous, latest)
         registry_entries: optional list of RegistryEntry objects from the database (for compliance status)
     Returns:
         risk_indicators: the risk indicators from the extracted data
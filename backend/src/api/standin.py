@@ -0,0 +1,393 @@
+"""
+Local stand-in for the Justiz SOAP API (SUCHEURKUNDE and URKUNDE), for offline load and latency tests.
+
+Serves its WSDL at /ws?wsdl and answers SOAP 1.2 calls at /ws. Every FNR has a deterministic
+listing of generated Urkunden (XML Bilanz documents plus PDFs the client skips), and every XML
+KEY returns a generated Bilanz that extract_bilanz_fields can parse.
+
+Latency, errors and hangs are configurable per operation:
+    fixed:0.2              always 0.2s
+    uniform:0.1,0.5        between 0.1s and 0.5s
+    lognormal:0.3,0.6      median 0.3s, sigma 0.6 (long tail, closest to the real API)
+    exponential:0.2        mean 0.2s
+
+Run with:
+    python -m src.api.standin --port 8090 --latency lognormal:0.3,0.6 --error-rate 0.02
+
+and point the backend at it:
+    WSDL_URL=http://localhost:8090/ws?wsdl
+    BIZRAY_SOAP_ADDRESS=http://localhost:8090/ws
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import zlib
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from fastapi import FastAPI, Request, Response
+
+from lxml import etree
+
+STANDIN_NS = "urn:bizray:justiz-standin"
+SOAP12_NS = "http://www.w3.org/2003/05/soap-envelope"
+BILANZ_NS = "https://finanzonline.bmf.gv.at/bilanz"
+
+# Listing entries per company (about a third are PDFs) and the share of companies without any
+STANDIN_DOCUMENTS = int(os.getenv("BIZRAY_STANDIN_DOCUMENTS", "6"))
+STANDIN_EMPTY_RATE = float(os.getenv("BIZRAY_STANDIN_EMPTY_RATE", "0.05"))
+# Latency distribution of both operations, unless set per operation
+STANDIN_LATENCY = os.getenv("BIZRAY_STANDIN_LATENCY", "lognormal:0.3,0.6")
+# Share of calls answered with 503, and of calls that hang for STANDIN_HANG seconds
+STANDIN_ERROR_RATE = float(os.getenv("BIZRAY_STANDIN_ERROR_RATE", "0"))
+STANDIN_TIMEOUT_RATE = float(os.getenv("BIZRAY_STANDIN_TIMEOUT_RATE", "0"))
+STANDIN_HANG = float(os.getenv("BIZRAY_STANDIN_HANG", "120"))
+
+OPERATIONS = ("SUCHEURKUNDE", "URKUNDE")
+
+WSDL_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+                  xmlns:soap12="http://schemas.xmlsoap.org/wsdl/soap12/"
+                  xmlns:xs="http://www.w3.org/2001/XMLSchema"
+                  xmlns:tns="{ns}"
+                  targetNamespace="{ns}">
+  <wsdl:types>
+    <xs:schema targetNamespace="{ns}" elementFormDefault="qualified">
+      <xs:complexType name="URKUNDENINFO">
+        <xs:sequence>
+          <xs:element name="KEY" type="xs:string"/>
+          <xs:element name="DOKUMENTART" type="xs:string" minOccurs="0"/>
+          <xs:element name="STICHTAG" type="xs:date" minOccurs="0"/>
+          <xs:element name="EINGELANGTAM" type="xs:date" minOccurs="0"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="DOKUMENT">
+        <xs:sequence>
+          <xs:element name="DATEINAME" type="xs:string" minOccurs="0"/>
+          <xs:element name="CONTENT" type="xs:base64Binary"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:element name="SUCHEURKUNDE_REQUEST">
+        <xs:complexType><xs:sequence><xs:element name="FNR" type="xs:string"/></xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="SUCHEURKUNDE_RESPONSE">
+        <xs:complexType><xs:sequence>
+          <xs:element name="FNR" type="xs:string"/>
+          <xs:element name="ERGEBNIS" type="tns:URKUNDENINFO" minOccurs="0" maxOccurs="unbounded"/>
+        </xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="URKUNDE_REQUEST">
+        <xs:complexType><xs:sequence><xs:element name="KEY" type="xs:string"/></xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="URKUNDE_RESPONSE">
+        <xs:complexType><xs:sequence>
+          <xs:element name="KEY" type="xs:string"/>
+          <xs:element name="DOKUMENT" type="tns:DOKUMENT"/>
+        </xs:sequence></xs:complexType>
+      </xs:element>
+    </xs:schema>
+  </wsdl:types>
+  <wsdl:message name="SUCHEURKUNDE_IN"><wsdl:part name="parameters" element="tns:SUCHEURKUNDE_REQUEST"/></wsdl:message>
+  <wsdl:message name="SUCHEURKUNDE_OUT"><wsdl:part name="parameters" element="tns:SUCHEURKUNDE_RESPONSE"/></wsdl:message>
+  <wsdl:message name="URKUNDE_IN"><wsdl:part name="parameters" element="tns:URKUNDE_REQUEST"/></wsdl:message>
+  <wsdl:message name="URKUNDE_OUT"><wsdl:part name="parameters" element="tns:URKUNDE_RESPONSE"/></wsdl:message>
+  <wsdl:portType name="FbwPortType">
+    <wsdl:operation name="SUCHEURKUNDE">
+      <wsdl:input message="tns:SUCHEURKUNDE_IN"/>
+      <wsdl:output message="tns:SUCHEURKUNDE_OUT"/>
+    </wsdl:operation>
+    <wsdl:operation name="URKUNDE">
+      <wsdl:input message="tns:URKUNDE_IN"/>
+      <wsdl:output message="tns:URKUNDE_OUT"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="FbwBinding" type="tns:FbwPortType">
+    <soap12:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="SUCHEURKUNDE">
+      <soap12:operation soapAction="SUCHEURKUNDE"/>
+      <wsdl:input><soap12:body use="literal"/></wsdl:input>
+      <wsdl:output><soap12:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+    <wsdl:operation name="URKUNDE">
+      <soap12:operation soapAction="URKUNDE"/>
+      <wsdl:input><soap12:body use="literal"/></wsdl:input>
+      <wsdl:output><soap12:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="FbwService">
+    <wsdl:port name="FbwPort" binding="tns:FbwBinding">
+      <soap12:address location="{address}"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+"""
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution like 'lognormal:0.3,0.6'.
+
+    Returns:
+        Function drawing a delay in seconds from a random generator
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    kind = kind.strip().lower()
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Invalid latency distribution: {spec!r}")
+
+
+class StandinConfig:
+    """Behaviour of the stand-in per operation."""
+
+    def __init__(
+        self,
+        latency: str = STANDIN_LATENCY,
+        error_rate: float = STANDIN_ERROR_RATE,
+        timeout_rate: float = STANDIN_TIMEOUT_RATE,
+        hang: float = STANDIN_HANG,
+        documents: int = STANDIN_DOCUMENTS,
+        empty_rate: float = STANDIN_EMPTY_RATE,
+        seed: Optional[int] = None,
+    ):
+        self.latency = {
+            op: parse_latency(os.getenv(f"BIZRAY_STANDIN_LATENCY_{op}", latency)) for op in OPERATIONS
+        }
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.documents = documents
+        self.empty_rate = empty_rate
+        self.rng = random.Random(seed)
+
+
+def _company_rng(value: str) -> random.Random:
+    """Generated data depends only on the FNR, so every run sees the same companies."""
+    return random.Random(zlib.crc32(value.encode("utf-8")))
+
+
+def _fnr_of_key(key: str) -> str:
+    return key.split("_", 1)[0]
+
+
+def generate_listing(fnr: str, documents: int = STANDIN_DOCUMENTS, empty_rate: float = STANDIN_EMPTY_RATE) -> List[Dict]:
+    """Listing of a company: one XML Bilanz and its PDF per fiscal year, oldest first."""
+    rng = _company_rng(fnr)
+    if rng.random() < empty_rate:
+        return []
+
+    entries = []
+    document_number = rng.randint(30_000_000, 36_000_000)
+    years = max(1, (documents * 2 + 2) // 3)
+    for year in range(date.today().year - years, date.today().year):
+        stichtag = date(year, 12, 31)
+        received = date(year + 1, rng.randint(3, 9), rng.randint(1, 28))
+        for kind in ("XML", "PDF"):
+            if len(entries) >= documents:
+                break
+            document_number += rng.randint(1, 5000)
+            entries.append({
+                "KEY": f"{fnr}_{rng.randint(10 ** 12, 10 ** 13 - 1):013d}_000___000_30_{document_number}_{kind}",
+                "DOKUMENTART": "Jahresabschluss",
+                "STICHTAG": stichtag.isoformat(),
+                "EINGELANGTAM": received.isoformat(),
+            })
+    return entries
+
+
+def _posten(tag: str, amount: float, children: str = "") -> str:
+    return f"<{tag}><POSTENZEILE><BETRAG>{amount:.2f}</BETRAG></POSTENZEILE>{children}</{tag}>"
+
+
+def generate_bilanz(key: str, fiscal_year_end: Optional[str] = None) -> str:
+    """A Bilanz document in the finanzonline format, with plausible generated amounts."""
+    rng = _company_rng(key)
+    year = int(fiscal_year_end[:4]) if fiscal_year_end else rng.randint(2015, date.today().year - 1)
+    scale = 10 ** rng.randint(4, 7)
+
+    intangible = round(rng.uniform(0, 0.1) * scale, 2)
+    tangible = round(rng.uniform(0.1, 0.5) * scale, 2)
+    financial = round(rng.uniform(0, 0.2) * scale, 2)
+    fixed = intangible + tangible + financial
+    inventories = round(rng.uniform(0, 0.3) * scale, 2)
+    receivables = round(rng.uniform(0.05, 0.4) * scale, 2)
+    securities = round(rng.uniform(0, 0.05) * scale, 2)
+    cash = round(rng.uniform(0.01, 0.3) * scale, 2)
+    current = inventories + receivables + securities + cash
+    prepaid = round(rng.uniform(0, 0.02) * scale, 2)
+    total = fixed + current + prepaid
+
+    deferred_income = round(rng.uniform(0, 0.05) * total, 2)
+    subscribed = round(min(35000.0, total * 0.2), 2)
+    equity = round(rng.uniform(-0.1, 0.6) * total, 2)
+    net_profit = round(rng.uniform(-0.1, 0.15) * total, 2)
+    reserves = round(equity - subscribed - net_profit, 2)
+    liabilities = round(total - equity - deferred_income, 2)
+    employees = rng.randint(0, 250)
+
+    assets = _posten(
+        "HGB_224_2", total,
+        _posten("HGB_224_2_A", fixed,
+                _posten("HGB_224_2_A_I", intangible)
+                + _posten("HGB_224_2_A_II", tangible)
+                + _posten("HGB_224_2_A_III", financial))
+        + _posten("HGB_224_2_B", current,
+                  _posten("HGB_224_2_B_I", inventories)
+                  + _posten("HGB_224_2_B_II", receivables)
+                  + _posten("HGB_224_2_B_III", securities)
+                  + _posten("HGB_224_2_B_IV", cash))
+        + _posten("HGB_224_2_C", prepaid),
+    )
+    liabilities_equity = _posten(
+        "HGB_224_3", total,
+        _posten("HGB_224_3_A", equity,
+                _posten("HGB_229_1_A_I", subscribed)
+                + _posten("HGB_224_3_A_III", reserves)
+                + _posten("HGB_224_3_A_IV", net_profit))
+        + _posten("HGB_224_3_C", liabilities)
+        + _posten("HGB_224_3_D", deferred_income),
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<ABSCHLUSS xmlns="{BILANZ_NS}">'
+        "<ALLG_JUSTIZ><WAEHRUNG>EUR</WAEHRUNG>"
+        f"<GJ><BEGINN>{year}-01-01</BEGINN><ENDE>{year}-12-31</ENDE></GJ></ALLG_JUSTIZ>"
+        f"<BILANZ>{assets}{liabilities_equity}</BILANZ>"
+        f"<HGB_Form_3_16>{employees}</HGB_Form_3_16>"
+        "</ABSCHLUSS>"
+    )
+
+
+def _envelope(body: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<soap:Envelope xmlns:soap="{SOAP12_NS}" xmlns:tns="{STANDIN_NS}">'
+        f"<soap:Body>{body}</soap:Body></soap:Envelope>"
+    )
+
+
+def _fault(code: str, reason: str) -> str:
+    return _envelope(
+        f"<soap:Fault><soap:Code><soap:Value>soap:{code}</soap:Value></soap:Code>"
+        f'<soap:Reason><soap:Text xml:lang="de">{escape(reason)}</soap:Text></soap:Reason></soap:Fault>'
+    )
+
+
+def _listing_response(fnr: str, entries: List[Dict]) -> str:
+    items = "".join(
+        "<tns:ERGEBNIS>"
+        + "".join(f"<tns:{field}>{escape(entry[field])}</tns:{field}>"
+                  for field in ("KEY", "DOKUMENTART", "STICHTAG", "EINGELANGTAM"))
+        + "</tns:ERGEBNIS>"
+        for entry in entries
+    )
+    return _envelope(
+        f"<tns:SUCHEURKUNDE_RESPONSE><tns:FNR>{escape(fnr)}</tns:FNR>{items}</tns:SUCHEURKUNDE_RESPONSE>"
+    )
+
+
+def _document_response(key: str, xml_content: str) -> str:
+    content = base64.b64encode(xml_content.encode("utf-8")).decode("ascii")
+    return _envelope(
+        f"<tns:URKUNDE_RESPONSE><tns:KEY>{escape(key)}</tns:KEY><tns:DOKUMENT>"
+        f"<tns:DATEINAME>{escape(key)}.xml</tns:DATEINAME><tns:CONTENT>{content}</tns:CONTENT>"
+        "</tns:DOKUMENT></tns:URKUNDE_RESPONSE>"
+    )
+
+
+def _parse_call(body: bytes):
+    """Return (operation, argument) of a SOAP request, e.g. ('URKUNDE', KEY)."""
+    root = etree.fromstring(body)
+    soap_body = root.find(f"{{{SOAP12_NS}}}Body")
+    if soap_body is None or len(soap_body) == 0:
+        raise ValueError("SOAP body missing")
+    request = soap_body[0]
+    operation = etree.QName(request).localname.replace("_REQUEST", "")
+    argument = request.findtext(f"{{{STANDIN_NS}}}{'FNR' if operation == 'SUCHEURKUNDE' else 'KEY'}")
+    return operation, argument
+
+
+def create_app(config: Optional[StandinConfig] = None, address: Optional[str] = None) -> FastAPI:
+    """
+    Build the stand-in app.
+
+    Args:
+        config: Latency, error and timeout behaviour (defaults from the BIZRAY_STANDIN_* env vars)
+        address: SOAP address announced in the WSDL (defaults to the URL the WSDL is fetched from)
+    """
+    config = config or StandinConfig()
+    app = FastAPI(title="Justiz SOAP stand-in")
+
+    @app.get("/ws")
+    async def wsdl(request: Request):
+        location = address or str(request.url.replace(query=""))
+        return Response(WSDL_TEMPLATE.format(ns=STANDIN_NS, address=location), media_type="text/xml")
+
+    @app.post("/ws")
+    async def soap(request: Request):
+        try:
+            operation, argument = _parse_call(await request.body())
+        except (ValueError, etree.XMLSyntaxError) as e:
+            return Response(_fault("Sender", f"Invalid request: {e}"), status_code=400,
+                            media_type="application/soap+xml")
+        if operation not in OPERATIONS or not argument:
+            return Response(_fault("Sender", f"Unknown operation {operation}"), status_code=500,
+                            media_type="application/soap+xml")
+
+        roll = config.rng.random()
+        if roll < config.timeout_rate:
+            await asyncio.sleep(config.hang)
+        else:
+            await asyncio.sleep(max(0.0, config.latency[operation](config.rng)))
+        if config.timeout_rate <= roll < config.timeout_rate + config.error_rate:
+            return Response("Service Unavailable", status_code=503)
+
+        if operation == "SUCHEURKUNDE":
+            entries = generate_listing(argument, config.documents, config.empty_rate)
+            return Response(_listing_response(argument, entries), media_type="application/soap+xml")
+
+        listing = {entry["KEY"]: entry for entry in generate_listing(_fnr_of_key(argument), config.documents, 0)}
+        entry = listing.get(argument)
+        if entry is None or not argument.endswith("_XML"):
+            return Response(_fault("Receiver", f"Urkunde {argument} nicht gefunden"), status_code=500,
+                            media_type="application/soap+xml")
+        xml_content = generate_bilanz(argument, entry["STICHTAG"])
+        return Response(_document_response(argument, xml_content), media_type="application/soap+xml")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    arg_parser = argparse.ArgumentParser(description="Local stand-in for the Justiz SOAP API")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8090)
+    arg_parser.add_argument("--latency", default=STANDIN_LATENCY, help="e.g. fixed:0.2, lognormal:0.3,0.6")
+    arg_parser.add_argument("--error-rate", type=float, default=STANDIN_ERROR_RATE, help="share of 503 answers")
+    arg_parser.add_argument("--timeout-rate", type=float, default=STANDIN_TIMEOUT_RATE, help="share of hanging calls")
+    arg_parser.add_argument("--hang", type=float, default=STANDIN_HANG, help="seconds a hanging call takes")
+    arg_parser.add_argument("--seed", type=int, default=None, help="seed for latencies and errors")
+    args = arg_parser.parse_args()
+
+    standin_config = StandinConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        hang=args.hang,
+        seed=args.seed,
+    )
+    print(f"Justiz stand-in on http://{args.host}:{args.port}/ws (WSDL: /ws?wsdl)")
+    uvicorn.run(create_app(standin_config), host=args.host, port=args.port, log_level="warning")
@@ -1,5 +1,7 @@
-from client import ZeepClient
-from xml_parse import extract_bilanz_fields
+# Manual check against the live Justiz API, or the local stand-in (src/api/standin.py) with
+# WSDL_URL and BIZRAY_SOAP_ADDRESS pointing at it. Run from backend/: python -m src.api.test
+from src.api.client import ZeepClient
+from src.api.xml_parse import extract_bilanz_fields
 import json
 
 from dotenv import load_dotenv
@@ -12,9 +14,9 @@ client = ZeepClient(API_KEY, WSDL_URL)
 urkunde_response = client.search_urkunde_by_fnr("563319k")
 urkunde_response_xmls = [urkunde for urkunde in urkunde_response if urkunde.KEY.endswith('XML')]
 latest_urkunde = urkunde_response_xmls[-1].KEY
-# urkunde_content = client.get_urkunde(latest_urkunde)
+urkunde_content = client.get_urkunde(latest_urkunde)
 # urkunde_content = client.get_urkunde('056247_5690452507182_000___000_30_36803752_XML')
-urkunde_content = client.get_urkunde('563319_0070752553502_000___000_30_36887434_XML')
+# urkunde_content = client.get_urkunde('563319_0070752553502_000___000_30_36887434_XML')
 content = urkunde_content.DOKUMENT.CONTENT
 if isinstance(content, bytes):
     xml_content = content.decode('utf-8', errors='replace')
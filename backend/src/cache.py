@@ -16,16 +16,72 @@ set("company_123_risk", risk_data, entity_type="risk", ttl=7200)
 # Retrieve from cache
 api_result = get("company_123", entity_type="api")
 risk_result = get("company_123_risk", entity_type="risk")
+
+Reads go through an in-process L1 tier first (src/local_cache.py): hot keys are served from
+process memory for BIZRAY_CACHE_L1_TTL seconds without a Redis round-trip or JSON decoding.
+Writes and deletes drop the key from the L1 tier of every replica via Redis pub/sub.
+Values returned from the cache are shared, treat them as read-only.
+
+Values are encoded by src/cache_codec.py (orjson/msgpack, zstd for large values); entries in the
+plain JSON format of older versions are still read.
+
+Keys are built from the key families in src/cache_keys.py, which also declare the layer that
+owns (writes) each family. Lookups that found nothing can be cached as short-lived negative
+entries holding NOT_FOUND (check with is_not_found).
+
+Expensive aggregates are cached with get_or_compute, which recomputes hot entries early
+(XFetch) and jitters their TTLs, so a popular key expiring does not send every concurrent
+request to the database at once.
+
+Async endpoints use the *_async variants (get_cache_async, set_cache_async, pipeline_async, ...),
+which talk to Redis through redis.asyncio with a bounded connection pool per event loop, so a slow
+Redis delays only the requests waiting on it. Without init() or with BIZRAY_REDIS_ASYNC=0 they run
+the sync functions in a worker thread.
+
+If Redis is unreachable, at startup or later, the cache switches to a bounded in-process fallback
+(redis_available() is False, bizray_redis_connected is 0) and reconnects in the background. Keys
+written or deleted meanwhile are deleted from Redis on reconnection, as their copies there may
+be outdated.
 """
 
+import asyncio
 import json
+import math
 import os
-from typing import Any, Optional
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
 import redis
-from src.metrics import track_cache_operation, track_cache_error
+import redis.asyncio as aioredis
+from src.cache_codec import CodecError, decode, encode, serialized_size
+from src.cache_keys import FAMILIES, KeyFamily, family_of
+from src.local_cache import LocalCache, parse_size
+from src.metrics import track_cache_operation, track_cache_error, cache_stale_served_total, cache_background_refreshes_total, cache_tier_lookups_total, cache_recomputes_total, cache_family_keys, cache_family_bytes, cache_quota_evictions_total, redis_connected
 
 # Redis connection instance
 _redis_client: Optional[redis.Redis] = None
+# Connection for cached values, which are binary (no response decoding)
+_redis_values: Optional[redis.Redis] = None
+# Connection parameters of init(), for the async clients
+_connection_kwargs: Optional[Dict[str, Any]] = None
+# True while Redis is unreachable: the cache runs on the in-process fallback meanwhile, and a
+# background thread reconnects (see _check_connection)
+_redis_down = False
+
+# Async endpoints use redis.asyncio with one connection pool per event loop, so a slow Redis
+# only holds the requests waiting for it (0 runs the sync client in worker threads instead)
+REDIS_ASYNC = os.getenv("BIZRAY_REDIS_ASYNC", "1") == "1"
+# Connections per pool; further commands wait up to REDIS_ASYNC_TIMEOUT seconds for one
+REDIS_ASYNC_MAX_CONNECTIONS = int(os.getenv("BIZRAY_REDIS_ASYNC_MAX_CONNECTIONS", "64"))
+# Connect and socket timeout of async commands
+REDIS_ASYNC_TIMEOUT = float(os.getenv("BIZRAY_REDIS_ASYNC_TIMEOUT", "2"))
+# redis.asyncio connections are bound to the event loop that opened them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
 
 # Key prefixes for different entity types
 KEY_PREFIX_API = "api:"
@@ -33,6 +89,341 @@ KEY_PREFIX_DB = "db:"
 KEY_PREFIX_NETWORK = "network:"
 KEY_PREFIX_RISK = "risk:"
 
+# Stale-while-revalidate: background refreshes per process, and how long a replica may hold
+# the refresh lock of a key before another replica may refresh it
+REFRESH_WORKERS = int(os.getenv("BIZRAY_CACHE_REFRESH_WORKERS", "4"))
+REFRESH_LOCK_TTL = int(os.getenv("BIZRAY_CACHE_REFRESH_LOCK_TTL", "60"))
+_SWR_FIELD = "__soft_expires_at__"
+# Negative entries record that a lookup found nothing (unknown company, empty SOAP listing).
+# They hold NOT_FOUND, which no cached value equals; None still means a miss
+_NOT_FOUND_FIELD = "__not_found__"
+NOT_FOUND = {_NOT_FOUND_FIELD: True}
+
+# Stampede protection of get_or_compute: entries are recomputed before they expire, with a
+# probability growing towards the expiry and with their compute time (XFetch; a higher beta
+# recomputes earlier), and TTLs are shortened by up to TTL_JITTER so they expire apart
+XFETCH_BETA = float(os.getenv("BIZRAY_CACHE_XFETCH_BETA", "1.0"))
+TTL_JITTER = float(os.getenv("BIZRAY_CACHE_TTL_JITTER", "0.1"))
+_XFETCH_FIELD = "__xfetch__"
+
+# Quotas of key families (src/cache_keys.py): every write of such a family records the key with
+# its expiry and payload size, drops records of expired keys and picks the entries closest to
+# expiry while the family is over its quota; the caller deletes them. One EVALSHA per write, in
+# the write pipeline. Deletes drop the records of their keys with _QUOTA_RELEASE_SCRIPT.
+# The scripts only touch the index keys of one family (see _quota_keys), never the cached keys.
+# KEYS: index (sorted set: key -> expiry), sizes (hash: key -> bytes), byte total
+# ARGV: written key, payload bytes, expiry, now, max keys, max bytes (0: no limit)
+# Returns {keys, bytes, evicted keys}
+_QUOTA_SCRIPT = """
+local index, sizes, total, key = KEYS[1], KEYS[2], KEYS[3], ARGV[1]
+local freed = 0
+local expired = redis.call('ZRANGEBYSCORE', index, '-inf', ARGV[4], 'LIMIT', 0, 1000)
+if #expired > 0 then
+    for _, size in ipairs(redis.call('HMGET', sizes, unpack(expired))) do
+        freed = freed + (tonumber(size) or 0)
+    end
+    redis.call('ZREM', index, unpack(expired))
+    redis.call('HDEL', sizes, unpack(expired))
+end
+local previous = tonumber(redis.call('HGET', sizes, key)) or 0
+redis.call('ZADD', index, ARGV[3], key)
+redis.call('HSET', sizes, key, ARGV[2])
+local bytes = redis.call('INCRBY', total, tonumber(ARGV[2]) - previous - freed)
+local max_keys, max_bytes = tonumber(ARGV[5]), tonumber(ARGV[6])
+local evicted = {}
+while (max_keys > 0 and redis.call('ZCARD', index) > max_keys) or (max_bytes > 0 and bytes > max_bytes) do
+    local oldest = redis.call('ZRANGE', index, 0, 1)
+    local victim = oldest[1]
+    if victim == key then
+        victim = oldest[2]
+    end
+    if not victim then
+        break
+    end
+    local size = tonumber(redis.call('HGET', sizes, victim)) or 0
+    redis.call('ZREM', index, victim)
+    redis.call('HDEL', sizes, victim)
+    bytes = redis.call('INCRBY', total, -size)
+    table.insert(evicted, victim)
+end
+return {redis.call('ZCARD', index), bytes, evicted}
+"""
+# KEYS: index, sizes, byte total; ARGV: deleted keys. Returns the byte total
+_QUOTA_RELEASE_SCRIPT = """
+local index, sizes, total = KEYS[1], KEYS[2], KEYS[3]
+local freed = 0
+for _, size in ipairs(redis.call('HMGET', sizes, unpack(ARGV))) do
+    freed = freed + (tonumber(size) or 0)
+end
+redis.call('ZREM', index, unpack(ARGV))
+redis.call('HDEL', sizes, unpack(ARGV))
+return redis.call('INCRBY', total, -freed)
+"""
+_QUOTA_SCRIPT_SOURCES = {"quota": _QUOTA_SCRIPT, "release": _QUOTA_RELEASE_SCRIPT}
+# Registered quota scripts (see _quota_scripts), loaded into Redis once
+_quota_scripts_loaded: Dict[str, Any] = {}
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+_PREFIX_MAP = {
+    "api": KEY_PREFIX_API,
+    "db": KEY_PREFIX_DB,
+    "network": KEY_PREFIX_NETWORK,
+    "risk": KEY_PREFIX_RISK,
+}
+
+# In-process L1 tier: lifetime of local copies, and byte budgets per entity type
+# (types without a budget are not cached locally)
+L1_TTL = float(os.getenv("BIZRAY_CACHE_L1_TTL", "10"))
+L1_BUDGETS = os.getenv("BIZRAY_CACHE_L1_BUDGETS", "api:64MB,db:64MB,network:16MB,risk:8MB")
+# Drop local copies on other replicas when a key is written or deleted
+L1_INVALIDATION = os.getenv("BIZRAY_CACHE_L1_INVALIDATION", "1") == "1"
+INVALIDATION_CHANNEL = "cache:l1:invalidate"
+
+def _build_l1_tiers(budgets: str) -> Dict[str, LocalCache]:
+    tiers = {}
+    for item in budgets.split(","):
+        entity_type, _, size = item.partition(":")
+        if entity_type.strip() and size.strip() and parse_size(size) > 0:
+            tiers[entity_type.strip().lower()] = LocalCache(entity_type.strip().lower(), parse_size(size), L1_TTL)
+    return tiers
+
+_l1_tiers: Dict[str, LocalCache] = _build_l1_tiers(L1_BUDGETS) if L1_TTL > 0 else {}
+# Identifies this process in invalidation messages, so it skips its own
+_instance_id = uuid4().hex
+_invalidation_thread = None
+
+# While Redis is unreachable (at startup or during an outage) values are kept in a bounded
+# in-process cache, and the connection is retried every RECONNECT_INTERVAL seconds
+FALLBACK_BUDGET = os.getenv("BIZRAY_CACHE_FALLBACK_BUDGET", "128MB")
+FALLBACK_MAX_TTL = float(os.getenv("BIZRAY_CACHE_FALLBACK_MAX_TTL", "3600"))
+RECONNECT_INTERVAL = float(os.getenv("BIZRAY_REDIS_RECONNECT_INTERVAL", "5"))
+# Keys written or deleted during an outage are deleted from Redis on reconnection (their Redis
+# copies may be outdated); beyond this many keys, their whole families are deleted instead
+OUTAGE_KEYS_MAX = 10000
+
+_fallback = LocalCache("fallback", parse_size(FALLBACK_BUDGET), FALLBACK_MAX_TTL)
+_outage_keys = set()
+_outage_patterns = set()
+_outage_lock = threading.Lock()
+_reconnect_thread: Optional[threading.Thread] = None
+_reconnect_lock = threading.Lock()
+
+def _full_key(key: str, entity_type: str) -> str:
+    """Prefix a cache key with the namespace of its entity type."""
+    prefix = _PREFIX_MAP.get(entity_type.lower(), KEY_PREFIX_API)
+    return f"{prefix}{key}"
+
+def _l1(entity_type: str) -> Optional[LocalCache]:
+    return _l1_tiers.get(entity_type.lower())
+
+def _l1_lookup(full_key: str, entity_type: str) -> Tuple[bool, Any]:
+    tier = _l1(entity_type)
+    if tier is None:
+        return False, None
+    found, value = tier.get(full_key)
+    cache_tier_lookups_total.labels(tier="l1", entity_type=entity_type, result="hit" if found else "miss").inc()
+    return found, value
+
+def _l1_store(full_key: str, value: Any, raw: Any, entity_type: str) -> None:
+    tier = _l1(entity_type)
+    if tier is not None:
+        tier.set(full_key, value, size=serialized_size(raw))
+
+def _on_invalidation(message: Dict[str, Any]) -> None:
+    """Drop local copies of keys written or deleted by another replica."""
+    try:
+        payload = json.loads(message["data"])
+    except (TypeError, ValueError, KeyError):
+        return
+    if payload.get("origin") == _instance_id:
+        return
+    keys = payload.get("keys") or []
+    patterns = payload.get("patterns") or []
+    for tier in _l1_tiers.values():
+        if keys:
+            tier.delete(keys)
+        for pattern in patterns:
+            tier.delete_matching(pattern)
+
+def _on_invalidation_error(error: BaseException, pubsub: Any, thread: Any) -> None:
+    # Invalidations may have been missed while disconnected
+    print(f"Redis error in cache invalidation listener: {error}")
+    clear_local_cache()
+    time.sleep(1)
+
+def _start_invalidation_listener() -> None:
+    global _invalidation_thread
+    if not L1_INVALIDATION or not _l1_tiers or _invalidation_thread is not None:
+        return
+    pubsub = _redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{INVALIDATION_CHANNEL: _on_invalidation})
+    _invalidation_thread = pubsub.run_in_thread(
+        sleep_time=1.0, daemon=True, exception_handler=_on_invalidation_error
+    )
+
+def _invalidation_message(keys: List[str] = (), patterns: List[str] = ()) -> Optional[str]:
+    """Message for the other replicas, None if there is nobody to tell."""
+    if _invalidation_thread is None:
+        return None
+    return json.dumps({"origin": _instance_id, "keys": list(keys), "patterns": list(patterns)})
+
+def _l1_invalidate(full_keys: List[str]) -> None:
+    for tier in _l1_tiers.values():
+        tier.delete(full_keys)
+
+def clear_local_cache() -> None:
+    """Empty the L1 tier of this process."""
+    for tier in _l1_tiers.values():
+        tier.clear()
+
+def redis_available() -> bool:
+    """True if the cache is backed by Redis: init() was called and Redis is reachable."""
+    return _redis_client is not None and not _redis_down
+
+def _set_redis_down(down: bool) -> None:
+    global _redis_down
+    _redis_down = down
+    redis_connected.set(0 if down else 1)
+
+def _check_connection(error: BaseException) -> None:
+    """Switch to the in-process fallback if a Redis command failed because Redis is unreachable."""
+    if _redis_down or not isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+        return
+    print("Redis is unreachable, using the in-process fallback cache until it is back")
+    _set_redis_down(True)
+    _start_reconnecting()
+
+def _start_reconnecting() -> None:
+    global _reconnect_thread
+    with _reconnect_lock:
+        if _reconnect_thread is not None and _reconnect_thread.is_alive():
+            return
+        _reconnect_thread = threading.Thread(target=_reconnect_loop, name="redis-reconnect", daemon=True)
+        _reconnect_thread.start()
+
+def _reconnect_loop() -> None:
+    while _redis_down:
+        time.sleep(RECONNECT_INTERVAL)
+        _try_reconnect()
+
+def _try_reconnect() -> bool:
+    """Switch back to Redis if it answers; returns True once the cache is backed by Redis again."""
+    try:
+        _redis_client.ping()
+    except redis.RedisError:
+        return False
+
+    # New writes go to Redis from here on; the ones made during the outage are replayed as deletes
+    _set_redis_down(False)
+    try:
+        _replay_outage()
+    except redis.RedisError as e:
+        print(f"Redis error while reconnecting: {e}")
+        _check_connection(e)
+        return False
+    _fallback.clear()
+    _quota_scripts_loaded.clear()
+    _start_invalidation_listener()
+    print("Redis is reachable again, left the in-process fallback cache")
+    return True
+
+def _record_outage(full_keys: List[str], entity_type: str, patterns: List[str] = ()) -> None:
+    """Remember keys written or deleted in the fallback, to delete their Redis copies later."""
+    prefix_length = len(_full_key("", entity_type))
+    with _outage_lock:
+        _outage_patterns.update(patterns)
+        for full_key in full_keys:
+            if len(_outage_keys) < OUTAGE_KEYS_MAX:
+                _outage_keys.add(full_key)
+                continue
+            family = family_of(full_key[prefix_length:])
+            if family is not None:
+                _outage_patterns.add(_full_key(family.pattern(), entity_type))
+
+def _replay_outage() -> None:
+    with _outage_lock:
+        keys, patterns = list(_outage_keys), list(_outage_patterns)
+    for start in range(0, len(keys), 500):
+        _delete_keys(keys[start:start + 500])
+    for pattern in patterns:
+        _delete_scanned(pattern)
+    with _outage_lock:
+        _outage_keys.difference_update(keys)
+        _outage_patterns.difference_update(patterns)
+    if keys or patterns:
+        print(f"Deleted {len(keys)} keys and {len(patterns)} key patterns changed during the Redis outage")
+
+def _fallback_lookup(full_key: str, entity_type: str) -> Tuple[bool, Any]:
+    """Read a payload stored in the fallback while Redis is unreachable; returns (found, value)."""
+    found, payload = _fallback.get(full_key)
+    if found:
+        try:
+            value = decode(payload, entity_type)
+        except CodecError:
+            found = False
+    track_cache_operation(hit=found, entity_type=entity_type)
+    cache_tier_lookups_total.labels(tier="fallback", entity_type=entity_type, result="hit" if found else "miss").inc()
+    return (True, value) if found else (False, None)
+
+def _fallback_many(keys: List[str], entity_type: str, found: Dict[str, Any]) -> Dict[str, Any]:
+    for key in keys:
+        hit, value = _fallback_lookup(_full_key(key, entity_type), entity_type)
+        if hit:
+            found[key] = value
+    return found
+
+def _fallback_store(payloads: Dict[str, bytes], ttl: Optional[int], entity_type: str) -> int:
+    _l1_invalidate(list(payloads))
+    for full_key, payload in payloads.items():
+        _fallback.set(full_key, payload, size=len(payload), ttl=ttl)
+    _record_outage(list(payloads), entity_type)
+    return len(payloads)
+
+def _values_client() -> redis.Redis:
+    return _redis_values if _redis_values is not None else _redis_client
+
+def get_client() -> redis.Redis:
+    """
+    Sync client of init() (decoded responses), for modules that keep their own data structures
+    in Redis, such as the screening jobs (src/jobs.py).
+
+    Raises:
+        RuntimeError: if init() was not called
+    """
+    if _redis_client is None:
+        raise RuntimeError("Redis cache not initialized. Call init() first.")
+    return _redis_client
+
+def get_async_client() -> Optional[aioredis.Redis]:
+    """
+    Async client of the running event loop (binary responses), None if async Redis is disabled
+    or init() was not called; callers then use the sync client in a worker thread.
+    """
+    if not REDIS_ASYNC or _connection_kwargs is None:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool = aioredis.BlockingConnectionPool(
+            max_connections=REDIS_ASYNC_MAX_CONNECTIONS,
+            timeout=REDIS_ASYNC_TIMEOUT,
+            socket_connect_timeout=REDIS_ASYNC_TIMEOUT,
+            socket_timeout=REDIS_ASYNC_TIMEOUT,
+            **_connection_kwargs,
+        )
+        client = aioredis.Redis(connection_pool=pool)
+        _async_clients[loop] = client
+    return client
+
+async def close_async_client() -> None:
+    """Close the async client of the running event loop (on shutdown)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
 def init(
     host: Optional[str] = None,
     port: int = 6379,
@@ -42,6 +433,8 @@ def init(
 ) -> None:
     """
     Initialize Redis connection.
+    If Redis cannot be reached, the cache keeps values in a bounded in-process fallback and
+    reconnects in the background; ConnectionError is raised to report it.
     
     Args:
         host: Redis host (defaults to REDIS_HOST env var or 'localhost')
@@ -50,7 +443,7 @@ def init(
         password: Redis password (defaults to REDIS_PASSWORD env var or None)
         decode_responses: Whether to decode responses as strings (defaults to True)
     """
-    global _redis_client
+    global _redis_client, _redis_values, _connection_kwargs
     
     if host is None:
         host = os.getenv("REDIS_HOST", "localhost")
@@ -67,12 +460,62 @@ def init(
         socket_connect_timeout=5,
         socket_timeout=5,
     )
+    _redis_values = redis.Redis(
+        host=host,
+        port=port,
+        db=db,
+        password=password,
+        decode_responses=False,
+        socket_connect_timeout=5,
+        socket_timeout=5,
+    )
+    
+    _connection_kwargs = {"host": host, "port": port, "db": db, "password": password}
     
     try:
         _redis_client.ping()
-    except redis.ConnectionError as e:
+    except (redis.ConnectionError, redis.TimeoutError) as e:
+        # Serve from the in-process fallback until Redis can be reached
+        _set_redis_down(True)
+        _start_reconnecting()
         raise ConnectionError(f"Failed to connect to Redis: {e}") from e
 
+    _set_redis_down(False)
+    _quota_scripts_loaded.clear()
+    _start_invalidation_listener()
+
+def _record_lookup(full_key: str, raw: Optional[bytes], entity_type: str) -> Tuple[bool, Any]:
+    """Decode a value read from Redis, track hit/miss and keep a local copy; returns (found, value)."""
+    if raw is not None:
+        try:
+            value = decode(raw, entity_type)
+        except CodecError as e:
+            track_cache_error("decode")
+            print(f"Undecodable cache entry {full_key}: {e}")
+            raw = None
+    if raw is None:
+        track_cache_operation(hit=False, entity_type=entity_type)
+        cache_tier_lookups_total.labels(tier="redis", entity_type=entity_type, result="miss").inc()
+        return False, None
+
+    track_cache_operation(hit=True, entity_type=entity_type)
+    cache_tier_lookups_total.labels(tier="redis", entity_type=entity_type, result="hit").inc()
+    _l1_store(full_key, value, raw, entity_type)
+    return True, value
+
+def _local_lookup(keys: List[str], entity_type: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Values of keys found in the L1 tier, and the keys to read from Redis."""
+    found: Dict[str, Any] = {}
+    remote_keys = []
+    for key in keys:
+        hit, value = _l1_lookup(_full_key(key, entity_type), entity_type)
+        if hit:
+            track_cache_operation(hit=True, entity_type=entity_type)
+            found[key] = value
+        else:
+            remote_keys.append(key)
+    return found, remote_keys
+
 def get_cache(
     key: str,
     entity_type: str = "api",
@@ -85,51 +528,134 @@ def get_cache(
         entity_type: Type of entity ('api', 'db', 'network', or 'risk')
     
     Returns:
-        The cached value if found, None otherwise.
-        For 'risk' type, returns parsed JSON.
-        For 'api' and 'db' types, returns the stored value as-is.
+        The cached value if found, None otherwise (also for entries that cannot be decoded).
     """
     if _redis_client is None:
         raise RuntimeError("Redis cache not initialized. Call init() first.")
     
-    # Determine the appropriate prefix
-    prefix_map = {
-        "api": KEY_PREFIX_API,
-        "db": KEY_PREFIX_DB,
-        "network": KEY_PREFIX_NETWORK,
-        "risk": KEY_PREFIX_RISK,
-    }
-    
-    prefix = prefix_map.get(entity_type.lower(), KEY_PREFIX_API)
-    full_key = f"{prefix}{key}"
+    full_key = _full_key(key, entity_type)
+
+    found, value = _l1_lookup(full_key, entity_type)
+    if found:
+        track_cache_operation(hit=True, entity_type=entity_type)
+        return value
+    if _redis_down:
+        return _fallback_lookup(full_key, entity_type)[1]
     
     try:
-        value = _redis_client.get(full_key)
-        if value is None:
-            # Track cache miss
-            track_cache_operation(hit=False, entity_type=entity_type)
-            return None
+        raw = _values_client().get(full_key)
+    except redis.RedisError as e:
+        # Track cache error
+        track_cache_error("get")
+        # Log error but don't fail - return None to allow fallback
+        print(f"Redis error during get: {e}")
+        _check_connection(e)
+        return None
 
-        # Track cache hit
-        track_cache_operation(hit=True, entity_type=entity_type)
+    return _record_lookup(full_key, raw, entity_type)[1]
 
-        # For risk scores, parse JSON
-        if entity_type.lower() == "risk":
-            return json.loads(value)
+async def get_cache_async(
+    key: str,
+    entity_type: str = "api",
+) -> Optional[Any]:
+    """Async variant of get_cache."""
+    client = get_async_client()
+    if client is None:
+        return await asyncio.to_thread(get_cache, key, entity_type)
 
-        # For API and DB queries, return as-is (or try to parse if it's JSON)
-        try:
-            return json.loads(value)
-        except (json.JSONDecodeError, TypeError):
-            return value
+    full_key = _full_key(key, entity_type)
 
+    found, value = _l1_lookup(full_key, entity_type)
+    if found:
+        track_cache_operation(hit=True, entity_type=entity_type)
+        return value
+    if _redis_down:
+        return _fallback_lookup(full_key, entity_type)[1]
+
+    try:
+        raw = await client.get(full_key)
     except redis.RedisError as e:
-        # Track cache error
         track_cache_error("get")
-        # Log error but don't fail - return None to allow fallback
         print(f"Redis error during get: {e}")
+        _check_connection(e)
         return None
 
+    return _record_lookup(full_key, raw, entity_type)[1]
+
+def get_many(
+    keys: List[str],
+    entity_type: str = "api",
+) -> Dict[str, Any]:
+    """
+    Retrieve several values from the cache with a single MGET round-trip.
+    
+    Args:
+        keys: The cache keys (without prefix)
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+    
+    Returns:
+        Dict mapping each key that was found to its cached value.
+        Missing keys are left out of the result.
+    """
+    if _redis_client is None:
+        raise RuntimeError("Redis cache not initialized. Call init() first.")
+
+    if not keys:
+        return {}
+
+    found, remote_keys = _local_lookup(keys, entity_type)
+    if not remote_keys:
+        return found
+    if _redis_down:
+        return _fallback_many(remote_keys, entity_type, found)
+
+    try:
+        values = _values_client().mget([_full_key(key, entity_type) for key in remote_keys])
+    except redis.RedisError as e:
+        track_cache_error("get")
+        print(f"Redis error during mget: {e}")
+        _check_connection(e)
+        return found
+
+    for key, raw in zip(remote_keys, values):
+        hit, value = _record_lookup(_full_key(key, entity_type), raw, entity_type)
+        if hit:
+            found[key] = value
+
+    return found
+
+async def get_many_async(
+    keys: List[str],
+    entity_type: str = "api",
+) -> Dict[str, Any]:
+    """Async variant of get_many."""
+    client = get_async_client()
+    if client is None:
+        return await asyncio.to_thread(get_many, keys, entity_type)
+    if not keys:
+        return {}
+
+    found, remote_keys = _local_lookup(keys, entity_type)
+    if not remote_keys:
+        return found
+    if _redis_down:
+        return _fallback_many(remote_keys, entity_type, found)
+
+    try:
+        values = await client.mget([_full_key(key, entity_type) for key in remote_keys])
+    except redis.RedisError as e:
+        track_cache_error("get")
+        print(f"Redis error during mget: {e}")
+        _check_connection(e)
+        return found
+
+    for key, raw in zip(remote_keys, values):
+        hit, value = _record_lookup(_full_key(key, entity_type), raw, entity_type)
+        if hit:
+            found[key] = value
+
+    return found
+
 def set_cache(
     key: str,
     value: Any,
@@ -148,36 +674,701 @@ def set_cache(
     Returns:
         True if successful, False otherwise.
     """
+    return set_many({key: value}, entity_type=entity_type, ttl=ttl) == 1
+
+def set_many(
+    items: Dict[str, Any],
+    entity_type: str = "api",
+    ttl: Optional[int] = None,
+) -> int:
+    """
+    Store several key-value pairs with a single pipelined round-trip.
+    
+    Args:
+        items: Values by cache key (without prefix)
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+        ttl: Time to live in seconds of all values (optional)
+    
+    Returns:
+        Number of values that were stored.
+    """
+    if _redis_client is None:
+        raise RuntimeError("Redis cache not initialized. Call init() first.")
+
+    payloads = _encode_items(items, entity_type)
+    if not payloads:
+        return 0
+    if _redis_down:
+        return _fallback_store(payloads, ttl, entity_type)
+
+    try:
+        pipe = _values_client().pipeline(transaction=False)
+        quota_families = _queue_writes(pipe, payloads, ttl, entity_type)
+        results = pipe.execute()
+        evicted = _track_quotas(quota_families, results)
+        if evicted:
+            _values_client().delete(*evicted)
+    except redis.RedisError as e:
+        track_cache_error("set")
+        print(f"Redis error during set: {e}")
+        _check_connection(e)
+        _check_scripts(e)
+        return _fallback_store(payloads, ttl, entity_type) if _redis_down else 0
+    return sum(1 for result in results[:len(payloads)] if result)
+
+async def set_many_async(
+    items: Dict[str, Any],
+    entity_type: str = "api",
+    ttl: Optional[int] = None,
+) -> int:
+    """Async variant of set_many."""
+    client = get_async_client()
+    if client is None:
+        return await asyncio.to_thread(set_many, items, entity_type, ttl)
+
+    payloads = _encode_items(items, entity_type)
+    if not payloads:
+        return 0
+    if _redis_down:
+        return _fallback_store(payloads, ttl, entity_type)
+
+    try:
+        if any(_quota_family(full_key) is not None for full_key in payloads):
+            await _load_quota_scripts_async(client)
+        pipe = client.pipeline(transaction=False)
+        quota_families = _queue_writes(pipe, payloads, ttl, entity_type)
+        results = await pipe.execute()
+        evicted = _track_quotas(quota_families, results)
+        if evicted:
+            await client.delete(*evicted)
+    except redis.RedisError as e:
+        track_cache_error("set")
+        print(f"Redis error during set: {e}")
+        _check_connection(e)
+        _check_scripts(e)
+        return _fallback_store(payloads, ttl, entity_type) if _redis_down else 0
+    return sum(1 for result in results[:len(payloads)] if result)
+
+async def set_cache_async(
+    key: str,
+    value: Any,
+    entity_type: str = "api",
+    ttl: Optional[int] = None,
+) -> bool:
+    """Async variant of set_cache."""
+    return await set_many_async({key: value}, entity_type=entity_type, ttl=ttl) == 1
+
+def _encode_items(items: Dict[str, Any], entity_type: str) -> Dict[str, bytes]:
+    """Payloads by full key; values that cannot be encoded are left out."""
+    payloads: Dict[str, bytes] = {}
+    for key, value in items.items():
+        try:
+            payloads[_full_key(key, entity_type)] = encode(value, entity_type)
+        except (TypeError, ValueError) as e:
+            track_cache_error("set")
+            print(f"Cannot encode cache value {key}: {e}")
+    return payloads
+
+def _queue_writes(pipe: Any, payloads: Dict[str, bytes], ttl: Optional[int], entity_type: str) -> List[KeyFamily]:
+    """Queue the writes of payloads; returns the families whose quota updates end the pipeline."""
+    # The local copies are dropped and filled again on the next read
+    _l1_invalidate(list(payloads))
+    for full_key, payload in payloads.items():
+        if ttl is not None:
+            pipe.setex(full_key, ttl, payload)
+        else:
+            pipe.set(full_key, payload)
+    # Tell the other replicas in the same round-trip
+    message = _invalidation_message(keys=list(payloads))
+    if message is not None:
+        pipe.publish(INVALIDATION_CHANNEL, message)
+
+    quota_families = []
+    now = time.time()
+    quota_script = None
+    for full_key, payload in payloads.items():
+        family = _quota_family(full_key)
+        if family is None:
+            continue
+        if quota_script is None:
+            quota_script = _quota_scripts()[0]
+        pipe.evalsha(
+            quota_script.sha, 3, *_quota_keys(family),
+            full_key, len(payload), now + ttl if ttl is not None else "+inf", now, family.max_keys, family.max_bytes,
+        )
+        quota_families.append(family)
+    return quota_families
+
+def _track_quotas(families: List[KeyFamily], results: List[Any]) -> List[str]:
+    """Publish the quota usage returned by the quota updates at the end of a write pipeline;
+    returns the evicted keys, for the caller to delete."""
+    evicted_keys = []
+    if not families:
+        return evicted_keys
+    for family, (keys, size, evicted) in zip(families, results[-len(families):]):
+        cache_family_keys.labels(family=family.name).set(keys)
+        cache_family_bytes.labels(family=family.name).set(size)
+        if evicted:
+            cache_quota_evictions_total.labels(family=family.name).inc(len(evicted))
+            evicted_keys.extend(key.decode("utf-8") if isinstance(key, bytes) else key for key in evicted)
+    # Local copies on other replicas expire within L1_TTL
+    _l1_invalidate(evicted_keys)
+    return evicted_keys
+
+def _quota_family(full_key: str) -> Optional[KeyFamily]:
+    """Family with a quota of a full cache key, None for keys of families without one."""
+    prefix, _, key = full_key.partition(":")
+    family = family_of(key)
+    if family is None or not family.has_quota or _PREFIX_MAP.get(family.entity_type) != f"{prefix}:":
+        return None
+    return family
+
+def _quota_keys(family: KeyFamily) -> List[str]:
+    """Index, sizes and byte total of a family; the hash tag keeps them in one cluster slot."""
+    index = f"cache:quota:{{{family.name}}}"
+    return [index, f"{index}:sizes", f"{index}:bytes"]
+
+def _quota_scripts() -> Tuple[Any, Any]:
+    """
+    The quota and release scripts, registered and loaded into Redis once, so pipelines only
+    send their SHA (EVALSHA).
+    """
+    if not _quota_scripts_loaded:
+        client = _values_client()
+        for source in _QUOTA_SCRIPT_SOURCES.values():
+            client.script_load(source)
+        _quota_scripts_loaded.update(_register_quota_scripts(client))
+    return _quota_scripts_loaded["quota"], _quota_scripts_loaded["release"]
+
+async def _load_quota_scripts_async(client: aioredis.Redis) -> None:
+    """Load the quota scripts through the async client, so _quota_scripts does not block the event loop."""
+    if not _quota_scripts_loaded:
+        for source in _QUOTA_SCRIPT_SOURCES.values():
+            await client.script_load(source)
+        _quota_scripts_loaded.update(_register_quota_scripts(_values_client()))
+
+def _register_quota_scripts(client: redis.Redis) -> Dict[str, Any]:
+    # Registering only computes the SHA, it does not talk to Redis
+    return {name: client.register_script(source) for name, source in _QUOTA_SCRIPT_SOURCES.items()}
+
+def _check_scripts(error: BaseException) -> None:
+    """Load the scripts again on the next write if Redis lost them (restart, SCRIPT FLUSH)."""
+    if isinstance(error, redis.exceptions.NoScriptError):
+        _quota_scripts_loaded.clear()
+
+def _queue_deletes(pipe: Any, full_keys: List[str]) -> None:
+    """Queue the deletion of keys, and of their records in the quota indexes."""
+    pipe.delete(*full_keys)
+    by_family: Dict[str, List[str]] = {}
+    for full_key in full_keys:
+        if isinstance(full_key, bytes):
+            full_key = full_key.decode("utf-8")
+        family = _quota_family(full_key)
+        if family is not None:
+            by_family.setdefault(family.name, []).append(full_key)
+    if not by_family:
+        return
+    release_script = _quota_scripts()[1]
+    for name, keys in by_family.items():
+        pipe.evalsha(release_script.sha, 3, *_quota_keys(FAMILIES[name]), *keys)
+
+@contextmanager
+def pipeline(operation: str = "pipeline") -> Iterator[Any]:
+    """
+    Queue raw Redis commands (keys are used as given, values are not encoded) and send them
+    in one round-trip when the block exits. Nothing is sent if the block raises.
+    Redis errors are tracked under `operation` and re-raised. Raw commands have no in-process
+    fallback: while Redis is unreachable they are dropped and redis.ConnectionError is raised
+    right away.
+    
+    Example usage:
+        with pipeline("track_visit") as pipe:
+            pipe.zincrby("visits:trending", 1, fnr)
+            pipe.setex(f"visits:ts:{fnr}", 86400, now)
+    """
     if _redis_client is None:
         raise RuntimeError("Redis cache not initialized. Call init() first.")
+
+    with _redis_client.pipeline(transaction=False) as pipe:
+        yield pipe
+        if _redis_down:
+            track_cache_error(operation)
+            raise redis.ConnectionError("Redis is unreachable")
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            track_cache_error(operation)
+            print(f"Redis error during {operation}: {e}")
+            _check_connection(e)
+            raise
+
+@asynccontextmanager
+async def pipeline_async(operation: str = "pipeline") -> AsyncIterator[Any]:
+    """Async variant of pipeline: commands are queued without await and sent when the block exits."""
+    client = get_async_client()
+    if client is None:
+        if _redis_client is None:
+            raise RuntimeError("Redis cache not initialized. Call init() first.")
+        pipe = _redis_client.pipeline(transaction=False)
+        execute = lambda: asyncio.to_thread(pipe.execute)
+    else:
+        pipe = client.pipeline(transaction=False)
+        execute = pipe.execute
+
+    yield pipe
+    if _redis_down:
+        track_cache_error(operation)
+        raise redis.ConnectionError("Redis is unreachable")
+    try:
+        await execute()
+    except redis.RedisError as e:
+        track_cache_error(operation)
+        print(f"Redis error during {operation}: {e}")
+        _check_connection(e)
+        raise
+
+def delete_many(
+    keys: List[str],
+    entity_type: str = "api",
+) -> int:
+    """
+    Remove several keys from the cache with a single DEL round-trip.
+    
+    Args:
+        keys: The cache keys (without prefix)
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
     
-    # Determine the appropriate prefix
-    prefix_map = {
-        "api": KEY_PREFIX_API,
-        "db": KEY_PREFIX_DB,
-        "network": KEY_PREFIX_NETWORK,
-        "risk": KEY_PREFIX_RISK,
-    }
+    Returns:
+        Number of keys that were removed.
+    """
+    if _redis_client is None:
+        raise RuntimeError("Redis cache not initialized. Call init() first.")
+
+    if not keys:
+        return 0
+
+    full_keys = [_full_key(key, entity_type) for key in keys]
+    _l1_invalidate(full_keys)
+    if _redis_down:
+        _record_outage(full_keys, entity_type)
+        return _fallback.delete(full_keys)
+    message = _invalidation_message(keys=full_keys)
+    try:
+        pipe = _redis_client.pipeline(transaction=False)
+        _queue_deletes(pipe, full_keys)
+        if message is not None:
+            pipe.publish(INVALIDATION_CHANNEL, message)
+        return int(pipe.execute()[0])
+    except redis.RedisError as e:
+        track_cache_error("delete")
+        print(f"Redis error during delete: {e}")
+        _check_connection(e)
+        _check_scripts(e)
+        if _redis_down:
+            _record_outage(full_keys, entity_type)
+            return _fallback.delete(full_keys)
+        return 0
+
+def delete_matching(
+    pattern: str,
+    entity_type: str = "api",
+) -> int:
+    """
+    Remove all keys matching a glob pattern (SCAN, then DEL in batches).
     
-    prefix = prefix_map.get(entity_type.lower(), KEY_PREFIX_API)
-    full_key = f"{prefix}{key}"
+    Args:
+        pattern: Key pattern without prefix, e.g. 'admin:users:list:*'
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
     
+    Returns:
+        Number of keys that were removed.
+    """
+    if _redis_client is None:
+        raise RuntimeError("Redis cache not initialized. Call init() first.")
+
+    full_pattern = _full_key(pattern, entity_type)
+    for tier in _l1_tiers.values():
+        tier.delete_matching(full_pattern)
+    if _redis_down:
+        _record_outage([], entity_type, patterns=[full_pattern])
+        return _fallback.delete_matching(full_pattern)
+
+    removed = 0
     try:
-        # For risk scores and complex objects, serialize to JSON
-        if entity_type.lower() in ["risk", "network"] or isinstance(value, (dict, list)):
-            serialized_value = json.dumps(value)
-        else:
-            # For simple types, convert to string
-            serialized_value = str(value)
-        
-        if ttl is not None:
-            result = _redis_client.setex(full_key, ttl, serialized_value)
-        else:
-            result = _redis_client.set(full_key, serialized_value)
-        
-        return bool(result)
+        removed = _delete_scanned(full_pattern)
+        message = _invalidation_message(patterns=[full_pattern])
+        if message is not None:
+            _redis_client.publish(INVALIDATION_CHANNEL, message)
+    except redis.RedisError as e:
+        track_cache_error("delete")
+        print(f"Redis error during delete: {e}")
+        _check_connection(e)
+        if _redis_down:
+            _record_outage([], entity_type, patterns=[full_pattern])
+            removed += _fallback.delete_matching(full_pattern)
+    return removed
 
-    except (redis.RedisError, TypeError, ValueError) as e:
-        track_cache_error("set")
-        print(f"Redis error during set: {e}")
-        return False
\ No newline at end of file
+def _delete_scanned(full_pattern: str) -> int:
+    """Delete the Redis keys matching a pattern (SCAN, then DEL in batches of 500)."""
+    removed = 0
+    batch = []
+    for key in _redis_client.scan_iter(match=full_pattern, count=500):
+        batch.append(key)
+        if len(batch) >= 500:
+            removed += _delete_keys(batch)
+            batch = []
+    if batch:
+        removed += _delete_keys(batch)
+    return removed
+
+def _delete_keys(full_keys: List[str]) -> int:
+    """Delete keys and their quota records in one round-trip; returns the number deleted."""
+    pipe = _redis_client.pipeline(transaction=False)
+    _queue_deletes(pipe, full_keys)
+    return int(pipe.execute()[0])
+
+def set_cache_swr(
+    key: str,
+    value: Any,
+    entity_type: str = "api",
+    soft_ttl: int = 3600,
+    hard_ttl: int = 86400,
+) -> bool:
+    """
+    Store a value with a soft and a hard expiry (stale-while-revalidate).
+    
+    Args:
+        key: The cache key (without prefix)
+        value: The value to store (JSON serializable)
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+        soft_ttl: Seconds after which the value is stale and gets refreshed in the background
+        hard_ttl: Seconds after which the value is removed (Redis TTL)
+    
+    Returns:
+        True if successful, False otherwise.
+    """
+    envelope = {_SWR_FIELD: time.time() + soft_ttl, "value": value}
+    return set_cache(key, envelope, entity_type=entity_type, ttl=max(soft_ttl, hard_ttl))
+
+async def set_cache_swr_async(
+    key: str,
+    value: Any,
+    entity_type: str = "api",
+    soft_ttl: int = 3600,
+    hard_ttl: int = 86400,
+) -> bool:
+    """Async variant of set_cache_swr."""
+    envelope = {_SWR_FIELD: time.time() + soft_ttl, "value": value}
+    return await set_cache_async(key, envelope, entity_type=entity_type, ttl=max(soft_ttl, hard_ttl))
+
+def get_cache_swr(
+    key: str,
+    entity_type: str = "api",
+) -> Tuple[Optional[Any], bool]:
+    """
+    Retrieve a value written by set_cache_swr.
+    
+    Args:
+        key: The cache key (without prefix)
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+    
+    Returns:
+        (value, stale): value is None on a miss; stale is True once the soft expiry has passed.
+        Values written by set_cache are returned as stale, so they get rewritten with an expiry.
+    """
+    cached = get_cache(key, entity_type=entity_type)
+    if cached is None:
+        return None, False
+    return _unwrap_swr(cached, entity_type)
+
+async def get_cache_swr_async(
+    key: str,
+    entity_type: str = "api",
+) -> Tuple[Optional[Any], bool]:
+    """Async variant of get_cache_swr."""
+    cached = await get_cache_async(key, entity_type=entity_type)
+    if cached is None:
+        return None, False
+    return _unwrap_swr(cached, entity_type)
+
+def get_many_swr(
+    keys: List[str],
+    entity_type: str = "api",
+) -> Dict[str, Tuple[Any, bool]]:
+    """
+    Retrieve several values written by set_cache_swr in one round-trip.
+    
+    Args:
+        keys: Cache keys (without prefix)
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+    
+    Returns:
+        Dict mapping each found key to (value, stale); missing keys are left out.
+    """
+    return {key: _unwrap_swr(cached, entity_type) for key, cached in get_many(keys, entity_type=entity_type).items()}
+
+def _unwrap_swr(cached: Any, entity_type: str) -> Tuple[Any, bool]:
+    if isinstance(cached, dict) and _SWR_FIELD in cached:
+        stale = time.time() >= cached[_SWR_FIELD]
+        value = cached.get("value")
+    else:
+        stale, value = True, cached
+
+    if stale:
+        cache_stale_served_total.labels(entity_type=entity_type).inc()
+    return value, stale
+
+def is_not_found(value: Any) -> bool:
+    """True if a cached value is the NOT_FOUND marker of a negative entry."""
+    return isinstance(value, dict) and value.get(_NOT_FOUND_FIELD) is True
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refreshing_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=REFRESH_WORKERS,
+                    thread_name_prefix="cache-refresh",
+                )
+    return _refresh_executor
+
+# Delete a refresh lock or recompute lease only if it is still ours (it may have expired and been taken over)
+_LEASE_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def _run_refresh(
+    key: str,
+    entity_type: str,
+    compute: Callable[[], Any],
+    soft_ttl: int,
+    hard_ttl: int,
+    lock_key: str,
+    lock_token: str,
+    store: bool,
+) -> None:
+    try:
+        value = compute()
+        if value is not None and store:
+            set_cache_swr(key, value, entity_type=entity_type, soft_ttl=soft_ttl, hard_ttl=hard_ttl)
+        cache_background_refreshes_total.labels(result="ok").inc()
+    except Exception as e:
+        cache_background_refreshes_total.labels(result="error").inc()
+        print(f"Error refreshing cache key {key}: {e}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(lock_key)
+        if not _redis_down:
+            try:
+                _redis_client.eval(_LEASE_RELEASE_SCRIPT, 1, lock_key, lock_token)
+            except redis.RedisError:
+                pass
+
+def refresh_in_background(
+    key: str,
+    compute: Callable[[], Any],
+    entity_type: str = "api",
+    soft_ttl: int = 3600,
+    hard_ttl: int = 86400,
+    store: bool = True,
+) -> bool:
+    """
+    Recompute a stale value without blocking the caller.
+    At most one refresh per key runs at a time: per process (in-memory set) and across
+    replicas (a short-lived Redis lock). compute returning None leaves the cached value as is.
+    
+    Args:
+        key: The cache key (without prefix)
+        compute: Function returning the fresh value
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+        soft_ttl: Soft expiry of the refreshed value
+        hard_ttl: Hard expiry of the refreshed value
+        store: False if compute writes the value to the cache itself (the owner of the key)
+    
+    Returns:
+        True if a refresh was started, False if one is already running.
+    """
+    if _redis_client is None:
+        raise RuntimeError("Redis cache not initialized. Call init() first.")
+
+    lock_key = f"lock:refresh:{_full_key(key, entity_type)}"
+    with _refreshing_lock:
+        if lock_key in _refreshing:
+            return False
+        _refreshing.add(lock_key)
+
+    lock_token = uuid4().hex
+    if _redis_down:
+        # The refreshed value only goes to the fallback of this process
+        acquired = True
+    else:
+        try:
+            acquired = _redis_client.set(lock_key, lock_token, nx=True, ex=REFRESH_LOCK_TTL)
+        except redis.RedisError as e:
+            track_cache_error("set")
+            print(f"Redis error during refresh lock: {e}")
+            _check_connection(e)
+            acquired = False
+
+    if not acquired:
+        with _refreshing_lock:
+            _refreshing.discard(lock_key)
+        return False
+
+    cache_background_refreshes_total.labels(result="started").inc()
+    _get_refresh_executor().submit(_run_refresh, key, entity_type, compute, soft_ttl, hard_ttl, lock_key, lock_token, store)
+    return True
+
+def _jittered_ttl(ttl: int) -> int:
+    return max(1, int(ttl * (1 - TTL_JITTER * random.random())))
+
+def _computed_envelope(value: Any, ttl: int, compute_time: float) -> Dict[str, Any]:
+    return {_XFETCH_FIELD: [time.time() + ttl, compute_time], "value": value}
+
+def _unwrap_computed(cached: Any) -> Tuple[bool, Any, float, float]:
+    """(found, value, expires_at, compute time) of an entry written by get_or_compute."""
+    if isinstance(cached, dict) and _XFETCH_FIELD in cached:
+        expires_at, compute_time = cached[_XFETCH_FIELD]
+        return True, cached.get("value"), expires_at, compute_time
+    return False, None, 0.0, 0.0
+
+def _recompute_early(expires_at: float, compute_time: float, beta: float) -> bool:
+    # -log(U) for U uniform in (0, 1] is exponentially distributed with mean 1
+    return time.time() - compute_time * beta * math.log(1.0 - random.random()) >= expires_at
+
+def _recompute_lock_key(key: str, entity_type: str) -> str:
+    return f"lock:recompute:{_full_key(key, entity_type)}"
+
+def get_computed(key: str, entity_type: str = "api") -> Optional[Any]:
+    """The value of an entry written by get_or_compute, None on a miss."""
+    return _unwrap_computed(get_cache(key, entity_type=entity_type))[1]
+
+async def get_computed_async(key: str, entity_type: str = "api") -> Optional[Any]:
+    """Async variant of get_computed."""
+    return _unwrap_computed(await get_cache_async(key, entity_type=entity_type))[1]
+
+def get_or_compute(
+    key: str,
+    fn: Callable[[], Any],
+    ttl: int,
+    entity_type: str = "api",
+    beta: float = XFETCH_BETA,
+    lease: bool = False,
+) -> Any:
+    """
+    Return the cached value of key, computing and caching it with fn on a miss.
+
+    Protects expensive aggregates against cache stampedes: the time fn takes is stored with the
+    value, and each read recomputes it early with a probability that grows as the expiry gets
+    closer (XFetch), so usually a single request recomputes a hot key before it expires. The
+    TTL gets a random jitter. With lease=True an early recomputation also needs a short-lived
+    Redis lease, and callers without it keep getting the cached value. If an early
+    recomputation fails, the cached value is returned.
+
+    Args:
+        key: The cache key (without prefix)
+        fn: Function computing the value (JSON serializable)
+        ttl: Seconds the value is cached at most
+        entity_type: Type of entity ('api', 'db', 'network', or 'risk')
+        beta: Eagerness of early recomputation (0 disables it)
+        lease: Allow only one early recomputation of the key at a time across replicas
+
+    Returns:
+        The cached or computed value.
+    """
+    if _redis_client is None:
+        return fn()
+
+    found, value, expires_at, compute_time = _unwrap_computed(get_cache(key, entity_type=entity_type))
+    lock_key = None
+    lease_token = uuid4().hex
+    if found:
+        if not _recompute_early(expires_at, compute_time, beta):
+            return value
+        if lease and not _redis_down:
+            lock_key = _recompute_lock_key(key, entity_type)
+            try:
+                if not _redis_client.set(lock_key, lease_token, nx=True, ex=REFRESH_LOCK_TTL):
+                    return value
+            except redis.RedisError as e:
+                track_cache_error("set")
+                print(f"Redis error during recompute lease: {e}")
+                return value
+
+    cache_recomputes_total.labels(entity_type=entity_type, reason="early" if found else "miss").inc()
+    try:
+        started = time.perf_counter()
+        fresh = fn()
+        compute_time = time.perf_counter() - started
+        ttl = _jittered_ttl(ttl)
+        set_cache(key, _computed_envelope(fresh, ttl, compute_time), entity_type=entity_type, ttl=ttl)
+        return fresh
+    except Exception as e:
+        if not found:
+            raise
+        print(f"Error recomputing cache key {key}, serving the cached value: {e}")
+        return value
+    finally:
+        if lock_key is not None:
+            try:
+                _redis_client.eval(_LEASE_RELEASE_SCRIPT, 1, lock_key, lease_token)
+            except redis.RedisError:
+                pass
+
+async def get_or_compute_async(
+    key: str,
+    fn: Callable[[], Awaitable[Any]],
+    ttl: int,
+    entity_type: str = "api",
+    beta: float = XFETCH_BETA,
+    lease: bool = False,
+) -> Any:
+    """Async variant of get_or_compute; fn is a coroutine function."""
+    if _redis_client is None:
+        return await fn()
+
+    async def _lease_command(command: str, *args: Any, **kwargs: Any) -> Any:
+        client = get_async_client()
+        if client is None:
+            return await asyncio.to_thread(getattr(_redis_client, command), *args, **kwargs)
+        return await getattr(client, command)(*args, **kwargs)
+
+    found, value, expires_at, compute_time = _unwrap_computed(await get_cache_async(key, entity_type=entity_type))
+    lock_key = None
+    lease_token = uuid4().hex
+    if found:
+        if not _recompute_early(expires_at, compute_time, beta):
+            return value
+        if lease and not _redis_down:
+            lock_key = _recompute_lock_key(key, entity_type)
+            try:
+                if not await _lease_command("set", lock_key, lease_token, nx=True, ex=REFRESH_LOCK_TTL):
+                    return value
+            except redis.RedisError as e:
+                track_cache_error("set")
+                print(f"Redis error during recompute lease: {e}")
+                return value
+
+    cache_recomputes_total.labels(entity_type=entity_type, reason="early" if found else "miss").inc()
+    try:
+        started = time.perf_counter()
+        fresh = await fn()
+        compute_time = time.perf_counter() - started
+        ttl = _jittered_ttl(ttl)
+        await set_cache_async(key, _computed_envelope(fresh, ttl, compute_time), entity_type=entity_type, ttl=ttl)
+        return fresh
+    except Exception as e:
+        if not found:
+            raise
+        print(f"Error recomputing cache key {key}, serving the cached value: {e}")
+        return value
+    finally:
+        if lock_key is not None:
+            try:
+                await _lease_command("eval", _LEASE_RELEASE_SCRIPT, 1, lock_key, lease_token)
+            except redis.RedisError:
+                pass
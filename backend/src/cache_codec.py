@@ -0,0 +1,194 @@
+"""
+Encoding of cached values (see src/cache.py).
+
+Values are serialized with orjson or msgpack and compressed with zstd once the serialized
+payload exceeds BIZRAY_CACHE_COMPRESS_MIN_BYTES. Encoded payloads start with a header byte:
+    - the low bits name the format (FORMAT_ORJSON, FORMAT_MSGPACK, FORMAT_JSON);
+    - FLAG_ZSTD marks a compressed body.
+Entries written before this module, and by the plain 'json' codec without compression, are JSON
+text without a header. JSON text starts with a printable character or whitespace, never with
+one of the header bytes, so both kinds of entries are read back.
+
+orjson, msgpack and zstandard are optional: an unavailable codec falls back to json, and
+without zstandard nothing is compressed (compressed entries of other replicas read as misses).
+
+Example usage:
+    payload = encode({"company": {...}}, entity_type="db")
+    value = decode(payload, entity_type="db")
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .metrics import cache_codec_bytes_total, cache_codec_duration
+
+FORMAT_JSON = 0x01
+FORMAT_ORJSON = 0x02
+FORMAT_MSGPACK = 0x03
+FLAG_ZSTD = 0x80
+_FORMAT_MASK = 0x0F
+_HEADERS = {fmt | flag for fmt in (FORMAT_JSON, FORMAT_ORJSON, FORMAT_MSGPACK) for flag in (0, FLAG_ZSTD)}
+
+# Serialization of new entries: 'orjson', 'msgpack' or 'json' (the format of old entries)
+CACHE_CODEC = os.getenv("BIZRAY_CACHE_CODEC", "orjson").lower()
+# Payloads of at least this many bytes are compressed with zstd (0 disables compression)
+COMPRESS_MIN_BYTES = int(os.getenv("BIZRAY_CACHE_COMPRESS_MIN_BYTES", "1024"))
+ZSTD_LEVEL = int(os.getenv("BIZRAY_CACHE_ZSTD_LEVEL", "3"))
+
+# Non-string dict keys and numpy values (risk indicators) are serialized like json.dumps does
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+class CodecError(ValueError):
+    """A cached payload could not be decoded."""
+
+
+def _codec_format(codec: str) -> int:
+    if codec == "orjson" and orjson is not None:
+        return FORMAT_ORJSON
+    if codec == "msgpack" and msgpack is not None:
+        return FORMAT_MSGPACK
+    if codec not in ("json", "orjson", "msgpack"):
+        print(f"Unknown cache codec {codec}, using json")
+    return FORMAT_JSON
+
+
+_format = _codec_format(CACHE_CODEC)
+# zstd (de)compressors must not be shared between threads
+_zstd = threading.local()
+
+
+def _compressor():
+    if not hasattr(_zstd, "compressor"):
+        _zstd.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _zstd.compressor
+
+
+def _decompressor():
+    if not hasattr(_zstd, "decompressor"):
+        _zstd.decompressor = zstandard.ZstdDecompressor()
+    return _zstd.decompressor
+
+
+def _serialize(value: Any, fmt: int) -> bytes:
+    if fmt == FORMAT_ORJSON:
+        return orjson.dumps(value, option=_ORJSON_OPTIONS)
+    if fmt == FORMAT_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value).encode("utf-8")
+
+
+def _deserialize(body: bytes, fmt: int) -> Any:
+    if fmt == FORMAT_ORJSON:
+        if orjson is None:
+            return json.loads(body)
+        return orjson.loads(body)
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise CodecError("msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if fmt == FORMAT_JSON:
+        return json.loads(body)
+    raise CodecError(f"Unknown cache payload format {fmt}")
+
+
+def encode(value: Any, entity_type: str = "api") -> bytes:
+    """
+    Serialize a value for Redis.
+
+    Args:
+        value: JSON-compatible value
+        entity_type: Metric label
+
+    Returns:
+        The payload (header byte + body, or plain JSON text for the uncompressed json codec).
+    """
+    started = time.perf_counter()
+    body = _serialize(value, _format)
+    serialized_size = len(body)
+    header = _format
+
+    if zstandard is not None and 0 < COMPRESS_MIN_BYTES <= serialized_size:
+        compressed = _compressor().compress(body)
+        if len(compressed) < serialized_size:
+            header |= FLAG_ZSTD
+            body = compressed
+
+    if header == FORMAT_JSON:
+        # Readable by processes without this module
+        payload = body
+    else:
+        payload = bytes((header,)) + body
+
+    cache_codec_bytes_total.labels(entity_type=entity_type, stage="serialized").inc(serialized_size)
+    cache_codec_bytes_total.labels(entity_type=entity_type, stage="stored").inc(len(payload))
+    cache_codec_duration.labels(entity_type=entity_type, operation="encode").observe(time.perf_counter() - started)
+    return payload
+
+
+def serialized_size(payload: Union[bytes, str]) -> int:
+    """Size of the serialized value in a payload before compression (for memory budgets)."""
+    if payload and isinstance(payload, bytes) and payload[0] in _HEADERS and payload[0] & FLAG_ZSTD:
+        if zstandard is not None:
+            size = zstandard.frame_content_size(payload[1:])
+            if size > 0:
+                return size
+    return len(payload)
+
+
+def decode(payload: Union[bytes, str], entity_type: str = "api") -> Any:
+    """
+    Decode a payload written by encode, or by set_cache before this module (plain text).
+
+    Raises:
+        CodecError: if the payload has an unknown format or cannot be decompressed
+    """
+    started = time.perf_counter()
+    try:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if not payload:
+            return ""
+
+        header = payload[0]
+        if header not in _HEADERS:
+            # No header: JSON text, or a plain string of an old entry
+            try:
+                return json.loads(payload)
+            except ValueError:
+                return payload.decode("utf-8")
+
+        body = payload[1:]
+        if header & FLAG_ZSTD:
+            if zstandard is None:
+                raise CodecError("zstandard is not installed")
+            try:
+                body = _decompressor().decompress(body)
+            except zstandard.ZstdError as e:
+                raise CodecError(f"Corrupt compressed cache payload: {e}") from e
+        try:
+            return _deserialize(body, header & _FORMAT_MASK)
+        except CodecError:
+            raise
+        except ValueError as e:
+            raise CodecError(f"Corrupt cache payload: {e}") from e
+    finally:
+        cache_codec_duration.labels(entity_type=entity_type, operation="decode").observe(time.perf_counter() - started)
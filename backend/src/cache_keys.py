@@ -0,0 +1,157 @@
+"""
+Key schema of the Redis cache.
+
+Every cached value belongs to one key family. A family has exactly one owning layer, the only
+code that writes it; other code may read it or invalidate it, but never caches the same data
+under a key of its own. Keys are built as '{name}:v{version}:{parts...}' (plus the entity type
+prefix added by src/cache.py), so changing the format of a family's values only needs a version
+bump: old entries are simply no longer read and expire on their own.
+
+Parts are canonicalized, so equivalent request parameters share one entry, and keys built from
+long user input are shortened to a hash. Families keyed by user input have quotas (number of
+keys and payload bytes); src/cache.py evicts their entries closest to expiry once a quota is
+exceeded, so crawler traffic cannot grow the cache without bound.
+
+Example usage:
+    from src.cache_keys import COMPANY
+    value, stale = get_cache_swr(COMPANY.key(fnr), entity_type=COMPANY.entity_type)
+"""
+
+import hashlib
+import os
+import re
+from typing import Any, Dict, Optional
+
+from .local_cache import parse_size
+
+# Keys (without entity prefix) longer than this end in a hash of their parts instead
+MAX_KEY_LENGTH = int(os.getenv("BIZRAY_CACHE_MAX_KEY_LENGTH", "200"))
+# Quotas overriding the defaults below: 'family=max_keys/max_bytes,...', e.g.
+# 'search=20000/128MB,cities=2000/32MB' (0 disables a limit)
+QUOTAS = os.getenv("BIZRAY_CACHE_QUOTAS", "")
+
+# Characters with a meaning in keys: part separator, list separator, escape and hash marker
+_ESCAPES = str.maketrans({"%": "%25", ":": "%3A", ",": "%2C", "#": "%23"})
+_FAMILY_KEY = re.compile(r"^(.+?):v(\d+)(?::|$)")
+
+
+class KeyFamily:
+    """A family of cache keys with its entity type, owning layer, format version and quotas."""
+
+    def __init__(
+        self,
+        name: str,
+        entity_type: str,
+        owner: str,
+        version: int = 1,
+        max_keys: int = 0,
+        max_bytes: int = 0,
+    ):
+        self.name = name
+        self.entity_type = entity_type
+        self.owner = owner
+        self.version = version
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+
+    def key(self, *parts: Any) -> str:
+        """
+        Cache key (without entity prefix) of the value identified by parts.
+
+        None becomes '', booleans '1'/'0', lists and sets their sorted distinct items, and
+        separators in strings are escaped. Keys longer than MAX_KEY_LENGTH end in a hash of
+        the parts.
+        """
+        key = ":".join([self.name, f"v{self.version}", *(self._canonical(part) for part in parts)])
+        if len(key) <= MAX_KEY_LENGTH:
+            return key
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{self.name}:v{self.version}:#{digest}"
+
+    def pattern(self) -> str:
+        """Glob pattern matching all keys of the current version of the family."""
+        return f"{self.name}:v{self.version}:*"
+
+    @property
+    def has_quota(self) -> bool:
+        return self.max_keys > 0 or self.max_bytes > 0
+
+    def _canonical(self, part: Any) -> str:
+        if part is None:
+            return ""
+        if isinstance(part, bool):
+            return "1" if part else "0"
+        if isinstance(part, (list, tuple, set, frozenset)):
+            return ",".join(sorted({self._canonical(item) for item in part}))
+        if isinstance(part, str):
+            return part.translate(_ESCAPES)
+        return str(part)
+
+
+FAMILIES: Dict[str, KeyFamily] = {}
+
+def _family(name: str, entity_type: str, owner: str, version: int = 1, **options: Any) -> KeyFamily:
+    if name in FAMILIES:
+        raise ValueError(f"Cache key family {name} is declared twice")
+    FAMILIES[name] = KeyFamily(name, entity_type, owner, version, **options)
+    return FAMILIES[name]
+
+def family_of(key: str) -> Optional[KeyFamily]:
+    """Family of a cache key (without entity prefix), None for keys of no (current) family."""
+    match = _FAMILY_KEY.match(key)
+    if match is None:
+        return None
+    family = FAMILIES.get(match.group(1))
+    if family is None or family.version != int(match.group(2)):
+        return None
+    return family
+
+def _apply_quotas(spec: str) -> None:
+    for entry in filter(None, (entry.strip() for entry in spec.split(","))):
+        name, _, limits = entry.partition("=")
+        family = FAMILIES.get(name.strip())
+        if family is None:
+            print(f"Unknown cache key family {name} in BIZRAY_CACHE_QUOTAS")
+            continue
+        max_keys, _, max_bytes = limits.partition("/")
+        family.max_keys = int(max_keys or 0)
+        family.max_bytes = parse_size(max_bytes) if max_bytes.strip() else 0
+
+
+# Company detail (serialized company in a stale-while-revalidate envelope), shared by the detail
+# route, batch lookups, exports, recommendations and screening jobs
+COMPANY = _family("company", "db", owner="src.controller", version=2)
+COMPANY_HISTORY = _family("company_history", "db", owner="src.controller")
+RISK_INDICATORS = _family("risk_indicators", "risk", owner="src.controller")
+# Total number of search hits, shared by all pages of a search
+SEARCH_AMOUNT = _family(
+    "search_amount", "db", owner="src.controller", version=2,
+    max_keys=50000, max_bytes=parse_size("8MB"),
+)
+URKUNDE_LISTING = _family("urkunde_listing", "db", owner="src.api.queries")
+
+# Route responses
+SEARCH = _family(
+    "search", "api", owner="api.get_companies", version=2,
+    max_keys=20000, max_bytes=parse_size("128MB"),
+)
+SEARCH_SUGGESTIONS = _family(
+    "search_suggestions", "api", owner="api.search_suggestions", version=2,
+    max_keys=20000, max_bytes=parse_size("32MB"),
+)
+PERSON_SEARCH = _family(
+    "person", "api", owner="api.get_persons", version=2,
+    max_keys=20000, max_bytes=parse_size("64MB"),
+)
+CITIES = _family(
+    "cities", "api", owner="api.get_cities", version=2,
+    max_keys=2000, max_bytes=parse_size("64MB"),
+)
+METRICS = _family("metrics", "api", owner="api.get_metrics_endpoint")
+TRENDING = _family("recommendations:trending", "api", owner="api.get_recommendations")
+NETWORK = _family("network", "network", owner="api.get_network_graph")
+ADMIN_USERS_LIST = _family("admin:users:list", "api", owner="admin_api")
+ADMIN_USER = _family("admin:user", "api", owner="admin_api")
+ADMIN_METRICS = _family("admin:metrics", "api", owner="admin_api")
+
+_apply_quotas(QUOTAS)
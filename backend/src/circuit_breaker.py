@@ -0,0 +1,179 @@
+"""
+Circuit breaker for calls to external services (the Justiz SOAP API).
+
+While the service fails or answers slowly, every call would wait out its timeout. The breaker
+watches the calls of a rolling time window and opens once enough of them failed or were slow:
+    - closed: calls go through, outcomes are recorded;
+    - open: calls are refused right away for BIZRAY_SOAP_BREAKER_OPEN_SECONDS;
+    - half-open: a few probe calls go through; a successful probe closes the breaker,
+      a failed one opens it again.
+
+Example usage:
+    if not justiz_breaker.allow_request():
+        return None
+    start = time.time()
+    try:
+        response = call()
+    except Exception:
+        justiz_breaker.record_failure(time.time() - start)
+        raise
+    justiz_breaker.record_success(time.time() - start)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Tuple
+
+from .metrics import circuit_breaker_state, circuit_breaker_transitions_total, circuit_breaker_rejected_total
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Gauge values of the states
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Calls of the last WINDOW seconds are considered, once there are at least MIN_CALLS of them
+BREAKER_WINDOW = float(os.getenv("BIZRAY_SOAP_BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BIZRAY_SOAP_BREAKER_MIN_CALLS", "10"))
+# Share of failed calls, and of calls slower than SLOW_CALL seconds, that opens the breaker
+BREAKER_FAILURE_RATE = float(os.getenv("BIZRAY_SOAP_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL = float(os.getenv("BIZRAY_SOAP_BREAKER_SLOW_CALL", "10"))
+BREAKER_SLOW_RATE = float(os.getenv("BIZRAY_SOAP_BREAKER_SLOW_RATE", "0.8"))
+# Seconds the breaker stays open before probing, and the number of concurrent probes
+BREAKER_OPEN_SECONDS = float(os.getenv("BIZRAY_SOAP_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BIZRAY_SOAP_BREAKER_HALF_OPEN_PROBES", "2"))
+
+
+class CircuitOpenError(Exception):
+    """A call was refused because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker with failure-rate and latency thresholds."""
+
+    def __init__(
+        self,
+        name: str,
+        window: float = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_call: float = BREAKER_SLOW_CALL,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (finished at, failed, slow) of the calls in the window
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        circuit_breaker_state.labels(name=name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state(time.monotonic())
+            return self._state
+
+    def is_open(self) -> bool:
+        """Whether calls are currently refused (the service is considered unavailable)."""
+        return self.state == OPEN
+
+    def allow_request(self, operation: str = "call") -> bool:
+        """
+        Decide whether a call may go through. Every allowed call must be followed by
+        record_success, record_failure or release.
+
+        Args:
+            operation: Metric label of refused calls
+
+        Returns:
+            True if the call may be made, False if it is refused.
+        """
+        with self._lock:
+            self._update_state(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+        circuit_breaker_rejected_total.labels(name=self.name, operation=operation).inc()
+        return False
+
+    def record_success(self, duration: float) -> None:
+        """Record a call that was answered (a slow answer counts against the latency threshold)."""
+        self._record(failed=False, slow=duration >= self.slow_call)
+
+    def record_failure(self, duration: float) -> None:
+        """Record a call that failed (connection error, timeout, server error)."""
+        self._record(failed=True, slow=duration >= self.slow_call)
+
+    def release(self) -> None:
+        """Give back an allowed call without an outcome (e.g. it was cancelled)."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._update_state(now)
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed or slow:
+                    self._transition(OPEN, now)
+                else:
+                    self._transition(CLOSED, now)
+                return
+            if self._state == OPEN:
+                # Calls started before the breaker opened
+                return
+
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slow_calls = sum(1 for _, _, s in self._calls if s)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_rate:
+                self._transition(OPEN, now)
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _update_state(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN, now)
+
+    def _transition(self, state: str, now: float) -> None:
+        if state == self._state:
+            return
+        if state == OPEN:
+            self._opened_at = now
+            print(f"Circuit breaker {self.name} opened")
+        elif state == CLOSED:
+            print(f"Circuit breaker {self.name} closed")
+        self._state = state
+        self._probes = 0
+        self._calls.clear()
+        circuit_breaker_state.labels(name=self.name).set(_STATE_VALUES[state])
+        circuit_breaker_transitions_total.labels(name=self.name, state=state).inc()
+
+
+# Shared breaker for all calls to the Justiz SOAP API of this process
+justiz_breaker = CircuitBreaker("justiz")
@@ -1,17 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
-import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from sqlalchemy import or_, and_, select, func
+from sqlalchemy import or_, and_, select, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
 
-from .api.queries import calculate_risk_indicators, get_company_urkunde, get_urkunde_content, get_all_urkunde_contents
-from .cache import get_cache, set_cache
+from .api.queries import (
+    calculate_risk_indicators,
+    get_company_urkunde,
+    get_urkunde_content,
+    get_all_urkunde_contents,
+    get_latest_urkunde_contents,
+    order_urkunden,
+    plan_urkunde_fetch,
+)
+from .cache import NOT_FOUND, is_not_found, get_cache, get_cache_swr, get_cache_swr_async, get_many_swr, refresh_in_background, set_cache, set_cache_swr, set_cache_swr_async
+from .cache_keys import COMPANY, COMPANY_HISTORY, RISK_INDICATORS, SEARCH_AMOUNT
+from .circuit_breaker import justiz_breaker
+from .metrics import cache_negative_entries_total
 
 from .db import (
+    AsyncSessionLocal,
     SessionLocal,
     Company,
     Address,
@@ -20,12 +35,37 @@ from .db import (
     RiskIndicator,
 )
 
+# Without a risk worker (e.g. local development) compute missing risk data on the request path
+RISK_ON_REQUEST = os.getenv("BIZRAY_RISK_ON_REQUEST", "0") == "1"
+# Company detail cache: served as-is until the soft expiry, served stale and refreshed
+# in the background until the hard expiry
+COMPANY_SOFT_TTL = int(os.getenv("BIZRAY_COMPANY_SOFT_TTL", "7200"))
+COMPANY_HARD_TTL = int(os.getenv("BIZRAY_COMPANY_HARD_TTL", "86400"))
+# Detail views whose risk data is still pending are refreshed sooner
+COMPANY_PENDING_SOFT_TTL = int(os.getenv("BIZRAY_COMPANY_PENDING_SOFT_TTL", "60"))
+# Unknown company IDs are cached as not found for this long (ingestion drops the entries of
+# companies it inserts), so probing random IDs does not reach Postgres
+COMPANY_NOT_FOUND_TTL = int(os.getenv("BIZRAY_COMPANY_NOT_FOUND_TTL", "300"))
+
 def _serialize_date(value: Optional[date]) -> Optional[str]:
     """Serialize a date to an ISO string."""
     if value is None:
         return None
     return value.isoformat()
 
+def _risk_status(company: Company) -> str:
+    """'pending' while the risk data of a company has not been computed yet, 'ok' otherwise."""
+    if getattr(company, '_risk_indicators_dict', None) is not None or company.risk_computed_at is not None:
+        return "ok"
+    return "pending"
+
+def company_soft_ttl(company: Dict[str, Any]) -> int:
+    """
+    Soft expiry of a cached detail view. Views without risk data (not computed yet, or skipped
+    because of an open circuit breaker) are refreshed soon.
+    """
+    return COMPANY_PENDING_SOFT_TTL if company.get("riskStatus") == "pending" else COMPANY_SOFT_TTL
+
 def _serialize_company(company: Company) -> Dict[str, Any]:
     """Serialize a company to a dictionary."""
     address_dict: Optional[Dict[str, Any]] = None
@@ -83,6 +123,7 @@ def _serialize_company(company: Company) -> Dict[str, Any]:
         "registry_entries": registry_entries_list,
         "riskScore": float(company.risk_score) if company.risk_score is not None else None,
         "riskIndicators": risk_indicators_dict,
+        "riskStatus": _risk_status(company),
         "reference_date": _serialize_date(company.reference_date),
     }
 
@@ -96,19 +137,288 @@ def _serialize_company_list_item(company: Company) -> Dict[str, Any]:
         "seat": company.seat,
     }
 
-def get_company_by_id(company_id: str, session: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+def compute_company_risk(company: Company) -> Optional[Tuple[Dict[str, Any], Optional[float]]]:
+    """
+    Calculate the risk indicators of a (fully loaded) company from its Urkunden.
+    Calls the Justiz API for documents that are not stored yet. Only touches already loaded
+    attributes, so it can run in a worker thread while the session stays with the caller.
+    Returns (indicators, risk_score), or None if the company has no usable documents.
+    """
+    company_id = company.firmenbuchnummer
+
+    # calculate risk indicators result
+    company_urkunde = get_company_urkunde(company_id)
+    if company_urkunde is None:
+        return None
+
+    # Only the periods the indicators need are fetched; the Urkunde KEYs are immutable,
+    # so they identify the risk result without downloading anything
+    needed_urkunde, _ = plan_urkunde_fetch(company_urkunde)
+    urkunde_hash = hashlib.md5(
+        "|".join(u.KEY for u in needed_urkunde).encode('utf-8')
+    ).hexdigest()[:16]
+    risk_cache_key = RISK_INDICATORS.key(company_id, urkunde_hash)
+
+    cached_risk = None
+    try:
+        cached_risk = get_cache(risk_cache_key, entity_type=RISK_INDICATORS.entity_type)
+    except Exception:
+        pass
+
+    if cached_risk is not None:
+        risk_data, risk_score = cached_risk
+    else:
+        # Oldest first: [previous period, latest period]
+        urkunde_docs = get_latest_urkunde_contents(company_urkunde, fnr=company_id)
+        if not urkunde_docs:
+            return None
+
+        # Pass latest entry for most indicators, the previous period as history, and registry entries for compliance
+        risk_data, risk_score = calculate_risk_indicators(
+            urkunde_docs[-1],
+            historical_data=urkunde_docs,
+            registry_entries=list(company.registry_entries or [])
+        )
+        try:
+            set_cache(risk_cache_key, (risk_data, risk_score), entity_type=RISK_INDICATORS.entity_type, ttl=86400)
+        except Exception:
+            pass
+
+    indicators = {k: float(v) if v is not None else None for k, v in risk_data.items()}
+    return indicators, float(risk_score) if risk_score is not None else None
+
+def _attach_risk_indicators(company: Company) -> None:
+    """
+    Attach risk indicators to a loaded company for the detail view.
+    The values stored by the risk worker are used as they are; the Justiz API is only called
+    on the request path when BIZRAY_RISK_ON_REQUEST is enabled, nothing is stored yet and the
+    Justiz circuit breaker is not open.
+    """
+    if company.risk_computed_at is not None or not RISK_ON_REQUEST:
+        return
+    if justiz_breaker.is_open():
+        # Serve the registry data right away; without risk data the view reports riskStatus 'pending'
+        return
+
+    risk = compute_company_risk(company)
+    if risk is None:
+        return
+    company._risk_indicators_dict, company.risk_score = risk
+
+def _company_detail_stmt(company_id: str):
+    """Select a company with everything the detail view serializes."""
+    return (
+        select(Company)
+        .options(
+            selectinload(Company.address),
+            selectinload(Company.partners),
+            selectinload(Company.registry_entries),
+            selectinload(Company.risk_indicators)
+        )
+        .where(Company.firmenbuchnummer == company_id)
+    )
+
+def get_cached_company(company_id: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    (serialized company, stale) from the detail cache; the company is None on a miss and
+    NOT_FOUND for an unknown company (see is_not_found).
+    """
+    cached, stale = get_cache_swr(COMPANY.key(company_id), entity_type=COMPANY.entity_type)
+    if is_not_found(cached):
+        cache_negative_entries_total.labels(family=COMPANY.name, event="hit").inc()
+    return cached, stale
+
+async def get_cached_company_async(company_id: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Async variant of get_cached_company."""
+    cached, stale = await get_cache_swr_async(COMPANY.key(company_id), entity_type=COMPANY.entity_type)
+    if is_not_found(cached):
+        cache_negative_entries_total.labels(family=COMPANY.name, event="hit").inc()
+    return cached, stale
+
+def _company_ttls(serialized: Dict[str, Any]) -> Tuple[int, int]:
+    """(soft, hard) expiry of a detail cache entry; negative entries are never served stale."""
+    if is_not_found(serialized):
+        cache_negative_entries_total.labels(family=COMPANY.name, event="stored").inc()
+        return COMPANY_NOT_FOUND_TTL, COMPANY_NOT_FOUND_TTL
+    return company_soft_ttl(serialized), COMPANY_HARD_TTL
+
+def _cache_company(company_id: str, serialized: Dict[str, Any]) -> None:
+    """Store a detail view, or NOT_FOUND for an unknown company."""
+    soft_ttl, hard_ttl = _company_ttls(serialized)
+    try:
+        set_cache_swr(
+            COMPANY.key(company_id), serialized, entity_type=COMPANY.entity_type,
+            soft_ttl=soft_ttl, hard_ttl=hard_ttl,
+        )
+    except Exception:
+        pass
+
+async def _cache_company_async(company_id: str, serialized: Dict[str, Any]) -> None:
+    soft_ttl, hard_ttl = _company_ttls(serialized)
+    try:
+        await set_cache_swr_async(
+            COMPANY.key(company_id), serialized, entity_type=COMPANY.entity_type,
+            soft_ttl=soft_ttl, hard_ttl=hard_ttl,
+        )
+    except Exception:
+        pass
+
+def _cached_company_result(cached: Optional[Dict[str, Any]]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """(found, company) of a detail cache lookup; a negative entry is found with company None."""
+    if is_not_found(cached):
+        cache_negative_entries_total.labels(family=COMPANY.name, event="hit").inc()
+        return True, None
+    return cached is not None, cached
+
+def get_company_by_id(company_id: str, session: Optional[Session] = None, refresh: bool = False) -> Optional[Dict[str, Any]]:
     """
     Fetch a single company by its firmenbuchnummer and return it serialized to the schema.
+    This is the owner of the company detail cache (key family COMPANY): cached views are
+    returned even after their soft expiry, the detail route refreshes them. Unknown IDs are
+    cached as NOT_FOUND for COMPANY_NOT_FOUND_TTL seconds.
+    With refresh=True the cached result is ignored and replaced.
     """
-    cache_key = f"db_company_by_id:{company_id}"
+    if not refresh:
+        try:
+            cached_result, _ = get_cached_company(company_id)
+            if cached_result is not None:
+                return None if is_not_found(cached_result) else cached_result
+        except Exception:
+            pass
     
+    owns_session = False
+    if session is None:
+        session = SessionLocal()
+        owns_session = True
     try:
-        cached_result = get_cache(cache_key, entity_type="db")
+        result = session.execute(_company_detail_stmt(company_id)).scalars().first()
+        if result is None:
+            _cache_company(company_id, NOT_FOUND)
+            return None
+
+        _attach_risk_indicators(result)
+        serialized_result = _serialize_company(result)
+        _cache_company(company_id, serialized_result)
+        return serialized_result
+    finally:
+        if owns_session:
+            session.close()
+
+async def get_company_by_id_async(company_id: str, session: Optional[AsyncSession] = None, refresh: bool = False) -> Optional[Dict[str, Any]]:
+    """Async variant of get_company_by_id using the async engine."""
+    if not refresh:
+        try:
+            cached_result, _ = await get_cached_company_async(company_id)
+            if cached_result is not None:
+                return None if is_not_found(cached_result) else cached_result
+        except Exception:
+            pass
+
+    owns_session = False
+    if session is None:
+        session = AsyncSessionLocal()
+        owns_session = True
+    try:
+        result = (await session.execute(_company_detail_stmt(company_id))).scalars().first()
+        if result is None:
+            await _cache_company_async(company_id, NOT_FOUND)
+            return None
+
+        # Only calls the Justiz API when BIZRAY_RISK_ON_REQUEST is enabled
+        await asyncio.to_thread(_attach_risk_indicators, result)
+        serialized_result = _serialize_company(result)
+        await _cache_company_async(company_id, serialized_result)
+        return serialized_result
+    finally:
+        if owns_session:
+            await session.close()
+
+def get_company_financial_history(company_id: str, session: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fetch all financial statements (parsed Urkunden) of a company, oldest first.
+    The detail view only downloads the periods the risk indicators need; this loads the rest on demand.
+    Returns None if the company does not exist.
+    """
+    cache_key = COMPANY_HISTORY.key(company_id)
+
+    try:
+        cached_result = get_cache(cache_key, entity_type=COMPANY_HISTORY.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
         pass
-    
+
+    owns_session = False
+    if session is None:
+        session = SessionLocal()
+        owns_session = True
+    try:
+        exists = session.execute(
+            select(Company.id).where(Company.firmenbuchnummer == company_id)
+        ).first()
+        if exists is None:
+            return None
+    finally:
+        if owns_session:
+            session.close()
+
+    company_urkunde = get_company_urkunde(company_id)
+    financials = get_all_urkunde_contents(order_urkunden(company_urkunde), fnr=company_id) if company_urkunde else []
+
+    result = {"firmenbuchnummer": company_id, "financials": financials}
+
+    # A history missing documents because the Justiz API is unavailable is not cached
+    if not justiz_breaker.is_open():
+        try:
+            set_cache(cache_key, result, entity_type=COMPANY_HISTORY.entity_type, ttl=86400)
+        except Exception:
+            pass
+
+    return result
+
+def iter_companies_by_ids(
+    company_ids: List[str],
+    session: Optional[Session] = None,
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Fetch several companies by firmenbuchnummer and yield (company_id, serialized company) pairs
+    as soon as each one is ready. Unknown ids are yielded with None.
+
+    Cached companies are read with a single MGET, the misses are loaded with a single
+    eager-loading IN query and their Urkunde/risk data is fetched in parallel.
+    Results are yielded in completion order, not in request order.
+    """
+    # Deduplicate while keeping the request order
+    company_ids = list(dict.fromkeys(company_ids))
+    if not company_ids:
+        return
+
+    if max_workers is None:
+        max_workers = int(os.getenv("BIZRAY_BATCH_WORKERS", "8"))
+
+    cached: Dict[str, Tuple[Any, bool]] = {}
+    try:
+        cached = get_many_swr([COMPANY.key(cid) for cid in company_ids], entity_type=COMPANY.entity_type)
+    except Exception:
+        pass
+
+    missing_ids: List[str] = []
+    for cid in company_ids:
+        cached_company, stale = cached.get(COMPANY.key(cid), (None, False))
+        found, cached_result = _cached_company_result(cached_company)
+        if found:
+            if stale and cached_result is not None:
+                _refresh_cached_company(cid)
+            yield cid, cached_result
+        else:
+            missing_ids.append(cid)
+
+    if not missing_ids:
+        return
+
+    # The misses are loaded before the first of them is yielded, so the pooled connection is
+    # not held while the caller streams the results; the loaded objects stay usable detached
     owns_session = False
     if session is None:
         session = SessionLocal()
@@ -122,61 +432,120 @@ def get_company_by_id(company_id: str, session: Optional[Session] = None) -> Opt
                 selectinload(Company.registry_entries),
                 selectinload(Company.risk_indicators)
             )
-            .where(Company.firmenbuchnummer == company_id)
+            .where(Company.firmenbuchnummer.in_(missing_ids))
         )
-        result = session.execute(stmt).scalars().first()
-        if result is None:
-            return None
+        companies = {c.firmenbuchnummer: c for c in session.execute(stmt).scalars().all()}
+    finally:
+        if owns_session:
+            session.close()
 
-        # calculate risk indicators result
-        company_urkunde = get_company_urkunde(company_id)
-        if company_urkunde is not None:
-            # Parse all urkunde entries
-            all_urkunde_docs = get_all_urkunde_contents(company_urkunde)
-            
-            if all_urkunde_docs and len(all_urkunde_docs) > 0:
-                # Use the latest entry (last in list) for risk indicators
-                latest_urkunde_doc = all_urkunde_docs[-1]
-                
-                urkunde_hash = hashlib.md5(
-                    json.dumps(latest_urkunde_doc, sort_keys=True).encode('utf-8')
-                ).hexdigest()[:16]
-                risk_cache_key = f"risk_indicators:{company_id}:{urkunde_hash}"
-                
-                cached_risk = None
-                try:
-                    cached_risk = get_cache(risk_cache_key, entity_type="risk")
-                except Exception:
-                    pass
-                
-                if cached_risk is not None:
-                    risk_data, risk_score = cached_risk
-                else:
-                    # Pass latest entry for most indicators, historical data for future use, and registry entries for compliance
-                    risk_data, risk_score = calculate_risk_indicators(
-                        latest_urkunde_doc, 
-                        historical_data=all_urkunde_docs,
-                        registry_entries=list(result.registry_entries or [])
-                    )
-                    try:
-                        set_cache(risk_cache_key, (risk_data, risk_score), entity_type="risk", ttl=86400)
-                    except Exception:
-                        pass
-                
-                result._risk_indicators_dict = {k: float(v) if v is not None else None for k, v in risk_data.items()}
-                result.risk_score = risk_score
-        serialized_result = _serialize_company(result)
-        
-        try:
-            set_cache(cache_key, serialized_result, entity_type="db", ttl=7200)
-        except Exception:
-            pass
-        
-        return serialized_result
+    for cid in missing_ids:
+        if cid not in companies:
+            _cache_company(cid, NOT_FOUND)
+            yield cid, None
+
+    if not companies:
+        return
+
+    def _load(company: Company) -> Dict[str, Any]:
+        _attach_risk_indicators(company)
+        serialized = _serialize_company(company)
+        _cache_company(company.firmenbuchnummer, serialized)
+        return serialized
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(companies)))) as executor:
+        futures = {executor.submit(_load, company): cid for cid, company in companies.items()}
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                yield cid, future.result()
+            except Exception as e:
+                print(f"Error loading company {cid} in batch: {e}")
+                # Fall back to the registry data without risk indicators
+                yield cid, _serialize_company(companies[cid])
+
+def _refresh_cached_company(company_id: str) -> None:
+    """Refresh a detail view past its soft expiry in the background (get_company_by_id writes it)."""
+    try:
+        refresh_in_background(
+            COMPANY.key(company_id),
+            lambda: get_company_by_id(company_id, refresh=True),
+            entity_type=COMPANY.entity_type,
+            store=False,
+        )
+    except Exception as e:
+        print(f"Error starting refresh of company {company_id}: {e}")
+
+def get_company_names(company_ids: List[str], session: Optional[Session] = None) -> Dict[str, str]:
+    """
+    Names of several companies by firmenbuchnummer. Cached detail views are read with a single
+    MGET, the others with a single query. Unknown ids are left out.
+    """
+    company_ids = list(dict.fromkeys(company_ids))
+    if not company_ids:
+        return {}
+
+    names: Dict[str, str] = {}
+    unknown = set()
+    try:
+        cached = get_many_swr([COMPANY.key(cid) for cid in company_ids], entity_type=COMPANY.entity_type)
+        for cid in company_ids:
+            found, company = _cached_company_result(cached.get(COMPANY.key(cid), (None, False))[0])
+            if company:
+                names[cid] = company.get("name") or "Unknown"
+            elif found:
+                unknown.add(cid)
+    except Exception:
+        pass
+
+    missing_ids = [cid for cid in company_ids if cid not in names and cid not in unknown]
+    if not missing_ids:
+        return names
+
+    owns_session = False
+    if session is None:
+        session = SessionLocal()
+        owns_session = True
+    try:
+        rows = session.execute(
+            select(Company.firmenbuchnummer, Company.name).where(Company.firmenbuchnummer.in_(missing_ids))
+        ).all()
+        names.update({row.firmenbuchnummer: row.name or "Unknown" for row in rows})
+        return names
     finally:
         if owns_session:
             session.close()
 
+def _search_stmt(query: str, page: int, page_size: int, city: Optional[List[str]]):
+    """Select one page of companies matching the query, optionally filtered by cities."""
+    like = f"%{query}%"
+    filters = or_(
+        Company.name.ilike(like),
+        Company.firmenbuchnummer.ilike(like),
+        Company.seat.ilike(like),
+        Company.business_purpose.ilike(like),
+    )
+
+    # Build the query with optional city filter
+    if city:
+        # Join with Address table to filter by one or more cities
+        base_query = (
+            select(Company)
+            .join(Address, Company.id == Address.company_id)
+            .where(and_(filters, Address.city.in_(city)))
+        )
+    else:
+        base_query = select(Company).where(filters)
+
+    offset = (page - 1) * page_size
+    # List items only use company columns, so no relationships are loaded
+    return (
+        base_query
+        .order_by(Company.name.asc())
+        .offset(offset)
+        .limit(page_size)
+    )
+
 def search_companies(
     query: str,
     page: int = 1,
@@ -187,86 +556,185 @@ def search_companies(
     """
     Search companies by string across several fields with pagination.
     Optionally filter by one or more cities.
-    Returns a dict with keys: companies (list), page, page_size, total, pages.
+    Returns a dict with key: results (list of company list items).
+    The total is counted separately by search_companies_amount.
+    Not cached here: the search route caches its whole response (key family SEARCH).
     """
     if page < 1:
         page = 1
     if page_size < 1:
         page_size = 10
 
-    # Create cache key with sorted cities for consistency
-    cities_key = ":".join(sorted(city)) if city else None
-    cache_key = f"db_search_companies:{query}:{page}:{page_size}:{cities_key}"
+    owns_session = False
+    if session is None:
+        session = SessionLocal()
+        owns_session = True
 
     try:
-        cached_result = get_cache(cache_key, entity_type="db")
-        if cached_result is not None:
-            return cached_result
-    except Exception:
-        pass
+        results = session.execute(_search_stmt(query, page, page_size, city)).scalars().all()
+
+        list_items = [_serialize_company_list_item(c) for c in results]
+
+        return {"results": list_items}
+    finally:
+        if owns_session:
+            session.close()
+
+async def search_companies_async(
+    query: str,
+    page: int = 1,
+    page_size: int = 10,
+    city: Optional[List[str]] = None,
+    session: Optional[AsyncSession] = None,
+) -> Dict[str, Any]:
+    """Async variant of search_companies using the async engine."""
+    if page < 1:
+        page = 1
+    if page_size < 1:
+        page_size = 10
 
     owns_session = False
     if session is None:
-        session = SessionLocal()
+        session = AsyncSessionLocal()
         owns_session = True
 
     try:
-        like = f"%{query}%"
-        filters = or_(
-            Company.name.ilike(like),
-            Company.firmenbuchnummer.ilike(like),
-            Company.seat.ilike(like),
-            Company.business_purpose.ilike(like),
-        )
+        results = (await session.execute(_search_stmt(query, page, page_size, city))).scalars().all()
 
-        # Build the query with optional city filter
-        if city:
-            # Join with Address table to filter by one or more cities
-            base_query = (
-                select(Company)
-                .join(Address, Company.id == Address.company_id)
-                .where(and_(filters, Address.city.in_(city)))
-            )
-            count_query = (
-                select(func.count())
-                .select_from(
-                    select(Company.id)
-                    .join(Address, Company.id == Address.company_id)
-                    .where(and_(filters, Address.city.in_(city)))
-                    .subquery()
+        return {"results": [_serialize_company_list_item(c) for c in results]}
+    finally:
+        if owns_session:
+            await session.close()
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards in user input."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _person_label(first_name: Optional[str], last_name: Optional[str], name: Optional[str]) -> str:
+    """Build a display name for a person from the available name parts."""
+    if name:
+        return name
+    return " ".join(part for part in (first_name, last_name) if part)
+
+def search_persons(
+    query: str,
+    page: int = 1,
+    page_size: int = 10,
+    birth_date: Optional[date] = None,
+    fuzzy: bool = False,
+    session: Optional[Session] = None,
+) -> Dict[str, Any]:
+    """
+    Search persons (partners) by name with pagination.
+    A person is identified by (first_name, last_name, birth_date), the same identity
+    used for the network graph. Every query token must prefix-match the first or last name
+    (case-insensitive). With fuzzy=True the formatted name is matched by trigram similarity instead.
+    Optionally filter by exact birth date.
+    The companies of all persons on the page are resolved in a single batched query.
+    Returns a dict with keys: persons (list), total.
+    """
+    if page < 1:
+        page = 1
+    if page_size < 1:
+        page_size = 10
+
+    owns_session = False
+    if session is None:
+        session = SessionLocal()
+        owns_session = True
+
+    try:
+        if fuzzy:
+            name_filter = Partner.name.op("%")(query)
+            rank = func.max(func.similarity(Partner.name, query))
+        else:
+            token_filters = []
+            for token in query.lower().split():
+                pattern = f"{_escape_like(token)}%"
+                token_filters.append(
+                    or_(
+                        func.lower(Partner.last_name).like(pattern, escape="\\"),
+                        func.lower(Partner.first_name).like(pattern, escape="\\"),
+                    )
                 )
+            name_filter = and_(*token_filters) if token_filters else literal(False)
+            rank = None
+
+        filters = [name_filter, Partner.last_name.isnot(None)]
+        if birth_date is not None:
+            filters.append(Partner.birth_date == birth_date)
+
+        grouped = (
+            select(
+                Partner.first_name,
+                Partner.last_name,
+                Partner.birth_date,
+                func.min(Partner.name).label("name"),
             )
-        else:
-            base_query = select(Company).where(filters)
-            count_query = select(func.count()).select_from(select(Company.id).where(filters).subquery())
+            .where(*filters)
+            .group_by(Partner.first_name, Partner.last_name, Partner.birth_date)
+        )
 
+        count_query = select(func.count()).select_from(grouped.subquery())
         total = session.execute(count_query).scalar_one()
 
+        if rank is not None:
+            ordered = grouped.order_by(rank.desc(), Partner.last_name.asc(), Partner.first_name.asc())
+        else:
+            ordered = grouped.order_by(Partner.last_name.asc(), Partner.first_name.asc(), Partner.birth_date.asc())
+
         offset = (page - 1) * page_size
-        stmt = (
-            base_query
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.partners),
-                selectinload(Company.registry_entries),
-                selectinload(Company.risk_indicators)
+        person_rows = session.execute(ordered.offset(offset).limit(page_size)).all()
+        if not person_rows:
+            return {"persons": [], "total": total}
+
+        # Resolve the companies of every person on this page in one query
+        person_conditions = [
+            and_(
+                Partner.last_name == row.last_name,
+                Partner.first_name == row.first_name if row.first_name is not None else Partner.first_name.is_(None),
+                Partner.birth_date == row.birth_date if row.birth_date is not None else Partner.birth_date.is_(None),
             )
+            for row in person_rows
+        ]
+        companies_stmt = (
+            select(
+                Partner.first_name,
+                Partner.last_name,
+                Partner.birth_date,
+                Partner.role,
+                Partner.representation,
+                Company.firmenbuchnummer,
+                Company.name.label("company_name"),
+            )
+            .join(Company, Company.id == Partner.company_id)
+            .where(or_(*person_conditions))
             .order_by(Company.name.asc())
-            .offset(offset)
-            .limit(page_size)
         )
-        results = session.execute(stmt).scalars().all()
 
-        list_items = [_serialize_company_list_item(c) for c in results]
-
-        result = {"results": list_items}
+        companies_by_person: Dict[Tuple[Optional[str], Optional[str], Optional[date]], List[Dict[str, Any]]] = {}
+        for row in session.execute(companies_stmt).all():
+            companies_by_person.setdefault((row.first_name, row.last_name, row.birth_date), []).append(
+                {
+                    "firmenbuchnummer": row.firmenbuchnummer,
+                    "name": row.company_name,
+                    "role": row.role,
+                    "representation": row.representation,
+                }
+            )
 
-        try:
-            set_cache(cache_key, result, entity_type="db", ttl=3600)
-        except Exception:
-            pass
+        persons = [
+            {
+                "name": _person_label(row.first_name, row.last_name, row.name),
+                "first_name": row.first_name,
+                "last_name": row.last_name,
+                "birth_date": _serialize_date(row.birth_date),
+                "companies": companies_by_person.get((row.first_name, row.last_name, row.birth_date), []),
+            }
+            for row in person_rows
+        ]
 
-        return result
+        return {"persons": persons, "total": total}
     finally:
         if owns_session:
             session.close()
@@ -280,12 +748,11 @@ def search_companies_amount(query: str, city: Optional[List[str]] = None, sessio
     if len(query) < 3:
         return 0
 
-    # Create cache key with sorted cities for consistency
-    cities_key = ":".join(sorted(city)) if city else None
-    cache_key = f"db_search_companies_amount:{query}:{cities_key}"
+    # The search is case-insensitive, the city filter is not (the key sorts the cities)
+    cache_key = SEARCH_AMOUNT.key(query.lower(), city)
 
     try:
-        cached_result = get_cache(cache_key, entity_type="db")
+        cached_result = get_cache(cache_key, entity_type=SEARCH_AMOUNT.entity_type)
         if cached_result is not None:
             return cached_result
     except Exception:
@@ -321,7 +788,7 @@ def search_companies_amount(query: str, city: Optional[List[str]] = None, sessio
         total = session.execute(count_query).scalar_one()
 
         try:
-            set_cache(cache_key, total, entity_type="db", ttl=3600)
+            set_cache(cache_key, total, entity_type=SEARCH_AMOUNT.entity_type, ttl=3600)
         except Exception:
             pass
 
@@ -347,15 +814,6 @@ def get_search_suggestions(query: str, session: Optional[Session] = None, limit:
     if len(query) < 3:
         return []
     
-    cache_key = f"db_search_suggestions:{query}:{limit}"
-    
-    try:
-        cached_result = get_cache(cache_key, entity_type="db")
-        if cached_result is not None:
-            return cached_result
-    except Exception:
-        pass
-    
     owns_session = False
     if session is None:
         session = SessionLocal()
@@ -377,20 +835,13 @@ def get_search_suggestions(query: str, session: Optional[Session] = None, limit:
         
         results = session.execute(stmt).all()
         
-        suggestions = [
+        return [
             {
                 "firmenbuchnummer": row.firmenbuchnummer,
                 "name": row.name,
             }
             for row in results
         ]
-        
-        try:
-            set_cache(cache_key, suggestions, entity_type="db", ttl=3600)
-        except Exception:
-            pass
-        
-        return suggestions
     finally:
         if owns_session:
             session.close()
@@ -426,84 +877,68 @@ def get_metrics(session: Optional[Session] = None) -> Dict[str, int]:
             session.close()
 
 
+def _cities_stmt(query: Optional[str]):
+    """Select cities with company counts, optionally only for companies matching the query."""
+    if query:
+        # Filter cities based on companies matching the search query
+        like = f"%{query}%"
+        company_filters = or_(
+            Company.name.ilike(like),
+            Company.firmenbuchnummer.ilike(like),
+            Company.seat.ilike(like),
+            Company.business_purpose.ilike(like),
+        )
+
+        # Subquery approach: first find matching companies, then aggregate by city
+        # This is more efficient than joining on the full table
+        matching_companies = (
+            select(Company.id)
+            .where(company_filters)
+            .subquery()
+        )
+
+        return (
+            select(Address.city, func.count(Address.id).label('count'))
+            .join(matching_companies, Address.company_id == matching_companies.c.id)
+            .where(Address.city.isnot(None))
+            .where(Address.city != '')
+            .group_by(Address.city)
+            .order_by(func.count(Address.id).desc())
+        )
+
+    # No query - return all cities
+    return (
+        select(Address.city, func.count(Address.id).label('count'))
+        .where(Address.city.isnot(None))
+        .where(Address.city != '')
+        .group_by(Address.city)
+        .order_by(func.count(Address.id).desc())
+    )
+
 def get_available_cities(query: Optional[str] = None, session: Optional[Session] = None) -> List[Dict[str, Any]]:
     """
     Get unique cities with company counts, optionally filtered by search query.
     When query is provided, only returns cities from companies matching the search query.
     Returns a list of dictionaries with 'city' and 'count' keys, ordered by count descending.
+    Not cached here: the cities route caches its response (key family CITIES).
     """
-    cache_key = f"db_available_cities:{query}"
-
-    try:
-        cached_result = get_cache(cache_key, entity_type="db")
-        if cached_result is not None:
-            return cached_result
-    except Exception as e:
-        print(f"Cache read error: {e}")
-
     owns_session = False
     if session is None:
         session = SessionLocal()
         owns_session = True
 
     try:
-        if query:
-            # Filter cities based on companies matching the search query
-            like = f"%{query}%"
-            company_filters = or_(
-                Company.name.ilike(like),
-                Company.firmenbuchnummer.ilike(like),
-                Company.seat.ilike(like),
-                Company.business_purpose.ilike(like),
-            )
-
-            # Subquery approach: first find matching companies, then aggregate by city
-            # This is more efficient than joining on the full table
-            matching_companies = (
-                select(Company.id)
-                .where(company_filters)
-                .subquery()
-            )
-
-            stmt = (
-                select(Address.city, func.count(Address.id).label('count'))
-                .join(matching_companies, Address.company_id == matching_companies.c.id)
-                .where(Address.city.isnot(None))
-                .where(Address.city != '')
-                .group_by(Address.city)
-                .order_by(func.count(Address.id).desc())
-            )
-        else:
-            # No query - return all cities
-            stmt = (
-                select(Address.city, func.count(Address.id).label('count'))
-                .where(Address.city.isnot(None))
-                .where(Address.city != '')
-                .group_by(Address.city)
-                .order_by(func.count(Address.id).desc())
-            )
-
         print(f"Executing cities query (query={query})")
-        results = session.execute(stmt).all()
+        results = session.execute(_cities_stmt(query)).all()
         print(f"Got {len(results)} cities")
 
-        cities = [
+        return [
             {
                 "city": row.city,
                 "count": row.count
             }
             for row in results
         ]
-
-        # Cache for different durations based on whether it's query-specific or global
-        ttl = 3600 if query else 86400  # 1 hour for query-specific, 24 hours for all cities
-
-        try:
-            set_cache(cache_key, cities, entity_type="db", ttl=ttl)
-        except Exception as e:
-            print(f"Cache write error: {e}")
-
-        return cities
     except Exception as e:
         print(f"Error in get_available_cities: {e}")
         import traceback
@@ -512,7 +947,158 @@ def get_available_cities(query: Optional[str] = None, session: Optional[Session]
     finally:
         if owns_session:
             session.close()
+
+async def get_available_cities_async(query: Optional[str] = None, session: Optional[AsyncSession] = None) -> List[Dict[str, Any]]:
+    """Async variant of get_available_cities using the async engine."""
+    owns_session = False
+    if session is None:
+        session = AsyncSessionLocal()
+        owns_session = True
+
+    try:
+        results = (await session.execute(_cities_stmt(query))).all()
+        return [{"city": row.city, "count": row.count} for row in results]
+    finally:
+        if owns_session:
+            await session.close()
     
+# Maximum number of nodes in a network graph
+NETWORK_MAX_NODES = 50
+
+def _network_company_stmt(company_id: str):
+    # get company with eager loading of relationships
+    return (
+        select(Company)
+        .options(
+            selectinload(Company.address),
+            selectinload(Company.partners)
+        )
+        .where(Company.firmenbuchnummer == company_id)
+    )
+
+def _network_neighbour_queries(company: Company) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Yield (edge label, edge value, statement) for every kind of connection of a company:
+    companies at the same location, then companies sharing each partner.
+    """
+    company_id = company.firmenbuchnummer
+
+    # find companies with the same location
+    address = company.address
+    if address:
+        # create location label from address components
+        location_parts = []
+        if address.country:
+            location_parts.append(address.country)
+        if address.postal_code:
+            location_parts.append(address.postal_code)
+        if address.city:
+            location_parts.append(address.city)
+        if address.street:
+            street_str = address.street
+            if address.house_number:
+                street_str += f" {address.house_number}"
+            location_parts.append(street_str)
+
+        location_label = ", ".join(location_parts) if location_parts else "Unknown Location"
+
+        location_filters = []
+        if address.postal_code:
+            location_filters.append(Address.postal_code == address.postal_code)
+        if address.city:
+            location_filters.append(Address.city == address.city)
+        if address.street:
+            location_filters.append(Address.street == address.street)
+        if address.house_number:
+            location_filters.append(Address.house_number == address.house_number)
+
+        if location_filters:
+            yield "Location", location_label, (
+                select(Company)
+                .join(Address, Company.id == Address.company_id)
+                .where(
+                    and_(*location_filters),
+                    Company.firmenbuchnummer != company_id
+                )
+            )
+
+    # find connected companies through partners
+    for partner in company.partners or []:
+        # create person label from partner information
+        person_parts = []
+        if partner.name:
+            person_parts.append(partner.name)
+        elif partner.first_name and partner.last_name:
+            person_parts.append(f"{partner.first_name} {partner.last_name}")
+        elif partner.last_name:
+            person_parts.append(partner.last_name)
+
+        person_label = " ".join(person_parts) if person_parts else "Unknown Person"
+
+        # find companies with the same partner
+        partner_filters = []
+        if partner.first_name:
+            partner_filters.append(Partner.first_name == partner.first_name)
+        if partner.last_name:
+            partner_filters.append(Partner.last_name == partner.last_name)
+        if partner.birth_date:
+            partner_filters.append(Partner.birth_date == partner.birth_date)
+
+        if partner_filters:
+            # find other companies with this partner
+            yield "Person", person_label, (
+                select(Company)
+                .join(Partner, Company.id == Partner.company_id)
+                .where(
+                    and_(*partner_filters),
+                    Company.firmenbuchnummer != company_id
+                )
+            )
+
+class _NetworkGraph:
+    """Collects the nodes and edges of a company network, at most NETWORK_MAX_NODES nodes."""
+
+    def __init__(self, company: Company):
+        self.company_id = company.firmenbuchnummer
+        # add the main company node
+        self.nodes: List[Dict[str, Any]] = [{
+            "id": self.company_id,
+            "type": "company",
+            "label": company.name,
+        }]
+        self.edges: List[Dict[str, Any]] = []
+        self.seen_node_ids = {self.company_id}
+
+    def add_connections(self, connected_companies: List[Company], label: str, value: str) -> None:
+        for connected_company in connected_companies:
+            # Stop if we've reached the maximum number of nodes
+            if len(self.nodes) >= NETWORK_MAX_NODES:
+                break
+
+            connected_company_id = connected_company.firmenbuchnummer
+            if connected_company_id not in self.seen_node_ids:
+                self.nodes.append({
+                    "id": connected_company_id,
+                    "type": "company",
+                    "label": connected_company.name,
+                })
+                self.seen_node_ids.add(connected_company_id)
+
+            # add edge from main company to connected company with location/person value
+            self.edges.append({
+                "source": self.company_id,
+                "target": connected_company_id,
+                "label": label,
+                "value": value,
+            })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "firmenbuchnummer": self.company_id,
+            "nodes": self.nodes,
+            "edges": self.edges,
+        }
+
 def get_company_network(company_id: str, hops: int = 2) -> Dict[str, Any]:
     """
     Get the network graph for a specific company.
@@ -520,165 +1106,30 @@ def get_company_network(company_id: str, hops: int = 2) -> Dict[str, Any]:
     Only company nodes are returned. Edges contain connection type and value.
     Maximum of 50 nodes will be returned.
     """
-    MAX_NODES = 50
-
     session = SessionLocal()
     try:
-        # get company with eager loading of relationships
-        stmt = (
-            select(Company)
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.partners)
-            )
-            .where(Company.firmenbuchnummer == company_id)
-        )
-        company = session.execute(stmt).scalars().first()
-
+        company = session.execute(_network_company_stmt(company_id)).scalars().first()
         if company is None:
             return None
 
-        # relationships are already loaded
-        address = company.address
-        partners = company.partners or []
-
-        # initialize nodes and edges
-        nodes = []
-        edges = []
-        seen_node_ids = set()
-
-        # add the main company node
-        company_node_id = company.firmenbuchnummer
-        if company_node_id not in seen_node_ids:
-            nodes.append({
-                "id": company_node_id,
-                "type": "company",
-                "label": company.name,
-            })
-            seen_node_ids.add(company_node_id)
-
-        # find companies with the same location
-        if address:
-            # create location label from address components
-            location_parts = []
-            if address.country:
-                location_parts.append(address.country)
-            if address.postal_code:
-                location_parts.append(address.postal_code)
-            if address.city:
-                location_parts.append(address.city)
-            if address.street:
-                street_str = address.street
-                if address.house_number:
-                    street_str += f" {address.house_number}"
-                location_parts.append(street_str)
-
-            location_label = ", ".join(location_parts) if location_parts else "Unknown Location"
-
-            # find companies with the same location
-            location_filters = []
-            if address.postal_code:
-                location_filters.append(Address.postal_code == address.postal_code)
-            if address.city:
-                location_filters.append(Address.city == address.city)
-            if address.street:
-                location_filters.append(Address.street == address.street)
-            if address.house_number:
-                location_filters.append(Address.house_number == address.house_number)
+        graph = _NetworkGraph(company)
+        for label, value, stmt in _network_neighbour_queries(company):
+            graph.add_connections(session.execute(stmt).scalars().all(), label, value)
+        return graph.to_dict()
+    finally:
+        session.close()
 
-            if location_filters:
-                connected_companies_stmt = (
-                    select(Company)
-                    .join(Address, Company.id == Address.company_id)
-                    .where(
-                        and_(*location_filters),
-                        Company.firmenbuchnummer != company_id
-                    )
-                )
-                connected_companies = session.execute(connected_companies_stmt).scalars().all()
-
-                for connected_company in connected_companies:
-                    # Stop if we've reached the maximum number of nodes
-                    if len(nodes) >= MAX_NODES:
-                        break
-
-                    connected_company_id = connected_company.firmenbuchnummer
-                    if connected_company_id not in seen_node_ids:
-                        nodes.append({
-                            "id": connected_company_id,
-                            "type": "company",
-                            "label": connected_company.name,
-                        })
-                        seen_node_ids.add(connected_company_id)
-
-                    # add edge from main company to connected company with location value
-                    edges.append({
-                        "source": company_node_id,
-                        "target": connected_company_id,
-                        "label": "Location",
-                        "value": location_label,
-                    })
-
-        # find connected companies through partners
-        for partner in partners:
-            # create person label from partner information
-            person_parts = []
-            if partner.name:
-                person_parts.append(partner.name)
-            elif partner.first_name and partner.last_name:
-                person_parts.append(f"{partner.first_name} {partner.last_name}")
-            elif partner.last_name:
-                person_parts.append(partner.last_name)
-
-            person_label = " ".join(person_parts) if person_parts else "Unknown Person"
-
-            # find companies with the same partner
-            partner_filters = []
-            if partner.first_name:
-                partner_filters.append(Partner.first_name == partner.first_name)
-            if partner.last_name:
-                partner_filters.append(Partner.last_name == partner.last_name)
-            if partner.birth_date:
-                partner_filters.append(Partner.birth_date == partner.birth_date)
-
-            if partner_filters:
-                # find other companies with this partner
-                connected_companies_stmt = (
-                    select(Company)
-                    .join(Partner, Company.id == Partner.company_id)
-                    .where(
-                        and_(*partner_filters),
-                        Company.firmenbuchnummer != company_id
-                    )
-                )
-                connected_companies = session.execute(connected_companies_stmt).scalars().all()
-
-                for connected_company in connected_companies:
-                    # Stop if we've reached the maximum number of nodes
-                    if len(nodes) >= MAX_NODES:
-                        break
-
-                    connected_company_id = connected_company.firmenbuchnummer
-                    if connected_company_id not in seen_node_ids:
-                        nodes.append({
-                            "id": connected_company_id,
-                            "type": "company",
-                            "label": connected_company.name,
-                        })
-                        seen_node_ids.add(connected_company_id)
-
-                    # add edge from main company to connected company with person value
-                    edges.append({
-                        "source": company_node_id,
-                        "target": connected_company_id,
-                        "label": "Person",
-                        "value": person_label,
-                    })
+async def get_company_network_async(company_id: str, hops: int = 2) -> Dict[str, Any]:
+    """Async variant of get_company_network using the async engine."""
+    session = AsyncSessionLocal()
+    try:
+        company = (await session.execute(_network_company_stmt(company_id))).scalars().first()
+        if company is None:
+            return None
 
-        return {
-            "firmenbuchnummer": company_id,
-            "nodes": nodes,
-            "edges": edges,
-        }
+        graph = _NetworkGraph(company)
+        for label, value, stmt in _network_neighbour_queries(company):
+            graph.add_connections((await session.execute(stmt)).scalars().all(), label, value)
+        return graph.to_dict()
     finally:
-        session.close()
\ No newline at end of file
+        await session.close()
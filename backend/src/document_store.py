@@ -0,0 +1,153 @@
+"""
+Persistent store for filed Urkunde documents.
+
+A filed Jahresabschluss never changes once it has a KEY, so every document is downloaded
+from the Justiz API once and kept in the urkunde_documents table: the zlib-compressed raw XML
+plus the parsed extract_bilanz_fields result. The store is shared by all replicas.
+
+Example usage:
+    stored = get_documents(["563319_0070752553502_000___000_30_36887434_XML"])
+    put_documents([{"key": ..., "firmenbuchnummer": ..., "xml": ..., "parsed": {...}}])
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal, UrkundeDocument, engine
+from .metrics import urkunde_store_lookups_total, urkunde_store_documents, urkunde_store_bytes
+
+# Set BIZRAY_URKUNDE_STORE=0 to always download documents from the Justiz API
+STORE_ENABLED = os.getenv("BIZRAY_URKUNDE_STORE", "1") != "0"
+# How long the store size gauges may be stale (they need a table aggregate)
+STATS_REFRESH_SECONDS = int(os.getenv("BIZRAY_URKUNDE_STORE_STATS_INTERVAL", "300"))
+
+_stats_lock = threading.Lock()
+_stats = {"documents": 0, "bytes": 0, "refreshed_at": 0.0}
+
+
+def compress_xml(xml_content: str) -> bytes:
+    return zlib.compress(xml_content.encode("utf-8"), 6)
+
+
+def decompress_xml(raw: bytes) -> str:
+    return zlib.decompress(raw).decode("utf-8")
+
+
+def get_documents(keys: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Look up several documents in one query.
+
+    Args:
+        keys: Urkunde KEYs
+
+    Returns:
+        Dict mapping every stored KEY to its parsed Bilanz data
+        (None for stored documents that are not a Bilanz). Unknown KEYs are left out.
+    """
+    if not STORE_ENABLED or not keys:
+        return {}
+
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(UrkundeDocument.key, UrkundeDocument.parsed).where(UrkundeDocument.key.in_(keys))
+        ).all()
+    except Exception as e:
+        print(f"Urkunde store lookup failed: {e}")
+        return {}
+    finally:
+        session.close()
+
+    found = {row.key: json.loads(row.parsed) if row.parsed else None for row in rows}
+    hits = len(found)
+    if hits:
+        urkunde_store_lookups_total.labels(result="hit").inc(hits)
+    if len(keys) - hits:
+        urkunde_store_lookups_total.labels(result="miss").inc(len(keys) - hits)
+    return found
+
+
+def get_raw_xml(key: str) -> Optional[str]:
+    """Return the stored raw XML of a document, or None if it is not stored."""
+    session = SessionLocal()
+    try:
+        raw = session.execute(
+            select(UrkundeDocument.raw_xml).where(UrkundeDocument.key == key)
+        ).scalar_one_or_none()
+        return decompress_xml(raw) if raw is not None else None
+    finally:
+        session.close()
+
+
+def put_documents(documents: List[Dict[str, Any]]) -> None:
+    """
+    Store downloaded documents. Documents that are already stored are left untouched.
+
+    Args:
+        documents: dicts with 'key', 'xml' (raw XML string), 'parsed' (dict or None)
+            and optionally 'firmenbuchnummer'
+    """
+    if not STORE_ENABLED or not documents:
+        return
+
+    rows = []
+    for doc in documents:
+        raw = compress_xml(doc["xml"])
+        rows.append({
+            "key": doc["key"],
+            "firmenbuchnummer": doc.get("firmenbuchnummer"),
+            "raw_xml": raw,
+            "raw_size": len(raw),
+            "parsed": json.dumps(doc["parsed"]) if doc.get("parsed") is not None else None,
+        })
+
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                stmt = pg_insert(UrkundeDocument.__table__).values(rows).on_conflict_do_nothing(
+                    index_elements=[UrkundeDocument.__table__.c.key]
+                )
+                conn.execute(stmt)
+            else:
+                for row in rows:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(UrkundeDocument.__table__.insert(), row)
+                    except IntegrityError:
+                        pass
+    except Exception as e:
+        print(f"Urkunde store write failed: {e}")
+
+
+def refresh_store_stats(force: bool = False) -> Dict[str, int]:
+    """Update the store size gauges, at most every STATS_REFRESH_SECONDS unless forced."""
+    with _stats_lock:
+        if not force and time.time() - _stats["refreshed_at"] < STATS_REFRESH_SECONDS:
+            return {"documents": _stats["documents"], "bytes": _stats["bytes"]}
+        _stats["refreshed_at"] = time.time()
+
+    session = SessionLocal()
+    try:
+        count, size = session.execute(
+            select(func.count(UrkundeDocument.key), func.coalesce(func.sum(UrkundeDocument.raw_size), 0))
+        ).one()
+    except Exception as e:
+        print(f"Urkunde store stats failed: {e}")
+        return {"documents": _stats["documents"], "bytes": _stats["bytes"]}
+    finally:
+        session.close()
+
+    with _stats_lock:
+        _stats["documents"] = int(count)
+        _stats["bytes"] = int(size)
+    urkunde_store_documents.set(count)
+    urkunde_store_bytes.set(size)
+    return {"documents": int(count), "bytes": int(size)}
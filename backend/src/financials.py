@@ -0,0 +1,280 @@
+"""
+Normalized financial statements.
+
+The parsed Bilanz of every Jahresabschluss (extract_bilanz_fields) is stored as one row per
+company and fiscal year in the financial_statements table, so the request path and analytics
+can read the numbers with plain SQL instead of parsing XML again.
+
+Rows are written when a document is downloaded. Existing documents are loaded with the backfill:
+    python -m src.financials            # from the Urkunde document store
+    python -m src.financials --soap     # also fetch companies without stored documents from Justiz
+"""
+
+import argparse
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .db import SessionLocal, Company, FinancialStatement, UrkundeDocument, engine
+
+ASSET_COLUMNS = (
+    "total_assets",
+    "fixed_assets",
+    "intangible_assets",
+    "tangible_assets",
+    "financial_assets",
+    "current_assets",
+    "inventories",
+    "receivables_and_other_assets",
+    "securities",
+    "cash_and_cash_equivalents",
+    "prepaid_expenses",
+    "active_deferred_taxes",
+)
+
+LIABILITIES_EQUITY_COLUMNS = (
+    "total_liabilities_and_equity",
+    "equity",
+    "subscribed_capital",
+    "capital_reserves",
+    "revenue_reserves",
+    "net_profit_loss",
+    "liabilities",
+    "deferred_income",
+    "passive_deferred_taxes",
+)
+
+INCOME_STATEMENT_COLUMNS = (
+    "revenue",
+    "net_income",
+)
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%Y%m%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value.strip()[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def statement_row_from_bilanz(parsed: Dict[str, Any], company_id: int, urkunde_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Map an extract_bilanz_fields result to a financial_statements row.
+    Returns None if the fiscal year end is unknown (the row could not be keyed).
+    """
+    fiscal_year = parsed.get("fiscal_year") or {}
+    end_date = _parse_date(fiscal_year.get("end_date"))
+    if end_date is None:
+        return None
+
+    assets = parsed.get("assets") or {}
+    liabilities_equity = parsed.get("liabilities_equity") or {}
+    income_statement = parsed.get("income_statement") or {}
+
+    row: Dict[str, Any] = {
+        "company_id": company_id,
+        "urkunde_key": urkunde_key,
+        "fiscal_year": end_date.year,
+        "fiscal_year_start": _parse_date(fiscal_year.get("start_date")),
+        "fiscal_year_end": end_date,
+        "currency": parsed.get("currency"),
+        "updated_at": datetime.utcnow(),
+    }
+    row.update({column: assets.get(column) for column in ASSET_COLUMNS})
+    row.update({column: liabilities_equity.get(column) for column in LIABILITIES_EQUITY_COLUMNS})
+    row.update({column: income_statement.get(column) for column in INCOME_STATEMENT_COLUMNS})
+    return row
+
+
+def bilanz_from_statement(statement: FinancialStatement) -> Dict[str, Any]:
+    """Rebuild the extract_bilanz_fields structure from a stored row (as used by calculate_risk_indicators)."""
+    return {
+        "assets": {column: getattr(statement, column) for column in ASSET_COLUMNS},
+        "liabilities_equity": {column: getattr(statement, column) for column in LIABILITIES_EQUITY_COLUMNS},
+        "income_statement": {column: getattr(statement, column) for column in INCOME_STATEMENT_COLUMNS},
+        "currency": statement.currency,
+        "fiscal_year": {
+            "start_date": statement.fiscal_year_start.isoformat() if statement.fiscal_year_start else None,
+            "end_date": statement.fiscal_year_end.isoformat() if statement.fiscal_year_end else None,
+        },
+        "notes": {},
+    }
+
+
+def upsert_statement_rows(rows: List[Dict[str, Any]]) -> int:
+    """Insert or update financial_statements rows, keyed by (company_id, fiscal_year_end)."""
+    if not rows:
+        return 0
+
+    # One row per key per statement, the last one wins (later filings correct earlier ones)
+    unique_rows = list({(r["company_id"], r["fiscal_year_end"]): r for r in rows}.values())
+    table = FinancialStatement.__table__
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            stmt = pg_insert(table).values(unique_rows)
+            update_columns = {
+                column: stmt.excluded[column]
+                for column in unique_rows[0].keys()
+                if column not in ("company_id", "fiscal_year_end")
+            }
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.company_id, table.c.fiscal_year_end],
+                set_=update_columns,
+            ))
+        else:
+            for row in unique_rows:
+                conn.execute(table.delete().where(
+                    table.c.company_id == row["company_id"],
+                    table.c.fiscal_year_end == row["fiscal_year_end"],
+                ))
+                conn.execute(table.insert(), row)
+
+    return len(unique_rows)
+
+
+def save_financial_statements(fnr: str, documents: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> int:
+    """
+    Store the parsed Bilanz of downloaded documents for a company.
+
+    Args:
+        fnr: firmenbuchnummer of the company
+        documents: (urkunde KEY, extract_bilanz_fields result or None)
+
+    Returns:
+        Number of rows written
+    """
+    documents = [(key, parsed) for key, parsed in documents if parsed]
+    if not fnr or not documents:
+        return 0
+
+    session = SessionLocal()
+    try:
+        company_id = session.execute(
+            select(Company.id).where(Company.firmenbuchnummer == fnr)
+        ).scalar_one_or_none()
+    finally:
+        session.close()
+    if company_id is None:
+        return 0
+
+    rows = [statement_row_from_bilanz(parsed, company_id, key) for key, parsed in documents]
+    try:
+        return upsert_statement_rows([row for row in rows if row is not None])
+    except Exception as e:
+        print(f"Error saving financial statements for {fnr}: {e}")
+        return 0
+
+
+def get_statements_by_keys(urkunde_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Return the stored Bilanz data of documents by Urkunde KEY (indexed lookup). Unknown KEYs are left out."""
+    if not urkunde_keys:
+        return {}
+
+    session = SessionLocal()
+    try:
+        statements = session.execute(
+            select(FinancialStatement).where(FinancialStatement.urkunde_key.in_(urkunde_keys))
+        ).scalars().all()
+        return {s.urkunde_key: bilanz_from_statement(s) for s in statements}
+    finally:
+        session.close()
+
+
+def backfill_from_document_store(batch_size: int = 1000) -> int:
+    """Populate financial_statements from all parsed documents in the Urkunde document store."""
+    written = 0
+    last_key = ""
+    fnr_to_id: Dict[str, int] = {}
+
+    while True:
+        session = SessionLocal()
+        try:
+            documents = session.execute(
+                select(UrkundeDocument.key, UrkundeDocument.firmenbuchnummer, UrkundeDocument.parsed)
+                .where(UrkundeDocument.key > last_key, UrkundeDocument.parsed.isnot(None))
+                .order_by(UrkundeDocument.key.asc())
+                .limit(batch_size)
+            ).all()
+            if not documents:
+                break
+            last_key = documents[-1].key
+
+            missing_fnrs = {d.firmenbuchnummer for d in documents if d.firmenbuchnummer and d.firmenbuchnummer not in fnr_to_id}
+            if missing_fnrs:
+                for row in session.execute(
+                    select(Company.id, Company.firmenbuchnummer).where(Company.firmenbuchnummer.in_(missing_fnrs))
+                ):
+                    fnr_to_id[row.firmenbuchnummer] = row.id
+        finally:
+            session.close()
+
+        rows = []
+        for document in documents:
+            company_id = fnr_to_id.get(document.firmenbuchnummer)
+            if company_id is None:
+                continue
+            row = statement_row_from_bilanz(json.loads(document.parsed), company_id, document.key)
+            if row is not None:
+                rows.append(row)
+        written += upsert_statement_rows(rows)
+        print(f"Backfilled {written} financial statements (last key {last_key})")
+
+    return written
+
+
+def backfill_from_justiz(limit: Optional[int] = None, batch_size: int = 500) -> int:
+    """
+    Fetch the documents of companies that have no financial statements yet from the Justiz API.
+    Downloads go through the document store, which writes the statements.
+    """
+    from .api.queries import get_all_urkunde_contents, get_company_urkunde
+
+    processed = 0
+    last_id = 0
+    while limit is None or processed < limit:
+        session = SessionLocal()
+        try:
+            companies = session.execute(
+                select(Company.id, Company.firmenbuchnummer)
+                .where(Company.id > last_id, ~Company.financial_statements.any())
+                .order_by(Company.id.asc())
+                .limit(batch_size)
+            ).all()
+        finally:
+            session.close()
+        if not companies:
+            break
+
+        for company in companies:
+            last_id = company.id
+            urkunde_list = get_company_urkunde(company.firmenbuchnummer)
+            if urkunde_list:
+                get_all_urkunde_contents(urkunde_list, fnr=company.firmenbuchnummer)
+            processed += 1
+            if limit is not None and processed >= limit:
+                break
+        print(f"Fetched documents for {processed} companies (last id {last_id})")
+
+    return processed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Backfill the financial_statements table")
+    arg_parser.add_argument("--soap", action="store_true", help="also fetch companies without statements from the Justiz API")
+    arg_parser.add_argument("--limit", type=int, default=None, help="maximum number of companies to fetch with --soap")
+    args = arg_parser.parse_args()
+
+    from .db import init_db
+    init_db()
+
+    print(f"Backfilled {backfill_from_document_store()} financial statements from the document store")
+    if args.soap:
+        print(f"Fetched documents for {backfill_from_justiz(limit=args.limit)} companies from the Justiz API")
@@ -0,0 +1,393 @@
+"""
+Asynchronous bulk risk screening jobs.
+
+A screening job takes a list of firmenbuchnummern and scores every company with the stored
+risk data of the detail view (get_company_by_id); companies the risk worker has not processed
+yet are computed on the spot (refresh_company_risk).
+All job state lives in Redis, so a job survives API and worker restarts:
+
+    jobs:screening:active            set of job ids that still have work
+    jobs:screening:{id}              hash with status and progress counters
+    jobs:screening:{id}:fnrs         list of all FNRs in submission order
+    jobs:screening:{id}:pending      list of FNRs that still need to be processed
+    jobs:screening:{id}:inflight     sorted set of claimed FNRs, scored by lease deadline
+    jobs:screening:{id}:results      hash FNR -> JSON result (the checkpoint)
+
+Workers claim FNRs with a lease. A result is written once per FNR (HSETNX), and FNRs whose
+lease expired (worker crashed or was restarted) are put back on the pending list, so a job
+continues where it stopped.
+
+Every key expires: finished jobs after JOB_RESULT_TTL, jobs that never finish after
+JOB_MAX_RUNTIME + JOB_RESULT_TTL. Workers drop active jobs whose state has expired.
+
+Run a worker with:
+    python -m src.jobs
+
+Metrics are served on BIZRAY_WORKER_METRICS_PORT (default 9100).
+"""
+
+import csv
+import io
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from . import cache
+from .api.queries import RISK_INDICATOR_KEYS
+from .controller import get_company_by_id
+from .risk_worker import refresh_company_risk
+from .metrics import screening_jobs_created_total, screening_fnrs_processed_total, start_worker_metrics_server
+
+KEY_PREFIX_JOB = "jobs:screening:"
+ACTIVE_JOBS_KEY = "jobs:screening:active"
+
+# Finished jobs (state and results) are kept for 7 days by default
+JOB_RESULT_TTL = int(os.getenv("BIZRAY_JOB_RESULT_TTL", str(7 * 86400)))
+# Longest a job may take; unfinished jobs (no worker, abandoned) expire after this plus JOB_RESULT_TTL
+JOB_MAX_RUNTIME = int(os.getenv("BIZRAY_JOB_MAX_RUNTIME", str(2 * 86400)))
+# Seconds a worker may hold a claimed FNR before it is handed to another worker
+JOB_LEASE_SECONDS = int(os.getenv("BIZRAY_JOB_LEASE_SECONDS", "300"))
+# Concurrent FNRs per worker process (bounds parallel calls to the Justiz API)
+JOB_CONCURRENCY = int(os.getenv("BIZRAY_JOB_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("BIZRAY_JOB_POLL_INTERVAL", "2"))
+
+CSV_COLUMNS = ["firmenbuchnummer", "name", "status", "risk_score", *RISK_INDICATOR_KEYS, "error"]
+
+# Atomically move up to ARGV[1] FNRs from the pending list to the inflight set
+_CLAIM_SCRIPT = """
+local items = redis.call('LPOP', KEYS[1], ARGV[1])
+if not items then
+    return {}
+end
+for _, fnr in ipairs(items) do
+    redis.call('ZADD', KEYS[2], ARGV[2], fnr)
+end
+return items
+"""
+
+# Atomically put FNRs with an expired lease back on the pending list
+_REQUEUE_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, fnr in ipairs(items) do
+    redis.call('ZREM', KEYS[2], fnr)
+    redis.call('RPUSH', KEYS[1], fnr)
+end
+return #items
+"""
+
+
+def _job_key(job_id: str, suffix: Optional[str] = None) -> str:
+    """Build the Redis key of a job or one of its sub-structures."""
+    if suffix is None:
+        return f"{KEY_PREFIX_JOB}{job_id}"
+    return f"{KEY_PREFIX_JOB}{job_id}:{suffix}"
+
+
+def normalize_fnr(value: str) -> str:
+    """Normalize a firmenbuchnummer the same way the parser stores it ('12345 a' -> '12345a')."""
+    return value.strip().replace(" ", "").lower()
+
+
+def parse_fnr_csv(content: str) -> List[str]:
+    """
+    Read FNRs from CSV content.
+    The first column of every row is used; a header row and empty rows are skipped.
+    Duplicates are removed while keeping the original order.
+    """
+    fnrs: List[str] = []
+    for row in csv.reader(io.StringIO(content)):
+        if not row:
+            continue
+        value = normalize_fnr(row[0])
+        if not value or not value[0].isdigit():
+            # Header row ("fnr", "firmenbuchnummer", ...) or garbage
+            continue
+        fnrs.append(value)
+    return list(dict.fromkeys(fnrs))
+
+
+def create_screening_job(fnrs: List[str], owner_id: Optional[int] = None) -> str:
+    """
+    Create a screening job and queue its FNRs.
+
+    Args:
+        fnrs: firmenbuchnummern to score
+        owner_id: id of the user that created the job
+
+    Returns:
+        The job id
+    """
+    client = cache.get_client()
+    fnrs = list(dict.fromkeys(normalize_fnr(f) for f in fnrs if f and f.strip()))
+    job_id = uuid4().hex
+    now = datetime.now(timezone.utc).isoformat()
+
+    pipe = client.pipeline(transaction=True)
+    pipe.hset(_job_key(job_id), mapping={
+        "id": job_id,
+        "status": "queued",
+        "owner_id": "" if owner_id is None else str(owner_id),
+        "total": len(fnrs),
+        "processed": 0,
+        "failed": 0,
+        "not_found": 0,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": "",
+    })
+    # Push in chunks to keep single commands small for very large uploads
+    for start in range(0, len(fnrs), 1000):
+        chunk = fnrs[start:start + 1000]
+        pipe.rpush(_job_key(job_id, "fnrs"), *chunk)
+        pipe.rpush(_job_key(job_id, "pending"), *chunk)
+    if fnrs:
+        pipe.sadd(ACTIVE_JOBS_KEY, job_id)
+        for key in (_job_key(job_id), _job_key(job_id, "fnrs"), _job_key(job_id, "pending")):
+            pipe.expire(key, JOB_MAX_RUNTIME + JOB_RESULT_TTL)
+    else:
+        pipe.hset(_job_key(job_id), mapping={"status": "completed", "completed_at": now})
+        pipe.expire(_job_key(job_id), JOB_RESULT_TTL)
+    pipe.execute()
+
+    screening_jobs_created_total.inc()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Return the status and progress of a job, or None if it does not exist."""
+    client = cache.get_client()
+    data = client.hgetall(_job_key(job_id))
+    if not data:
+        return None
+
+    total = int(data.get("total", 0))
+    processed = int(data.get("processed", 0))
+    return {
+        "id": data.get("id", job_id),
+        "status": data.get("status"),
+        "owner_id": int(data["owner_id"]) if data.get("owner_id") else None,
+        "total": total,
+        "processed": processed,
+        "failed": int(data.get("failed", 0)),
+        "not_found": int(data.get("not_found", 0)),
+        "pending": client.llen(_job_key(job_id, "pending")) + client.zcard(_job_key(job_id, "inflight")),
+        "progress": round(processed / total, 4) if total else 1.0,
+        "created_at": data.get("created_at"),
+        "updated_at": data.get("updated_at"),
+        "completed_at": data.get("completed_at") or None,
+    }
+
+
+def iter_job_results(job_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Yield the stored results of a job in submission order. FNRs not processed yet are skipped."""
+    client = cache.get_client()
+    fnrs_key = _job_key(job_id, "fnrs")
+    results_key = _job_key(job_id, "results")
+    total = client.llen(fnrs_key)
+    for start in range(0, total, batch_size):
+        fnrs = client.lrange(fnrs_key, start, start + batch_size - 1)
+        if not fnrs:
+            break
+        for raw in client.hmget(results_key, fnrs):
+            if raw is not None:
+                yield json.loads(raw)
+
+
+def result_to_csv_row(result: Dict[str, Any]) -> List[Any]:
+    """Flatten a job result into a row matching CSV_COLUMNS."""
+    indicators = result.get("riskIndicators") or {}
+    return [
+        result.get("firmenbuchnummer"),
+        result.get("name"),
+        result.get("status"),
+        result.get("riskScore"),
+        *[indicators.get(key) for key in RISK_INDICATOR_KEYS],
+        result.get("error"),
+    ]
+
+
+def screen_company(fnr: str) -> Dict[str, Any]:
+    """Score a single company. Never raises; errors are reported in the result."""
+    try:
+        company = get_company_by_id(fnr)
+    except Exception as e:
+        return {"firmenbuchnummer": fnr, "status": "error", "error": str(e)}
+
+    if company is None:
+        return {"firmenbuchnummer": fnr, "status": "not_found"}
+
+    risk_score = company.get("riskScore")
+    risk_indicators = company.get("riskIndicators") or {}
+    if risk_score is None and not risk_indicators:
+        try:
+            risk = refresh_company_risk(fnr)
+        except Exception as e:
+            return {"firmenbuchnummer": fnr, "status": "error", "error": str(e)}
+        if risk is not None:
+            risk_indicators, risk_score = risk
+
+    return {
+        "firmenbuchnummer": fnr,
+        "name": company.get("name"),
+        "status": "ok",
+        "riskScore": risk_score,
+        "riskIndicators": risk_indicators,
+    }
+
+
+def _record_result(job_id: str, fnr: str, result: Dict[str, Any]) -> None:
+    """Checkpoint the result of one FNR and update the job counters."""
+    client = cache.get_client()
+    status = result.get("status", "error")
+    stored = client.hsetnx(_job_key(job_id, "results"), fnr, json.dumps(result))
+
+    pipe = client.pipeline(transaction=True)
+    # The first result creates the hash; it expires with the rest of the unfinished job
+    pipe.expire(_job_key(job_id, "results"), JOB_MAX_RUNTIME + JOB_RESULT_TTL, nx=True)
+    if stored:
+        # Only count the first result, an FNR may run twice after a lease expired
+        pipe.hincrby(_job_key(job_id), "processed", 1)
+        if status == "error":
+            pipe.hincrby(_job_key(job_id), "failed", 1)
+        elif status == "not_found":
+            pipe.hincrby(_job_key(job_id), "not_found", 1)
+    pipe.zrem(_job_key(job_id, "inflight"), fnr)
+    pipe.hset(_job_key(job_id), "updated_at", datetime.now(timezone.utc).isoformat())
+    pipe.execute()
+
+    if stored:
+        screening_fnrs_processed_total.labels(status=status).inc()
+
+
+def _finish_if_done(job_id: str) -> None:
+    """Mark a job as completed once nothing is pending or in flight, and set the retention TTL."""
+    client = cache.get_client()
+    if client.llen(_job_key(job_id, "pending")) or client.zcard(_job_key(job_id, "inflight")):
+        return
+    if client.srem(ACTIVE_JOBS_KEY, job_id) == 0:
+        # Another worker already finished it
+        return
+
+    now = datetime.now(timezone.utc).isoformat()
+    pipe = client.pipeline(transaction=True)
+    pipe.hset(_job_key(job_id), mapping={"status": "completed", "completed_at": now, "updated_at": now})
+    for key in (_job_key(job_id), _job_key(job_id, "fnrs"), _job_key(job_id, "results")):
+        pipe.expire(key, JOB_RESULT_TTL)
+    pipe.execute()
+    print(f"Screening job {job_id} completed")
+
+
+def _drop_expired(job_id: str) -> None:
+    """Remove an active job whose state expired before it finished, with its leftover queues."""
+    client = cache.get_client()
+    if client.srem(ACTIVE_JOBS_KEY, job_id) == 0:
+        return
+    client.delete(*(_job_key(job_id, suffix) for suffix in ("fnrs", "pending", "inflight", "results")))
+    print(f"Screening job {job_id} expired before it was completed")
+
+
+class ScreeningWorker:
+    """
+    Processes screening jobs from Redis with a fixed number of threads.
+    Each thread claims one FNR at a time, so at most `concurrency` companies are
+    scored (and hit the Justiz API) in parallel per worker process.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, lease_seconds: int = JOB_LEASE_SECONDS):
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        client = cache.get_client()
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._requeue = client.register_script(_REQUEUE_SCRIPT)
+
+    def requeue_expired(self) -> int:
+        """Put FNRs whose lease expired back on their job's pending list."""
+        client = cache.get_client()
+        requeued = 0
+        for job_id in client.smembers(ACTIVE_JOBS_KEY):
+            requeued += int(self._requeue(
+                keys=[_job_key(job_id, "pending"), _job_key(job_id, "inflight")],
+                args=[time.time()],
+            ))
+        if requeued:
+            print(f"Requeued {requeued} FNRs with expired leases")
+        return requeued
+
+    def claim(self) -> Optional[tuple]:
+        """Claim the next FNR of any active job. Returns (job_id, fnr) or None."""
+        client = cache.get_client()
+        for job_id in client.smembers(ACTIVE_JOBS_KEY):
+            if not client.exists(_job_key(job_id)):
+                _drop_expired(job_id)
+                continue
+            items = self._claim(
+                keys=[_job_key(job_id, "pending"), _job_key(job_id, "inflight")],
+                args=[1, time.time() + self.lease_seconds],
+            )
+            if items:
+                if client.hget(_job_key(job_id), "status") == "queued":
+                    client.hset(_job_key(job_id), "status", "running")
+                return job_id, items[0]
+            _finish_if_done(job_id)
+        return None
+
+    def _run_thread(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self.claim()
+            except Exception as e:
+                print(f"Error claiming screening work: {e}")
+                claimed = None
+
+            if claimed is None:
+                self._stop.wait(JOB_POLL_INTERVAL)
+                continue
+
+            job_id, fnr = claimed
+            result = screen_company(fnr)
+            try:
+                _record_result(job_id, fnr, result)
+            except Exception as e:
+                # The lease expires and the FNR is retried
+                print(f"Error recording screening result for {fnr} in job {job_id}: {e}")
+
+    def start(self) -> None:
+        self.requeue_expired()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run_thread, name=f"screening-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run_forever(self) -> None:
+        """Start the worker threads and requeue expired leases until stopped."""
+        self.start()
+        while not self._stop.is_set():
+            self._stop.wait(max(1, self.lease_seconds // 2))
+            try:
+                self.requeue_expired()
+            except Exception as e:
+                print(f"Error requeueing expired screening work: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    cache.init()
+    start_worker_metrics_server()
+    worker = ScreeningWorker()
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    print(f"Screening worker started with concurrency {worker.concurrency}")
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
@@ -0,0 +1,112 @@
+"""
+Bounded in-process LRU cache with TTLs, used as the L1 tier in front of Redis (see src/cache.py).
+
+Entries are sized by the length of their serialized payload; once the byte budget is exceeded the
+least recently used entries are evicted. Values are stored deserialized and shared between
+callers, so they must be treated as read-only.
+
+Example usage:
+    l1 = LocalCache("api", max_bytes=64 * 1024 * 1024, ttl=10)
+    l1.set("api:company:1a", {"company": {...}}, size=4096)
+    found, value = l1.get("api:company:1a")
+"""
+
+import fnmatch
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+from .metrics import cache_l1_bytes, cache_l1_evictions_total
+
+
+def parse_size(value: str) -> int:
+    """Parse a size like '64MB', '512KB' or '1048576' into bytes."""
+    value = value.strip().upper()
+    for suffix, factor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024), ("B", 1)):
+        if value.endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+
+class LocalCache:
+    """Thread-safe LRU map with a byte budget and a TTL per entry."""
+
+    def __init__(self, name: str, max_bytes: int, ttl: float):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (value, size, expires_at), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value); expired entries are dropped."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, size, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                cache_l1_evictions_total.labels(entity_type=self.name, reason="expired").inc()
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        """Store a value; entries larger than the whole budget are not cached."""
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                cache_l1_evictions_total.labels(entity_type=self.name, reason="size").inc()
+            cache_l1_bytes.labels(entity_type=self.name).set(self._bytes)
+
+    def delete(self, keys: Iterable[str]) -> int:
+        """Drop keys; returns the number of entries removed."""
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    removed += 1
+            cache_l1_bytes.labels(entity_type=self.name).set(self._bytes)
+        return removed
+
+    def delete_matching(self, pattern: str) -> int:
+        """Drop all keys matching a Redis-style glob pattern; returns the number removed."""
+        with self._lock:
+            matching = [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]
+            for key in matching:
+                self._remove(key)
+            cache_l1_bytes.labels(entity_type=self.name).set(self._bytes)
+        return len(matching)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            cache_l1_bytes.labels(entity_type=self.name).set(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
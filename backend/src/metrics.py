@@ -5,8 +5,9 @@ This module defines custom business metrics and provides instrumentation
 for monitoring application health, performance, and usage patterns.
 """
 
-from prometheus_client import Counter, Histogram, Gauge, Info
+from prometheus_client import Counter, Histogram, Gauge, Info, start_http_server
 from typing import Optional
+import os
 import time
 
 # Application Info
@@ -31,6 +32,23 @@ company_detail_views_total = Counter(
     'Total number of company detail page views'
 )
 
+company_batch_requests_total = Counter(
+    'bizray_company_batch_requests_total',
+    'Total number of batch company lookup requests'
+)
+
+company_batch_size = Histogram(
+    'bizray_company_batch_size',
+    'Number of companies requested per batch lookup',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500)
+)
+
+person_searches_total = Counter(
+    'bizray_person_searches_total',
+    'Total number of person (partner) searches',
+    ['fuzzy']
+)
+
 search_suggestions_total = Counter(
     'bizray_search_suggestions_total',
     'Total number of search suggestion requests'
@@ -53,6 +71,18 @@ recommendations_requests_total = Counter(
     'Total number of recommendations endpoint requests'
 )
 
+# Screening job metrics
+screening_jobs_created_total = Counter(
+    'bizray_screening_jobs_created_total',
+    'Total number of bulk risk screening jobs created'
+)
+
+screening_fnrs_processed_total = Counter(
+    'bizray_screening_fnrs_processed_total',
+    'Total number of FNRs processed by screening workers',
+    ['status']  # 'ok', 'not_found', 'error'
+)
+
 # Authentication Metrics
 
 user_registrations_total = Counter(
@@ -101,6 +131,85 @@ cache_errors_total = Counter(
     ['operation']
 )
 
+cache_tier_lookups_total = Counter(
+    'bizray_cache_tier_lookups_total',
+    'Cache lookups per tier (l1 = in-process, redis)',
+    ['tier', 'entity_type', 'result']  # result: 'hit', 'miss'
+)
+
+cache_l1_bytes = Gauge(
+    'bizray_cache_l1_bytes',
+    'Payload bytes held in the in-process L1 cache',
+    ['entity_type']
+)
+
+cache_l1_evictions_total = Counter(
+    'bizray_cache_l1_evictions_total',
+    'Entries removed from the in-process L1 cache before being invalidated',
+    ['entity_type', 'reason']  # reason: 'size' (byte budget), 'expired'
+)
+
+cache_codec_bytes_total = Counter(
+    'bizray_cache_codec_bytes_total',
+    'Bytes of cached values written, before and after compression',
+    ['entity_type', 'stage']  # stage: 'serialized', 'stored'
+)
+
+cache_codec_duration = Histogram(
+    'bizray_cache_codec_duration_seconds',
+    'Time spent encoding and decoding cached values',
+    ['entity_type', 'operation'],  # operation: 'encode', 'decode'
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+
+cache_stale_served_total = Counter(
+    'bizray_cache_stale_served_total',
+    'Stale cache entries served while a background refresh runs',
+    ['entity_type']
+)
+
+cache_background_refreshes_total = Counter(
+    'bizray_cache_background_refreshes_total',
+    'Background refreshes of stale cache entries',
+    ['result']  # 'started', 'ok', 'error'
+)
+
+cache_recomputes_total = Counter(
+    'bizray_cache_recomputes_total',
+    'Values computed by get_or_compute, on a miss or early before their expiry',
+    ['entity_type', 'reason']  # reason: 'miss', 'early'
+)
+
+cache_family_keys = Gauge(
+    'bizray_cache_family_keys',
+    'Tracked keys of cache key families with a quota',
+    ['family']
+)
+
+cache_family_bytes = Gauge(
+    'bizray_cache_family_bytes',
+    'Stored payload bytes of cache key families with a quota',
+    ['family']
+)
+
+cache_quota_evictions_total = Counter(
+    'bizray_cache_quota_evictions_total',
+    'Cache entries evicted because their key family exceeded its quota',
+    ['family']
+)
+
+cache_negative_entries_total = Counter(
+    'bizray_cache_negative_entries_total',
+    'Negative cache entries (lookups that found nothing) written and served',
+    ['family', 'event']  # event: 'stored', 'hit'
+)
+
+coalesced_requests_total = Counter(
+    'bizray_coalesced_requests_total',
+    'Requests that waited for an identical in-flight computation instead of computing it',
+    ['operation', 'scope']  # scope: 'local' (same process), 'remote' (other replica)
+)
+
 redis_connected = Gauge(
     'bizray_redis_connected',
     'Redis connection status (1=connected, 0=disconnected)'
@@ -150,6 +259,67 @@ external_api_duration = Histogram(
     ['api_name', 'operation']
 )
 
+circuit_breaker_state = Gauge(
+    'bizray_circuit_breaker_state',
+    'Circuit breaker state (0=closed, 1=half-open, 2=open)',
+    ['name']
+)
+
+circuit_breaker_transitions_total = Counter(
+    'bizray_circuit_breaker_transitions_total',
+    'Circuit breaker state changes, by the state entered',
+    ['name', 'state']
+)
+
+circuit_breaker_rejected_total = Counter(
+    'bizray_circuit_breaker_rejected_total',
+    'Calls refused without contacting the service because the circuit breaker was open',
+    ['name', 'operation']
+)
+
+soap_retries_total = Counter(
+    'bizray_soap_retries_total',
+    'Justiz SOAP calls retried after a connection error, timeout or 429/5xx answer',
+    ['operation']
+)
+
+# Urkunde document store
+
+urkunde_listing_revalidations_total = Counter(
+    'bizray_urkunde_listing_revalidations_total',
+    'Background revalidations of cached SUCHEURKUNDE listings',
+    ['result']  # 'ok', 'empty', 'error'
+)
+
+urkunde_store_lookups_total = Counter(
+    'bizray_urkunde_store_lookups_total',
+    'Urkunde document store lookups',
+    ['result']  # 'hit', 'miss'
+)
+
+urkunde_store_documents = Gauge(
+    'bizray_urkunde_store_documents',
+    'Number of Urkunde documents in the persistent store'
+)
+
+urkunde_store_bytes = Gauge(
+    'bizray_urkunde_store_bytes',
+    'Compressed size of the raw XML in the Urkunde document store in bytes'
+)
+
+# Risk worker
+
+risk_companies_computed_total = Counter(
+    'bizray_risk_companies_computed_total',
+    'Companies processed by the risk precomputation worker',
+    ['result']  # 'ok', 'no_data', 'error'
+)
+
+risk_worker_last_run_timestamp = Gauge(
+    'bizray_risk_worker_last_run_timestamp',
+    'Unix time of the last completed risk worker pass'
+)
+
 # Admin Operations Metrics
 
 admin_user_operations_total = Counter(
@@ -225,3 +395,17 @@ class DatabaseQueryTimer:
     def __exit__(self, exc_type, exc_val, exc_tb):
         duration = time.time() - self.start_time
         db_query_duration.labels(operation=self.operation).observe(duration)
+
+
+def start_worker_metrics_server(port: Optional[int] = None) -> None:
+    """
+    Serve /metrics from a worker process, which has no API to expose them.
+
+    Args:
+        port: Port to listen on (defaults to BIZRAY_WORKER_METRICS_PORT or 9100; 0 disables it)
+    """
+    if port is None:
+        port = int(os.getenv("BIZRAY_WORKER_METRICS_PORT", "9100"))
+    if port:
+        start_http_server(port)
+        print(f"Worker metrics served on port {port}")
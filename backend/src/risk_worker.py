@@ -0,0 +1,275 @@
+"""
+Background risk precomputation.
+
+The worker calculates the risk indicators of companies outside the request path and stores
+them in the risk_indicators table and companies.risk_score, so the detail view only reads
+stored values and never waits for the Justiz API.
+
+A company is due when
+    - companies.risk_computed_at is NULL (never computed, or marked as changed by ingestion), or
+    - its risk data is older than BIZRAY_RISK_MAX_AGE (new filings show up in the listing).
+Companies without usable documents are retried after BIZRAY_RISK_RETRY_AFTER. While the Justiz
+circuit breaker is open, companies without results stay due and the pass stops early.
+
+Run with:
+    python -m src.risk_worker            # loop every BIZRAY_RISK_INTERVAL seconds
+    python -m src.risk_worker --once     # a single pass, e.g. from cron
+    python -m src.risk_worker --all      # recompute every company once
+
+Metrics are served on BIZRAY_WORKER_METRICS_PORT (default 9100).
+"""
+
+import argparse
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
+
+from . import cache
+from .cache_keys import COMPANY
+from .circuit_breaker import justiz_breaker
+from .controller import compute_company_risk
+from .db import SessionLocal, Company, RiskIndicator, engine
+from .metrics import risk_companies_computed_total, risk_worker_last_run_timestamp, start_worker_metrics_server
+
+# Seconds between two passes of the worker loop
+RISK_INTERVAL = int(os.getenv("BIZRAY_RISK_INTERVAL", "3600"))
+# Stored risk data older than this is recomputed
+RISK_MAX_AGE = int(os.getenv("BIZRAY_RISK_MAX_AGE", str(7 * 86400)))
+# Companies without usable documents (or a failed Justiz call) are retried after this
+RISK_RETRY_AFTER = int(os.getenv("BIZRAY_RISK_RETRY_AFTER", "86400"))
+# Companies per batch (one bulk write per batch)
+RISK_BATCH_SIZE = int(os.getenv("BIZRAY_RISK_BATCH_SIZE", "200"))
+# Concurrent companies per worker process (bounds parallel calls to the Justiz API)
+RISK_CONCURRENCY = int(os.getenv("BIZRAY_RISK_CONCURRENCY", "8"))
+
+
+def _due_condition(now: datetime):
+    return or_(
+        Company.risk_computed_at.is_(None),
+        Company.risk_computed_at < now - timedelta(seconds=RISK_MAX_AGE),
+    )
+
+
+def select_due_companies(limit: int, after_id: int = 0, recompute_all: bool = False) -> List[Company]:
+    """Load the next batch of due companies (with registry entries), ordered by id."""
+    stmt = (
+        select(Company)
+        .options(selectinload(Company.registry_entries))
+        .where(Company.id > after_id)
+        .order_by(Company.id.asc())
+        .limit(limit)
+    )
+    if not recompute_all:
+        stmt = stmt.where(_due_condition(datetime.now(timezone.utc)))
+
+    session = SessionLocal()
+    try:
+        companies = session.execute(stmt).scalars().all()
+        # Detached objects are only read by compute_company_risk
+        session.expunge_all()
+        return companies
+    finally:
+        session.close()
+
+
+def store_risk_results(results: List[Tuple[int, Optional[Tuple[Dict[str, Any], Optional[float]]]]]) -> None:
+    """
+    Write the risk data of a batch of companies with bulk statements.
+
+    Args:
+        results: (company id, (indicators, risk_score)) pairs; None instead of the tuple
+            means nothing could be computed, the stored values are kept and retried later
+    """
+    if not results:
+        return
+
+    now = datetime.now(timezone.utc)
+    retry_at = now - timedelta(seconds=max(0, RISK_MAX_AGE - RISK_RETRY_AFTER))
+
+    # Without an upsert (SQLite) all indicators of a company are replaced
+    upsert = engine.dialect.name == "postgresql"
+    company_rows = []
+    indicator_rows = []
+    stale_conditions = []
+    for company_id, risk in results:
+        if risk is None:
+            company_rows.append({"id": company_id, "risk_computed_at": retry_at})
+            continue
+        indicators, risk_score = risk
+        company_rows.append({"id": company_id, "risk_score": risk_score, "risk_computed_at": now})
+        present = [key for key, value in indicators.items() if value is not None]
+        indicator_rows.extend(
+            {"company_id": company_id, "key": key, "value": indicators[key]} for key in present
+        )
+        condition = RiskIndicator.company_id == company_id
+        if present and upsert:
+            condition = and_(condition, RiskIndicator.key.notin_(present))
+        stale_conditions.append(condition)
+
+    # Rows without risk_score keep the stored score (executemany needs matching columns)
+    computed_rows = [row for row in company_rows if "risk_score" in row]
+    retry_rows = [row for row in company_rows if "risk_score" not in row]
+
+    session = SessionLocal()
+    try:
+        if stale_conditions:
+            session.execute(RiskIndicator.__table__.delete().where(or_(*stale_conditions)))
+        if indicator_rows:
+            if upsert:
+                stmt = pg_insert(RiskIndicator.__table__).values(indicator_rows)
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=[RiskIndicator.__table__.c.company_id, RiskIndicator.__table__.c.key],
+                    set_={"value": stmt.excluded.value},
+                ))
+            else:
+                session.execute(RiskIndicator.__table__.insert(), indicator_rows)
+        if computed_rows:
+            session.execute(update(Company), computed_rows)
+        if retry_rows:
+            session.execute(update(Company), retry_rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _invalidate_company_caches(fnrs: List[str]) -> None:
+    """Drop cached detail views so the new values are served right away."""
+    if not fnrs or cache._redis_client is None:
+        return
+    try:
+        cache.delete_many([COMPANY.key(fnr) for fnr in fnrs], entity_type=COMPANY.entity_type)
+    except Exception as e:
+        print(f"Error invalidating cached companies: {e}")
+
+
+def _compute(company: Company) -> Optional[Tuple[Dict[str, Any], Optional[float]]]:
+    try:
+        risk = compute_company_risk(company)
+    except Exception as e:
+        print(f"Error computing risk for {company.firmenbuchnummer}: {e}")
+        risk_companies_computed_total.labels(result="error").inc()
+        return None
+    risk_companies_computed_total.labels(result="ok" if risk is not None else "no_data").inc()
+    return risk
+
+
+def refresh_companies(companies: List[Company], executor: ThreadPoolExecutor) -> int:
+    """Compute and store the risk data of a batch of loaded companies."""
+    risks = list(executor.map(_compute, companies))
+    # Without an answer from the Justiz API there is nothing to learn about the company
+    unavailable = justiz_breaker.is_open()
+    store_risk_results([
+        (company.id, risk) for company, risk in zip(companies, risks) if risk is not None or not unavailable
+    ])
+    _invalidate_company_caches([
+        company.firmenbuchnummer for company, risk in zip(companies, risks) if risk is not None
+    ])
+    return len(companies)
+
+
+def refresh_company_risk(fnr: str) -> Optional[Tuple[Dict[str, Any], Optional[float]]]:
+    """Compute and store the risk data of one company right away (used by screening jobs)."""
+    session = SessionLocal()
+    try:
+        company = session.execute(
+            select(Company)
+            .options(selectinload(Company.registry_entries))
+            .where(Company.firmenbuchnummer == fnr)
+        ).scalars().first()
+        if company is None:
+            return None
+        session.expunge_all()
+    finally:
+        session.close()
+
+    risk = _compute(company)
+    if risk is None and justiz_breaker.is_open():
+        return None
+    store_risk_results([(company.id, risk)])
+    if risk is not None:
+        _invalidate_company_caches([fnr])
+    return risk
+
+
+class RiskWorker:
+    """Recomputes the risk data of due companies in batches, on a fixed interval."""
+
+    def __init__(self, concurrency: int = RISK_CONCURRENCY, batch_size: int = RISK_BATCH_SIZE):
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self._stop = threading.Event()
+
+    def run_once(self, recompute_all: bool = False) -> int:
+        """Process every company that is due. Returns the number of companies processed."""
+        processed = 0
+        last_id = 0
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="risk-worker") as executor:
+            while not self._stop.is_set():
+                companies = select_due_companies(self.batch_size, after_id=last_id, recompute_all=recompute_all)
+                if not companies:
+                    break
+                last_id = companies[-1].id
+                try:
+                    processed += refresh_companies(companies, executor)
+                except Exception as e:
+                    # The batch stays due and is picked up by the next pass
+                    print(f"Error storing risk data for companies up to id {last_id}: {e}")
+                print(f"Risk worker: {processed} companies processed (last id {last_id})")
+                if justiz_breaker.is_open():
+                    print("Justiz API unavailable (circuit breaker open), continuing with the next pass")
+                    break
+
+        risk_worker_last_run_timestamp.set(time.time())
+        print(f"Risk worker pass finished: {processed} companies in {time.time() - started:.0f}s")
+        return processed
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Risk worker pass failed: {e}")
+            self._stop.wait(RISK_INTERVAL)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Precompute company risk indicators")
+    arg_parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    arg_parser.add_argument("--all", action="store_true", help="recompute every company, not only due ones")
+    args = arg_parser.parse_args()
+
+    from .db import init_db
+    init_db()
+    # Redis is optional here; it caches listings and lets the worker invalidate detail views
+    try:
+        cache.init()
+    except Exception as e:
+        print(f"Redis not available, continuing without cache: {e}")
+
+    start_worker_metrics_server()
+
+    worker = RiskWorker()
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    print(f"Risk worker started with concurrency {worker.concurrency}")
+    try:
+        if args.once or args.all:
+            worker.run_once(recompute_all=args.all)
+        else:
+            worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
@@ -0,0 +1,172 @@
+"""
+Request coalescing (single-flight) for expensive computations.
+
+Concurrent callers asking for the same key share one computation:
+    - within a process, the first caller computes and the others wait for its result;
+    - across replicas, the computing process holds a Redis lease (lock:flight:{key}), and the
+      other replicas wait until the result shows up in the cache instead of computing it again.
+
+The computation is expected to write its result to the cache, so waiters on other replicas
+can read it with cache_lookup. If the leader fails, its lease expires or the wait times out,
+waiters fall back to computing the value themselves.
+
+Example usage:
+    response = await coalesce_async(
+        f"company:{fnr}",
+        lambda: load_and_cache_company(fnr),
+        cache_lookup=lambda: get_cache_async(f"company:{fnr}"),
+        operation="company",
+    )
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+import redis
+
+from . import cache
+from .metrics import coalesced_requests_total
+
+# Seconds a replica may compute a key before other replicas stop waiting for it
+LEASE_TTL = int(os.getenv("BIZRAY_SINGLEFLIGHT_LEASE", "30"))
+# Longest a waiter waits for the leader before computing the value itself
+WAIT_TIMEOUT = float(os.getenv("BIZRAY_SINGLEFLIGHT_WAIT", "30"))
+# How often waiters on other replicas look for the result
+POLL_INTERVAL = float(os.getenv("BIZRAY_SINGLEFLIGHT_POLL", "0.1"))
+
+# Delete the lease only if it is still ours (it may have expired and been taken over)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _LeaderCancelled(Exception):
+    """The coroutine computing a key was cancelled; its waiters compute the value themselves."""
+
+
+# In-flight coroutines per event loop and key
+_async_flights: Dict[Tuple[int, str], "asyncio.Future[Any]"] = {}
+
+
+async def _lookup_async(cache_lookup: Optional[Callable[[], Awaitable[Any]]]) -> Any:
+    if cache_lookup is None:
+        return None
+    try:
+        return await cache_lookup()
+    except Exception:
+        return None
+
+
+async def _compute_with_lease_async(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    cache_lookup: Optional[Callable[[], Awaitable[Any]]],
+    operation: str,
+    lease_ttl: int,
+    wait_timeout: float,
+) -> Any:
+    """Compute the value, or wait for the replica that holds the lease of the key."""
+    client = cache._redis_client
+    if client is None or not cache.redis_available():
+        return await compute()
+    async_client = cache.get_async_client()
+
+    async def _redis(command: str, *args, **kwargs) -> Any:
+        if async_client is not None:
+            return await getattr(async_client, command)(*args, **kwargs)
+        return await asyncio.to_thread(getattr(client, command), *args, **kwargs)
+
+    lock_key = f"lock:flight:{key}"
+    token = uuid4().hex
+    try:
+        acquired = await _redis("set", lock_key, token, nx=True, ex=lease_ttl)
+    except redis.RedisError:
+        return await compute()
+
+    if acquired:
+        try:
+            return await compute()
+        finally:
+            try:
+                await _redis("eval", _RELEASE_SCRIPT, 1, lock_key, token)
+            except redis.RedisError:
+                pass
+
+    # Another replica is computing this key: wait for its result in the cache
+    coalesced_requests_total.labels(operation=operation, scope="remote").inc()
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        value = await _lookup_async(cache_lookup)
+        if value is not None:
+            return value
+        try:
+            if not await _redis("exists", lock_key):
+                break
+        except redis.RedisError:
+            break
+
+    # The leader finished without a cached result, failed, or took too long
+    value = await _lookup_async(cache_lookup)
+    if value is not None:
+        return value
+    return await compute()
+
+
+async def coalesce_async(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    cache_lookup: Optional[Callable[[], Awaitable[Any]]] = None,
+    operation: str = "default",
+    lease_ttl: int = LEASE_TTL,
+    wait_timeout: float = WAIT_TIMEOUT,
+) -> Any:
+    """
+    Run the coroutine function compute once for all concurrent callers of the same key on this
+    event loop (and across replicas through the Redis lease).
+
+    Args:
+        key: Identifies the computation (usually its cache key)
+        compute: Coroutine function computing the value (and writing it to the cache)
+        cache_lookup: Coroutine function reading the cached value
+        operation: Metric label for the kind of computation
+        lease_ttl: Seconds the Redis lease is held at most
+        wait_timeout: Seconds to wait for another caller before computing the value directly
+
+    Returns:
+        The value computed by this caller or by the leader it waited for.
+    """
+    loop = asyncio.get_running_loop()
+    flight_key = (id(loop), key)
+
+    flight = _async_flights.get(flight_key)
+    if flight is not None:
+        coalesced_requests_total.labels(operation=operation, scope="local").inc()
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), wait_timeout)
+        except (asyncio.TimeoutError, _LeaderCancelled):
+            return await compute()
+
+    flight = loop.create_future()
+    _async_flights[flight_key] = flight
+    try:
+        result = await _compute_with_lease_async(key, compute, cache_lookup, operation, lease_ttl, wait_timeout)
+        flight.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        flight.set_exception(_LeaderCancelled())
+        raise
+    except BaseException as e:
+        flight.set_exception(e)
+        raise
+    finally:
+        _async_flights.pop(flight_key, None)
+        # Waiters may all be gone; do not warn about an unretrieved exception
+        if flight.done() and not flight.cancelled():
+            flight.exception()
@@ -0,0 +1,706 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+import redis
+
+import src.cache as cache
+import src.cache_keys as cache_keys
+import src.controller as controller
+from src.cache_keys import ADMIN_USERS_LIST, COMPANY, SEARCH
+from src.local_cache import LocalCache
+from src.metrics import redis_connected
+
+
+class _FakeRedis:
+    """Minimal in-memory stand-in for the redis-py calls used by src.cache"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.gets = 0
+        self.round_trips = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.gets += 1
+        return [self.data.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+        return True
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def eval(self, script, numkeys, key, token):
+        # Only the compare-and-delete lease release is scripted
+        return self.delete(key) if self.data.get(key) == token else 0
+
+    def zincrby(self, key, amount, member):
+        scores = self.data.setdefault(key, {})
+        scores[member] = scores.get(member, 0) + amount
+        return scores[member]
+
+    def zrevrange(self, key, start, end, withscores=False):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: -item[1])
+
+    def zrem(self, key, *members):
+        return sum(1 for member in members if self.data.get(key, {}).pop(member, None) is not None)
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    """Queues calls on a _FakeRedis and runs them on execute()"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.calls = []
+
+    def execute(self):
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.client.round_trips += 1
+        self.calls = []
+        return results
+
+
+@pytest.fixture(autouse=True)
+def empty_local_cache():
+    cache.clear_local_cache()
+    yield
+    cache.clear_local_cache()
+
+
+class _FakeAsyncRedis:
+    """redis.asyncio facade over a _FakeRedis; every round-trip takes `latency` seconds"""
+
+    def __init__(self, latency=0.0):
+        self.sync = _FakeRedis()
+        self.latency = latency
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def command(*args, **kwargs):
+            await asyncio.sleep(self.latency)
+            return method(*args, **kwargs)
+        return command
+
+    def pipeline(self, transaction=True):
+        pipe = _FakePipeline(self.sync)
+        run = pipe.execute
+
+        async def execute():
+            await asyncio.sleep(self.latency)
+            return run()
+        pipe.execute = execute
+        return pipe
+
+
+class _RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+
+
+def test_swr_fresh_and_stale(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", _FakeRedis())
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+
+    cache.set_cache_swr("company:1a", {"company": {"name": "A"}}, soft_ttl=60, hard_ttl=600)
+    assert cache.get_cache_swr("company:1a") == ({"company": {"name": "A"}}, False)
+
+    clock[0] += 61
+    assert cache.get_cache_swr("company:1a") == ({"company": {"name": "A"}}, True)
+
+
+def test_swr_reads_plain_entries_as_stale(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", _FakeRedis())
+    cache.set_cache("company:1a", {"company": {"name": "A"}}, ttl=600)
+    assert cache.get_cache_swr("company:1a") == ({"company": {"name": "A"}}, True)
+    assert cache.get_cache_swr("company:2b") == (None, False)
+
+
+def test_single_background_refresh_per_key(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    # Another replica holds the refresh lock
+    client.set("lock:refresh:api:company:1a", "1")
+    assert cache.refresh_in_background("company:1a", lambda: {"company": {}}) is False
+
+    client.delete("lock:refresh:api:company:1a")
+    executor = _RecordingExecutor()
+    monkeypatch.setattr(cache, "_get_refresh_executor", lambda: executor)
+    assert cache.refresh_in_background("company:1a", lambda: {"company": {}}) is True
+    assert cache.refresh_in_background("company:1a", lambda: {"company": {}}) is False
+    assert len(executor.submitted) == 1
+
+
+def test_refresh_lock_release_keeps_a_lock_taken_over(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    executor = _RecordingExecutor()
+    monkeypatch.setattr(cache, "_get_refresh_executor", lambda: executor)
+
+    def slow_compute():
+        # Our lock expired while the refresh was queued and another replica took it over
+        client.data["lock:refresh:api:company:2b"] = "other"
+        return {"company": {}}
+
+    assert cache.refresh_in_background("company:2b", slow_compute) is True
+    cache._run_refresh(*executor.submitted[0])
+    assert client.data["lock:refresh:api:company:2b"] == "other"
+
+    # Without a takeover the lock is released
+    client.delete("lock:refresh:api:company:2b")
+    assert cache.refresh_in_background("company:2b", lambda: {"company": {}}) is True
+    cache._run_refresh(*executor.submitted[1])
+    assert "lock:refresh:api:company:2b" not in client.data
+
+
+def test_local_tier_serves_repeated_reads(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    cache.set_cache("company:1a", {"company": {"name": "A"}}, ttl=600)
+
+    assert cache.get_cache("company:1a") == {"company": {"name": "A"}}
+    assert cache.get_cache("company:1a") == {"company": {"name": "A"}}
+    assert client.gets == 1
+
+    # A write drops the local copy
+    cache.set_cache("company:1a", {"company": {"name": "B"}}, ttl=600)
+    assert cache.get_cache("company:1a") == {"company": {"name": "B"}}
+    assert client.gets == 2
+
+
+def test_invalidation_messages_of_other_replicas(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    client.data["api:company:1a"] = json.dumps({"name": "A"})
+    client.data["api:admin:users:list:1"] = json.dumps([])
+    cache.get_cache("company:1a")
+    cache.get_cache("admin:users:list:1")
+
+    own = {"origin": cache._instance_id, "keys": ["api:company:1a"], "patterns": []}
+    cache._on_invalidation({"data": json.dumps(own)})
+    cache.get_cache("company:1a")
+    assert client.gets == 2
+
+    other = {"origin": "replica-2", "keys": ["api:company:1a"], "patterns": ["api:admin:users:list:*"]}
+    cache._on_invalidation({"data": json.dumps(other)})
+    cache.get_cache("company:1a")
+    cache.get_cache("admin:users:list:1")
+    assert client.gets == 4
+
+
+def test_local_cache_byte_budget_and_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("src.local_cache.time.monotonic", lambda: clock[0])
+    l1 = LocalCache("test", max_bytes=100, ttl=10)
+
+    l1.set("a", 1, size=40)
+    l1.set("b", 2, size=40)
+    l1.get("a")
+    l1.set("c", 3, size=40)
+    l1.set("huge", 4, size=200)
+
+    # "b" was the least recently used entry
+    assert [l1.get(key)[0] for key in ("a", "b", "c", "huge")] == [True, False, True, False]
+    assert l1.size_bytes == 80
+
+    clock[0] += 11
+    assert l1.get("a") == (False, None)
+
+
+def test_key_families_are_versioned_and_unique():
+    assert COMPANY.key("1a") == "company:v2:1a"
+    assert ADMIN_USERS_LIST.pattern() == "admin:users:list:v1:*"
+    with pytest.raises(ValueError):
+        cache_keys._family("company", "api", owner="api.get_company")
+
+
+def test_keys_are_canonical_and_bounded():
+    assert SEARCH.key("bau:gmbh", 1, 10, ["Wien", "Linz", "Wien"]) == "search:v2:bau%3Agmbh:1:10:Linz,Wien"
+    assert SEARCH.key("bau", 1, 10, None) == SEARCH.key("bau", 1, 10, []) == "search:v2:bau:1:10:"
+
+    long_key = SEARCH.key("x" * 5000, 1, 10, None)
+    assert len(long_key) <= cache_keys.MAX_KEY_LENGTH
+    assert long_key == SEARCH.key("x" * 5000, 1, 10, None) != SEARCH.key("x" * 4999, 1, 10, None)
+    assert cache_keys.family_of(long_key) is SEARCH
+    assert cache_keys.family_of(COMPANY.key("1a")) is COMPANY
+    assert cache_keys.family_of("company:v1:1a") is None
+
+
+def test_family_quota_evicts_entries_closest_to_expiry(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(cache, "_quota_scripts_loaded", {})
+    monkeypatch.setattr(SEARCH, "max_keys", 3)
+    monkeypatch.setattr(SEARCH, "max_bytes", 0)
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+    index, _, total = cache._quota_keys(SEARCH)
+
+    keys = [SEARCH.key(f"query {i}", 1, 10, None) for i in range(5)]
+    for key in keys:
+        clock[0] += 1
+        assert cache.set_cache(key, {"companies": [], "total": 0}, ttl=3600)
+
+    assert [cache.get_cache(key) for key in keys[:2]] == [None, None]
+    assert all(cache.get_cache(key) is not None for key in keys[2:])
+    assert client.zcard(index) == 3
+    # Writes send the script by SHA only
+    assert client.script_exists(cache._quota_scripts()[0].sha) == [True]
+
+    # The byte quota evicts as well, but never the entry just written
+    monkeypatch.setattr(SEARCH, "max_bytes", 1)
+    clock[0] += 1
+    cache.set_cache(keys[0], {"companies": [], "total": 0}, ttl=3600)
+    assert [cache.get_cache(key) is not None for key in keys] == [True, False, False, False, False]
+    assert int(client.get(total)) == len(client.get("api:" + keys[0]))
+
+
+def test_deletes_release_family_quota(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(cache, "_quota_scripts_loaded", {})
+    index, sizes, total = cache._quota_keys(SEARCH)
+    keys = [SEARCH.key(f"query {i}", 1, 10, None) for i in range(4)]
+    cache.set_many({key: {"companies": [], "total": i} for i, key in enumerate(keys)}, ttl=3600)
+
+    cache.delete_many(keys[:1])
+    assert client.zcard(index) == 3
+    assert int(client.get(total)) == sum(len(client.get("api:" + key)) for key in keys[1:])
+
+    assert cache.delete_matching(SEARCH.pattern()) == 3
+    assert client.zcard(index) == 0 and client.hlen(sizes) == 0
+    assert int(client.get(total)) == 0
+
+
+def test_company_detail_is_cached_once(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    company = {"firmenbuchnummer": "1a", "name": "A", "riskStatus": "ok"}
+
+    controller._cache_company("1a", company)
+
+    assert list(client.data) == ["db:company:v2:1a"]
+    assert controller.get_cached_company("1a") == (company, False)
+    # Batch lookups read the same entries, without touching the database
+    assert list(controller.iter_companies_by_ids(["1a"])) == [("1a", company)]
+
+
+def test_batch_lookup_reads_cache_hits_with_one_mget(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    companies = {cid: {"firmenbuchnummer": cid, "name": cid.upper(), "riskStatus": "ok"} for cid in ("3c", "1a", "2b")}
+    for cid, company in companies.items():
+        controller._cache_company(cid, company)
+    client.gets = 0
+
+    # Cached companies come back in request order, duplicates once, without a database session
+    result = list(controller.iter_companies_by_ids(["2b", "3c", "2b", "1a"], session=object()))
+
+    assert result == [("2b", companies["2b"]), ("3c", companies["3c"]), ("1a", companies["1a"])]
+    assert client.gets == 1
+
+
+def test_batch_lookup_mixes_hits_negative_entries_and_misses(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from src.db import Address, Base, Company, Partner, RegistryEntry, RiskIndicator
+
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(controller, "RISK_ON_REQUEST", False)
+    engine = create_engine("sqlite://")
+    tables = [model.__table__ for model in (Company, Address, Partner, RegistryEntry, RiskIndicator)]
+    Base.metadata.create_all(engine, tables=tables)
+    session = Session(engine)
+    session.add(Company(firmenbuchnummer="3c", name="Gamma KG"))
+    session.commit()
+
+    cached = {"firmenbuchnummer": "1a", "name": "Alpha GmbH", "riskStatus": "ok"}
+    controller._cache_company("1a", cached)
+    controller._cache_company("2b", cache.NOT_FOUND)
+
+    result = dict(controller.iter_companies_by_ids(["4d", "3c", "2b", "1a"], session=session))
+
+    assert list(result)[:2] == ["2b", "1a"]
+    assert result["1a"] == cached and result["2b"] is None and result["4d"] is None
+    assert result["3c"]["name"] == "Gamma KG"
+    # The miss is cached for the next lookup, the unknown id as a negative entry
+    assert controller.get_cached_company("3c")[0]["name"] == "Gamma KG"
+    assert cache.is_not_found(controller.get_cached_company("4d")[0])
+    session.close()
+
+
+def test_batch_lookup_refreshes_stale_hits(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", _FakeRedis())
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+    refreshed = []
+    monkeypatch.setattr(controller, "refresh_in_background", lambda key, compute, **kwargs: refreshed.append((key, kwargs)))
+    controller._cache_company("1a", {"firmenbuchnummer": "1a", "name": "Alpha GmbH", "riskStatus": "ok"})
+    controller._cache_company("2b", cache.NOT_FOUND)
+
+    assert [cid for cid, _ in controller.iter_companies_by_ids(["1a", "2b"], session=object())] == ["1a", "2b"]
+    assert refreshed == []
+
+    clock[0] += controller.COMPANY_SOFT_TTL + 1
+    result = dict(controller.iter_companies_by_ids(["1a", "2b"], session=object()))
+
+    # The stale view is served and refreshed by its owner, get_company_by_id
+    assert result["1a"]["name"] == "Alpha GmbH"
+    assert refreshed == [(COMPANY.key("1a"), {"entity_type": COMPANY.entity_type, "store": False})]
+
+
+def test_batch_lookup_releases_its_session_before_streaming(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from src.db import Address, Base, Company, Partner, RegistryEntry, RiskIndicator
+
+    monkeypatch.setattr(cache, "_redis_client", _FakeRedis())
+    monkeypatch.setattr(controller, "RISK_ON_REQUEST", False)
+    engine = create_engine("sqlite://")
+    tables = [model.__table__ for model in (Company, Address, Partner, RegistryEntry, RiskIndicator)]
+    Base.metadata.create_all(engine, tables=tables)
+    with Session(engine) as session:
+        session.add(Company(firmenbuchnummer="1a", name="Alpha GmbH", address=Address(city="Wien"),
+                            partners=[Partner(name="Max Mustermann")]))
+        session.commit()
+
+    closed = []
+
+    class _TrackedSession(Session):
+        def close(self):
+            closed.append(True)
+            super().close()
+    monkeypatch.setattr(controller, "SessionLocal", lambda: _TrackedSession(engine))
+
+    results = controller.iter_companies_by_ids(["1a"])
+    cid, company = next(results)
+
+    assert closed == [True]
+    assert (cid, company["address"]["city"], company["partners"][0]["name"]) == ("1a", "Wien", "Max Mustermann")
+    assert list(results) == []
+
+
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import api
+
+    def companies(ids):
+        yield "1a", {"firmenbuchnummer": "1a", "name": "Alpha GmbH"}
+        yield "2b", None
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(api, "iter_companies_by_ids", companies)
+    app = FastAPI()
+    app.include_router(api.api_router)
+
+    response = TestClient(app).post("/api/v1/company/batch", json={"ids": ["1a", "2b", "3c"]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"firmenbuchnummer": "1a", "company": {"firmenbuchnummer": "1a", "name": "Alpha GmbH"}},
+        {"firmenbuchnummer": "2b", "error": "Company not found"},
+        {"error": "database unavailable"},
+    ]
+    assert TestClient(app).post("/api/v1/company/batch", json={"ids": []}).status_code == 422
+
+
+class _CountingSession:
+    """Session stand-in that finds no company"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def execute(self, stmt):
+        self.queries += 1
+        return type("Result", (), {"scalars": lambda self: type("Scalars", (), {"first": lambda self: None})()})()
+
+
+def test_unknown_company_is_cached_as_not_found(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    session = _CountingSession()
+
+    assert controller.get_company_by_id("9z", session=session) is None
+    assert controller.get_company_by_id("9z", session=session) is None
+
+    assert session.queries == 1
+    cached, stale = controller.get_cached_company("9z")
+    assert cache.is_not_found(cached) and not stale
+    assert list(controller.iter_companies_by_ids(["9z"])) == [("9z", None)]
+    assert controller.get_company_names(["9z"]) == {}
+
+    # Ingestion of the company drops the negative entry
+    cache.delete_many([COMPANY.key("9z")], entity_type=COMPANY.entity_type)
+    controller.get_company_by_id("9z", session=session)
+    assert session.queries == 2
+
+
+def test_get_or_compute_recomputes_once_before_expiry(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+    # -log(1 - 0.5) ~ 0.69: recomputed within ~0.69 * beta * compute time of the expiry
+    monkeypatch.setattr(cache.random, "random", lambda: 0.5)
+    calls = []
+
+    def compute():
+        calls.append(clock[0])
+        return {"metrics": len(calls)}
+
+    assert cache.get_or_compute("metrics", compute, ttl=100) == {"metrics": 1}
+    # TTL jitter shortens the TTL by up to TTL_JITTER
+    assert 100 * (1 - cache.TTL_JITTER) <= client.ttls["api:metrics"] < 100
+    expires_at = clock[0] + client.ttls["api:metrics"]
+    cache.set_cache("metrics", cache._computed_envelope({"metrics": 1}, client.ttls["api:metrics"], 10.0), ttl=100)
+
+    clock[0] = expires_at - 10
+    assert cache.get_or_compute("metrics", compute, ttl=100) == {"metrics": 1}
+    assert len(calls) == 1
+
+    # Another caller holds the recompute lease: the cached value is served
+    clock[0] = expires_at - 5
+    client.data["lock:recompute:api:metrics"] = "other"
+    assert cache.get_or_compute("metrics", compute, ttl=100, lease=True) == {"metrics": 1}
+    del client.data["lock:recompute:api:metrics"]
+
+    assert cache.get_or_compute("metrics", compute, ttl=100, lease=True) == {"metrics": 2}
+    assert "lock:recompute:api:metrics" not in client.data
+    assert cache.get_computed("metrics") == {"metrics": 2}
+
+
+def test_recompute_lease_release_keeps_a_lease_taken_over(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(cache.random, "random", lambda: 0.999)
+    cache.set_cache("metrics", cache._computed_envelope({"metrics": 1}, 100, 60.0), ttl=100)
+
+    def slow_compute():
+        # Our lease expired during the recompute and another replica took it over
+        client.data["lock:recompute:api:metrics"] = "other"
+        return {"metrics": 2}
+
+    assert cache.get_or_compute("metrics", slow_compute, ttl=100, lease=True) == {"metrics": 2}
+    assert client.data["lock:recompute:api:metrics"] == "other"
+
+
+def test_failed_early_recompute_serves_cached_value(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", _FakeRedis())
+    monkeypatch.setattr(cache.random, "random", lambda: 0.999)
+    cache.set_cache("cities:v1:None", cache._computed_envelope({"cities": []}, 100, 60.0), ttl=100)
+
+    def fail():
+        raise RuntimeError("database unavailable")
+
+    assert cache.get_or_compute("cities:v1:None", fail, ttl=100) == {"cities": []}
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("cities:v1:other", fail, ttl=100)
+
+
+def test_set_many_uses_one_round_trip(monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+
+    assert cache.set_many({"a": 1, "b": [2], "c": {"x": 3}}, entity_type="db", ttl=60) == 3
+    assert client.round_trips == 1
+    assert cache.get_many(["a", "b", "c", "d"], entity_type="db") == {"a": 1, "b": [2], "c": {"x": 3}}
+    assert client.gets == 1
+
+
+class _UnreachableRedis(_FakeRedis):
+    """_FakeRedis whose commands fail with a connection error while `down` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = True
+
+    def _check(self):
+        if self.down:
+            raise redis.ConnectionError("Connection refused")
+
+    def ping(self):
+        self._check()
+        return True
+
+    def get(self, key):
+        self._check()
+        return super().get(key)
+
+    def mget(self, keys):
+        self._check()
+        return super().mget(keys)
+
+    def delete(self, *keys):
+        self._check()
+        return super().delete(*keys)
+
+
+def test_unreachable_redis_falls_back_to_local_cache(monkeypatch):
+    client = _UnreachableRedis()
+    client.data["api:company:1a"] = b'{"company": {"name": "outdated"}}'
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(cache, "_redis_down", False)
+    monkeypatch.setattr(cache, "_fallback", LocalCache("fallback", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(cache, "_outage_keys", set())
+    monkeypatch.setattr(cache, "_outage_patterns", set())
+    monkeypatch.setattr(cache, "_start_reconnecting", lambda: None)
+    monkeypatch.setattr(cache, "_start_invalidation_listener", lambda: None)
+
+    # The first failed command switches to the fallback
+    assert cache.get_cache("company:1a") is None
+    assert not cache.redis_available()
+    assert redis_connected._value.get() == 0
+    cache.set_cache("company:1a", {"company": {"name": "A"}}, ttl=600)
+    assert cache.get_cache("company:1a") == {"company": {"name": "A"}}
+    assert cache._try_reconnect() is False
+
+    client.down = False
+    assert cache._try_reconnect() is True
+    assert cache.redis_available()
+    assert redis_connected._value.get() == 1
+    # The Redis copy written before the outage is dropped, and the fallback is emptied
+    assert "api:company:1a" not in client.data
+    assert cache.get_cache("company:1a") is None
+    assert len(cache._fallback) == 0
+
+
+def test_init_timeout_starts_fallback_and_reconnection(monkeypatch):
+    class _BlackholedRedis(_FakeRedis):
+        def ping(self):
+            raise redis.TimeoutError("Timeout connecting to server")
+
+    client = _BlackholedRedis()
+    reconnecting = []
+    monkeypatch.setattr(cache.redis, "Redis", lambda **kwargs: client)
+    monkeypatch.setattr(cache, "_redis_down", False)
+    monkeypatch.setattr(cache, "_fallback", LocalCache("fallback", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(cache, "_outage_keys", set())
+    monkeypatch.setattr(cache, "_outage_patterns", set())
+    monkeypatch.setattr(cache, "_start_reconnecting", lambda: reconnecting.append(True))
+    monkeypatch.setattr(cache, "_redis_client", None)
+    monkeypatch.setattr(cache, "_redis_values", None)
+    monkeypatch.setattr(cache, "_connection_kwargs", None)
+
+    with pytest.raises(ConnectionError):
+        cache.init(host="10.255.255.1")
+
+    assert reconnecting == [True]
+    assert not cache.redis_available()
+    assert redis_connected._value.get() == 0
+    cache.set_cache("company:1a", {"company": {"name": "A"}}, ttl=600)
+    assert cache.get_cache("company:1a") == {"company": {"name": "A"}}
+    assert client.data == {}
+    # Raw commands are dropped instead of waiting for the connection to time out
+    with pytest.raises(redis.ConnectionError):
+        with cache.pipeline("track_visit") as pipe:
+            pipe.zincrby("visits:trending", 1, "1a")
+    assert client.round_trips == 0
+
+
+def test_recommendations_use_constant_round_trips(monkeypatch):
+    import api
+
+    client = _FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    for company_id in ["1a", "2b", "2b", "3c", "3c", "3c"]:
+        asyncio.run(api._track_company_visit(company_id))
+    assert client.round_trips == 6
+    # The timestamp of 1a expired
+    client.delete("visits:ts:1a")
+
+    looked_up = []
+    monkeypatch.setattr(api, "get_company_names", lambda ids: looked_up.append(ids) or {"3c": "C", "2b": "B"})
+
+    response = api.get_recommendations()
+
+    assert response["recommendations"] == [
+        {"company_id": "3c", "name": "C", "visit_count": 3},
+        {"company_id": "2b", "name": "B", "visit_count": 2},
+    ]
+    assert looked_up == [["3c", "2b"]]
+    assert "1a" not in client.data["visits:trending"]
+    # The recommendations cache lookup and one MGET of the visit timestamps
+    assert client.gets == 2
+
+
+def test_async_quota_writes_load_scripts_through_the_async_client(monkeypatch):
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    async_client = fakeredis.FakeAsyncRedis(server=server)
+
+    def blocking_script_load(source):
+        pytest.fail("script_load on the sync client blocks the event loop")
+    monkeypatch.setattr(client, "script_load", blocking_script_load)
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(cache, "get_async_client", lambda: async_client)
+    monkeypatch.setattr(cache, "_quota_scripts_loaded", {})
+    key = SEARCH.key("bau", 1, 10, None)
+
+    assert asyncio.run(cache.set_cache_async(key, {"companies": [], "total": 0}, ttl=3600))
+    assert client.zcard(cache._quota_keys(SEARCH)[0]) == 1
+
+
+def test_slow_async_redis_does_not_block_the_event_loop(monkeypatch):
+    client = _FakeAsyncRedis(latency=0.2)
+    monkeypatch.setattr(cache, "_redis_client", client.sync)
+    monkeypatch.setattr(cache, "get_async_client", lambda: client)
+
+    async def scenario():
+        await cache.set_cache_async("company:1a", {"name": "A"}, ttl=60)
+        ticks = 0
+
+        async def other_request():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(other_request())
+        value = await cache.get_cache_async("company:1a")
+        async with cache.pipeline_async("track_visit") as pipe:
+            pipe.zincrby("visits:trending", 1, "1a")
+        task.cancel()
+        return value, ticks
+
+    value, ticks = asyncio.run(scenario())
+
+    assert value == {"name": "A"}
+    assert client.sync.data["visits:trending"] == {"1a": 1}
+    # The event loop kept serving other work during the two slow round-trips
+    assert ticks >= 20
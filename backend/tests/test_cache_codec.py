@@ -0,0 +1,95 @@
+"""
+Tests of the cache codec, and a comparison of the codecs on a company detail payload:
+    python -m tests.test_cache_codec --partners 200
+"""
+
+import argparse
+import json
+import time
+
+import pytest
+
+import src.cache as cache
+import src.cache_codec as codec
+from src.cache_codec import CodecError, decode, encode, serialized_size
+
+
+def _company(partners: int = 50) -> dict:
+    """A company detail view with a long business purpose and many partners."""
+    return {
+        "firmenbuchnummer": "123456a",
+        "name": "Musterbau Gesellschaft m.b.H.",
+        "business_purpose": "Errichtung und Betrieb von Hoch- und Tiefbauten, " * 20,
+        "riskScore": 0.42,
+        "riskIndicators": {"debt_to_equity": 1.5, "current_ratio": 0.8},
+        "partners": [
+            {"name": f"Partner {i}", "role": "Gesellschafter", "birth_date": "1970-01-01", "share": i / partners}
+            for i in range(partners)
+        ],
+    }
+
+
+@pytest.mark.parametrize("fmt", [codec.FORMAT_JSON, codec.FORMAT_ORJSON, codec.FORMAT_MSGPACK])
+@pytest.mark.parametrize("compress_min_bytes", [0, 64])
+def test_round_trip(monkeypatch, fmt, compress_min_bytes):
+    monkeypatch.setattr(codec, "_format", fmt)
+    monkeypatch.setattr(codec, "COMPRESS_MIN_BYTES", compress_min_bytes)
+    company = _company()
+
+    payload = encode(company, entity_type="db")
+
+    assert decode(payload, entity_type="db") == company
+    if compress_min_bytes:
+        assert payload[0] & codec.FLAG_ZSTD
+        assert serialized_size(payload) > len(payload)
+    else:
+        assert serialized_size(payload) == len(payload)
+    assert decode(encode(42)) == 42 and decode(encode("text")) == "text"
+
+
+def test_uncompressed_json_has_no_header(monkeypatch):
+    monkeypatch.setattr(codec, "_format", codec.FORMAT_JSON)
+    monkeypatch.setattr(codec, "COMPRESS_MIN_BYTES", 0)
+    assert json.loads(encode({"a": [1, 2]})) == {"a": [1, 2]}
+
+
+def test_entries_of_older_versions_are_read():
+    assert decode(json.dumps({"company": {"name": "Ä"}})) == {"company": {"name": "Ä"}}
+    assert decode(b"[1, 2]") == [1, 2]
+    # set_cache stored simple values with str()
+    assert decode("17") == 17
+    assert decode("not json") == "not json"
+
+
+def test_corrupt_entries_read_as_misses(monkeypatch):
+    client_data = {"api:company:1a": bytes((codec.FORMAT_ORJSON | codec.FLAG_ZSTD,)) + b"garbage"}
+    monkeypatch.setattr(cache, "_redis_client", type("R", (), {"get": lambda self, key: client_data.get(key)})())
+
+    with pytest.raises(CodecError):
+        decode(client_data["api:company:1a"])
+    assert cache.get_cache("company:1a") is None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Size and speed of the cache codecs")
+    parser.add_argument("--partners", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    company = _company(args.partners)
+    baseline = len(json.dumps(company))
+    print(f"json.dumps (previous format): {baseline} bytes")
+    for name, fmt in (("json", codec.FORMAT_JSON), ("orjson", codec.FORMAT_ORJSON), ("msgpack", codec.FORMAT_MSGPACK)):
+        for compress_min_bytes in (0, codec.COMPRESS_MIN_BYTES):
+            codec._format, codec.COMPRESS_MIN_BYTES = fmt, compress_min_bytes
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                payload = encode(company)
+            encode_time = (time.perf_counter() - started) / args.rounds
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                decode(payload)
+            decode_time = (time.perf_counter() - started) / args.rounds
+            print(f"{name:8} {'zstd' if compress_min_bytes else 'raw ':5} {len(payload):7} bytes "
+                  f"({1 - len(payload) / baseline:6.1%} saved)  encode {encode_time * 1e6:7.1f}us  "
+                  f"decode {decode_time * 1e6:7.1f}us")
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.circuit_breaker as circuit_breaker
+from src.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _breaker():
+    return CircuitBreaker(
+        "test", window=60, min_calls=4, failure_rate=0.5, slow_call=10, slow_rate=0.75,
+        open_seconds=30, half_open_probes=1,
+    )
+
+
+def test_opens_on_failure_rate_and_refuses_calls(clock):
+    breaker = _breaker()
+    for _ in range(2):
+        breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == CLOSED
+
+    breaker.record_failure(30)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_success(12)
+    breaker.record_success(0.1)
+
+    assert breaker.is_open()
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    clock[0] += 61
+    breaker.record_success(0.1)
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure(0.1)
+    clock[0] += 31
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    # Only one probe at a time
+    assert not breaker.allow_request()
+    breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+
+    clock[0] += 31
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
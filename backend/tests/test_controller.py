@@ -1,6 +1,14 @@
 from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+import src.controller as controller
 from src.controller import get_company_by_id, search_companies
-from src.db import Company, Address, Partner, RegistryEntry
+from src.db import Base, Company, Address, Partner, RegistryEntry
 
 # Commented out: Requires active connection to production database/external API
 # def test_get_company_by_id_found(test_db_session):
@@ -59,4 +67,153 @@ from src.db import Company, Address, Partner, RegistryEntry
 
 #     search_result = search_companies(query="nonexistent", session=test_db_session)
 
-#     assert len(search_result["results"]) == 0
\ No newline at end of file
+#     assert len(search_result["results"]) == 0
+
+
+def _fail(company):
+    raise AssertionError("risk must not be computed on the request path")
+
+
+def test_detail_view_reads_stored_risk(monkeypatch):
+    monkeypatch.setattr(controller, "compute_company_risk", _fail)
+    monkeypatch.setattr(controller, "RISK_ON_REQUEST", True)
+    company = SimpleNamespace(firmenbuchnummer="1a", risk_computed_at="2026-01-01", risk_score=0.4)
+    controller._attach_risk_indicators(company)
+    assert company.risk_score == 0.4
+
+
+def test_missing_risk_is_not_computed_by_default(monkeypatch):
+    monkeypatch.setattr(controller, "compute_company_risk", _fail)
+    monkeypatch.setattr(controller, "RISK_ON_REQUEST", False)
+    company = SimpleNamespace(firmenbuchnummer="1a", risk_computed_at=None, risk_score=None)
+    controller._attach_risk_indicators(company)
+    assert company.risk_score is None
+
+
+def test_missing_risk_on_request_when_enabled(monkeypatch):
+    monkeypatch.setattr(controller, "compute_company_risk", lambda company: ({"debt_to_equity": 0.5}, 0.5))
+    monkeypatch.setattr(controller, "RISK_ON_REQUEST", True)
+    company = SimpleNamespace(firmenbuchnummer="1a", risk_computed_at=None, risk_score=None)
+    controller._attach_risk_indicators(company)
+    assert company.risk_score == 0.5
+    assert company._risk_indicators_dict == {"debt_to_equity": 0.5}
+
+
+def test_open_circuit_serves_pending_risk(monkeypatch):
+    monkeypatch.setattr(controller, "compute_company_risk", _fail)
+    monkeypatch.setattr(controller, "RISK_ON_REQUEST", True)
+    monkeypatch.setattr(controller.justiz_breaker, "is_open", lambda: True)
+    company = SimpleNamespace(firmenbuchnummer="1a", risk_computed_at=None, risk_score=None)
+    controller._attach_risk_indicators(company)
+    assert controller._risk_status(company) == "pending"
+    assert controller.company_soft_ttl({"riskStatus": controller._risk_status(company)}) == controller.COMPANY_PENDING_SOFT_TTL
+
+
+def test_network_graph_limits_nodes_and_deduplicates(monkeypatch):
+    monkeypatch.setattr(controller, "NETWORK_MAX_NODES", 3)
+    graph = controller._NetworkGraph(SimpleNamespace(firmenbuchnummer="1a", name="Main"))
+    neighbours = [SimpleNamespace(firmenbuchnummer=f"{i}b", name=f"N{i}") for i in range(5)]
+
+    graph.add_connections(neighbours[:1], "Location", "AUT, 1010, Wien")
+    graph.add_connections(neighbours, "Person", "Max Mustermann")
+
+    result = graph.to_dict()
+    assert [n["id"] for n in result["nodes"]] == ["1a", "0b", "1b"]
+    assert [(e["target"], e["label"]) for e in result["edges"]] == [
+        ("0b", "Location"), ("0b", "Person"), ("1b", "Person"),
+    ]
+
+
+@pytest.fixture
+def person_session():
+    """SQLite session with three companies and their partners; statements run are in .statements"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Company.__table__, Partner.__table__])
+    session = Session(engine)
+    session.statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: session.statements.append(statement))
+
+    companies = [Company(firmenbuchnummer=f"{i}a", name=name) for i, name in enumerate(["Alpha GmbH", "Beta AG", "Gamma KG"])]
+    session.add_all(companies)
+    session.flush()
+    for company, first_name, last_name, birth_date in [
+        (companies[0], "Max", "Mustermann", date(1970, 1, 1)),
+        (companies[1], "Max", "Mustermann", date(1970, 1, 1)),
+        (companies[2], "Max", "Mustermann", date(1985, 5, 5)),
+        (companies[2], "Maria", "Musterfrau", None),
+        (companies[0], "Anna", "Maxwell", None),
+    ]:
+        session.add(Partner(
+            company_id=company.id, first_name=first_name, last_name=last_name,
+            name=f"{first_name} {last_name}", birth_date=birth_date, role="Geschäftsführer",
+        ))
+    session.commit()
+    session.statements.clear()
+    yield session
+    session.close()
+
+
+def test_person_search_prefix_matches_every_token(person_session):
+    result = controller.search_persons("MUST ma", session=person_session)
+
+    assert result["total"] == 3
+    assert [(p["first_name"], p["last_name"], p["birth_date"]) for p in result["persons"]] == [
+        ("Maria", "Musterfrau", None),
+        ("Max", "Mustermann", "1970-01-01"),
+        ("Max", "Mustermann", "1985-05-05"),
+    ]
+    # "ma" must prefix a name: Anna Maxwell matches "ma" but not "must"
+    assert controller.search_persons("mustermann x", session=person_session) == {"persons": [], "total": 0}
+
+
+def test_person_search_birth_date_filter(person_session):
+    result = controller.search_persons("mustermann", birth_date=date(1970, 1, 1), session=person_session)
+
+    assert result["total"] == 1
+    assert [c["firmenbuchnummer"] for c in result["persons"][0]["companies"]] == ["0a", "1a"]
+
+
+def test_person_search_resolves_companies_in_one_query(person_session):
+    result = controller.search_persons("m", page_size=10, session=person_session)
+
+    # count, page of persons, companies of the whole page
+    assert len(person_session.statements) == 3
+    assert {(p["name"], p["birth_date"]): [c["name"] for c in p["companies"]] for p in result["persons"]} == {
+        ("Anna Maxwell", None): ["Alpha GmbH"],
+        ("Maria Musterfrau", None): ["Gamma KG"],
+        ("Max Mustermann", "1970-01-01"): ["Alpha GmbH", "Beta AG"],
+        ("Max Mustermann", "1985-05-05"): ["Gamma KG"],
+    }
+
+
+class _RecordingSession:
+    """Returns canned results and keeps the PostgreSQL SQL of every statement"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return self.results.pop(0)
+
+
+def test_fuzzy_person_search_uses_trigram_similarity():
+    person = SimpleNamespace(first_name="Max", last_name="Mustermann", birth_date=None, name="Max Mustermann")
+    company = SimpleNamespace(
+        first_name="Max", last_name="Mustermann", birth_date=None, role=None, representation=None,
+        firmenbuchnummer="1a", company_name="Alpha GmbH",
+    )
+    session = _RecordingSession(
+        SimpleNamespace(scalar_one=lambda: 1),
+        SimpleNamespace(all=lambda: [person]),
+        SimpleNamespace(all=lambda: [company]),
+    )
+
+    result = controller.search_persons("Musterman", fuzzy=True, session=session)
+
+    assert result["persons"][0]["companies"][0]["firmenbuchnummer"] == "1a"
+    page_sql = session.statements[1]
+    assert "partners.name %% %(name_1)s" in page_sql
+    assert "ORDER BY max(similarity(partners.name" in page_sql
+    assert "LIKE" not in page_sql
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.document_store as document_store
+from src.db import Base, UrkundeDocument
+from src.metrics import urkunde_store_lookups_total
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Document store on an in-memory SQLite database"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[UrkundeDocument.__table__])
+    monkeypatch.setattr(document_store, "engine", engine)
+    monkeypatch.setattr(document_store, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(document_store, "STORE_ENABLED", True)
+    return engine
+
+
+def _lookups(result):
+    return urkunde_store_lookups_total.labels(result=result)._value.get()
+
+
+def test_stored_documents_are_hits_and_unknown_keys_misses(store):
+    document_store.put_documents([
+        {"key": "1a_1_XML", "firmenbuchnummer": "1a", "xml": "<bilanz/>", "parsed": {"currency": "EUR"}},
+        {"key": "1a_2_XML", "firmenbuchnummer": "1a", "xml": "<other/>", "parsed": None},
+    ])
+    hits, misses = _lookups("hit"), _lookups("miss")
+
+    found = document_store.get_documents(["1a_1_XML", "1a_2_XML", "1a_3_XML"])
+
+    # Stored documents that are not a Bilanz are found with None, unknown keys are left out
+    assert found == {"1a_1_XML": {"currency": "EUR"}, "1a_2_XML": None}
+    assert (_lookups("hit") - hits, _lookups("miss") - misses) == (2, 1)
+    assert document_store.get_raw_xml("1a_1_XML") == "<bilanz/>"
+    assert document_store.get_raw_xml("1a_3_XML") is None
+
+
+def test_stored_documents_are_not_overwritten(store):
+    document_store.put_documents([{"key": "1a_1_XML", "xml": "<bilanz/>", "parsed": {"currency": "EUR"}}])
+    document_store.put_documents([
+        {"key": "1a_1_XML", "xml": "<changed/>", "parsed": None},
+        {"key": "1a_2_XML", "xml": "<bilanz/>", "parsed": {"currency": "USD"}},
+    ])
+
+    assert document_store.get_documents(["1a_1_XML", "1a_2_XML"]) == {
+        "1a_1_XML": {"currency": "EUR"},
+        "1a_2_XML": {"currency": "USD"},
+    }
+    assert document_store.refresh_store_stats(force=True)["documents"] == 2
+
+
+def test_disabled_store_is_not_queried(monkeypatch):
+    monkeypatch.setattr(document_store, "STORE_ENABLED", False)
+    monkeypatch.setattr(document_store, "SessionLocal", lambda: pytest.fail("store must not be queried"))
+
+    assert document_store.get_documents(["1a_1_XML"]) == {}
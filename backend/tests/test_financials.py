@@ -0,0 +1,40 @@
+from datetime import date
+from types import SimpleNamespace
+
+from src.financials import bilanz_from_statement, statement_row_from_bilanz
+
+
+def _bilanz(end_date="2023-12-31"):
+    return {
+        "assets": {"total_assets": 1000.0, "current_assets": 400.0, "cash_and_cash_equivalents": 50.0},
+        "liabilities_equity": {"total_liabilities_and_equity": 1000.0, "equity": 300.0, "liabilities": 700.0},
+        "currency": "EUR",
+        "fiscal_year": {"start_date": "2023-01-01", "end_date": end_date},
+        "notes": {},
+    }
+
+
+def test_statement_row_from_bilanz():
+    row = statement_row_from_bilanz(_bilanz(), company_id=7, urkunde_key="k_XML")
+    assert row["company_id"] == 7
+    assert row["urkunde_key"] == "k_XML"
+    assert row["fiscal_year"] == 2023
+    assert row["fiscal_year_start"] == date(2023, 1, 1)
+    assert row["fiscal_year_end"] == date(2023, 12, 31)
+    assert row["total_assets"] == 1000.0
+    assert row["equity"] == 300.0
+    assert row["inventories"] is None
+    assert row["revenue"] is None
+
+
+def test_statement_row_requires_fiscal_year_end():
+    assert statement_row_from_bilanz(_bilanz(end_date=None), company_id=7) is None
+
+
+def test_bilanz_round_trip():
+    row = statement_row_from_bilanz(_bilanz(), company_id=7, urkunde_key="k_XML")
+    bilanz = bilanz_from_statement(SimpleNamespace(**row))
+    assert bilanz["assets"]["current_assets"] == 400.0
+    assert bilanz["liabilities_equity"]["liabilities"] == 700.0
+    assert bilanz["currency"] == "EUR"
+    assert bilanz["fiscal_year"] == {"start_date": "2023-01-01", "end_date": "2023-12-31"}
@@ -0,0 +1,113 @@
+import fakeredis
+import pytest
+
+import src.cache as cache
+import src.jobs as jobs
+from src.jobs import CSV_COLUMNS, normalize_fnr, parse_fnr_csv, result_to_csv_row
+
+
+def test_normalize_fnr():
+    assert normalize_fnr(" 12345 A ") == "12345a"
+
+
+def test_parse_fnr_csv_skips_header_and_empty_rows():
+    content = "firmenbuchnummer,note\n12345 a,foo\n\n563319k\n"
+    assert parse_fnr_csv(content) == ["12345a", "563319k"]
+
+
+def test_parse_fnr_csv_removes_duplicates_keeping_order():
+    content = "563319k\n12345a\n563319K\n"
+    assert parse_fnr_csv(content) == ["563319k", "12345a"]
+
+
+def test_result_to_csv_row_matches_columns():
+    result = {
+        "firmenbuchnummer": "12345a",
+        "name": "Test GmbH",
+        "status": "ok",
+        "riskScore": 0.25,
+        "riskIndicators": {"cash_ratio": 0.5},
+    }
+    row = dict(zip(CSV_COLUMNS, result_to_csv_row(result)))
+    assert len(row) == len(CSV_COLUMNS)
+    assert row["risk_score"] == 0.25
+    assert row["cash_ratio"] == 0.5
+    assert row["equity_ratio"] is None
+
+
+def test_result_to_csv_row_not_found():
+    row = dict(zip(CSV_COLUMNS, result_to_csv_row({"firmenbuchnummer": "1a", "status": "not_found"})))
+    assert row["status"] == "not_found"
+    assert row["name"] is None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Redis-backed jobs on fakeredis, with a controllable time.time()"""
+    monkeypatch.setattr(cache, "_redis_client", fakeredis.FakeRedis(decode_responses=True))
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    return now
+
+
+def test_claim_leases_fnrs_in_submission_order(clock):
+    job_id = jobs.create_screening_job(["1a", "2b"])
+    worker = jobs.ScreeningWorker(concurrency=1, lease_seconds=60)
+    client = cache.get_client()
+
+    assert worker.claim() == (job_id, "1a")
+    assert jobs.get_job(job_id)["status"] == "running"
+    assert client.zscore(jobs._job_key(job_id, "inflight"), "1a") == 1060
+    assert client.lrange(jobs._job_key(job_id, "pending"), 0, -1) == ["2b"]
+    assert worker.claim() == (job_id, "2b")
+    assert worker.claim() is None
+
+
+def test_expired_leases_are_requeued(clock):
+    job_id = jobs.create_screening_job(["1a", "2b"])
+    worker = jobs.ScreeningWorker(concurrency=1, lease_seconds=60)
+    worker.claim()
+
+    clock[0] += 30
+    assert worker.requeue_expired() == 0
+    clock[0] += 31
+    assert worker.requeue_expired() == 1
+    assert cache.get_client().lrange(jobs._job_key(job_id, "pending"), 0, -1) == ["2b", "1a"]
+    assert jobs.get_job(job_id)["pending"] == 2
+
+
+def test_results_are_checkpointed_once_and_the_job_resumes(clock):
+    job_id = jobs.create_screening_job(["1a", "2b"])
+    worker = jobs.ScreeningWorker(concurrency=1, lease_seconds=60)
+    worker.claim()
+    jobs._record_result(job_id, "1a", {"firmenbuchnummer": "1a", "status": "ok", "riskScore": 0.1})
+
+    # A restarted worker continues with the FNRs left, a second result of 1a is ignored
+    restarted = jobs.ScreeningWorker(concurrency=1, lease_seconds=60)
+    assert restarted.claim() == (job_id, "2b")
+    jobs._record_result(job_id, "1a", {"firmenbuchnummer": "1a", "status": "error", "error": "late"})
+    jobs._record_result(job_id, "2b", {"firmenbuchnummer": "2b", "status": "not_found"})
+    assert restarted.claim() is None
+
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["processed"], job["failed"], job["not_found"]) == ("completed", 2, 0, 1)
+    assert job["completed_at"].endswith("+00:00")
+    assert [result["status"] for result in jobs.iter_job_results(job_id)] == ["ok", "not_found"]
+
+
+def test_unfinished_jobs_expire_and_are_dropped(clock):
+    job_id = jobs.create_screening_job(["1a", "2b"])
+    worker = jobs.ScreeningWorker(concurrency=1, lease_seconds=60)
+    client = cache.get_client()
+    worker.claim()
+    jobs._record_result(job_id, "1a", {"firmenbuchnummer": "1a", "status": "ok"})
+
+    unfinished_ttl = jobs.JOB_MAX_RUNTIME + jobs.JOB_RESULT_TTL
+    for suffix in (None, "fnrs", "pending", "results"):
+        assert 0 < client.ttl(jobs._job_key(job_id, suffix)) <= unfinished_ttl
+
+    # The job state expired before a worker finished it
+    client.delete(jobs._job_key(job_id))
+    assert worker.claim() is None
+    assert not client.sismember(jobs.ACTIVE_JOBS_KEY, job_id)
+    assert not client.exists(jobs._job_key(job_id, "pending"), jobs._job_key(job_id, "results"))
@@ -0,0 +1,173 @@
+"""
+Tests of the local Justiz SOAP stand-in, and a benchmark of the cold detail path against it.
+
+The benchmark computes the risk data of companies with empty caches and an empty document store,
+so every company costs one SUCHEURKUNDE call and the URKUNDE downloads of its latest periods:
+    python -m tests.test_justiz_standin --companies 200 --concurrency 16 --latency lognormal:0.3,0.6
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+import uvicorn
+
+import src.api.client as client_module
+import src.api.queries as queries
+import src.cache as cache
+from src.api.standin import StandinConfig, create_app, generate_bilanz, generate_listing, parse_latency
+from src.api.xml_parse import extract_bilanz_fields
+from src.circuit_breaker import CircuitBreaker
+from src.controller import compute_company_risk
+
+
+def _start_standin(config: StandinConfig):
+    """Run the stand-in on a free local port; returns (server, base url)"""
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Stand-in did not start")
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}/ws"
+
+
+def _use_standin(monkeypatch, address: str) -> None:
+    """Point the shared SOAP clients at the stand-in."""
+    monkeypatch.setenv("API_KEY", "standin")
+    monkeypatch.setenv("WSDL_URL", f"{address}?wsdl")
+    monkeypatch.setattr(client_module, "SOAP_ADDRESS", address)
+    monkeypatch.setattr(client_module, "_global_zeep_client", None)
+    monkeypatch.setattr(client_module, "_async_clients", weakref.WeakKeyDictionary())
+
+
+def _cold_store(monkeypatch) -> None:
+    """Nothing cached or stored: every document comes from the SOAP service."""
+    monkeypatch.setattr(cache, "_redis_client", None)
+    monkeypatch.setattr(queries, "get_statements_by_keys", lambda keys: {})
+    monkeypatch.setattr(queries, "get_stored_documents", lambda keys: {})
+    monkeypatch.setattr(queries, "put_stored_documents", lambda documents: None)
+    monkeypatch.setattr(queries, "refresh_store_stats", lambda: None)
+    monkeypatch.setattr(queries, "save_financial_statements", lambda fnr, documents: None)
+
+
+@pytest.fixture
+def standin(request):
+    server, address = _start_standin(getattr(request, "param", StandinConfig(latency="fixed:0", seed=1)))
+    yield address
+    server.should_exit = True
+
+
+def test_generated_documents_are_parseable_bilanzen():
+    listing = generate_listing("123456a", documents=6, empty_rate=0)
+    xml_entries = [entry for entry in listing if entry["KEY"].endswith("_XML")]
+
+    assert len(listing) == 6 and len(xml_entries) == 3
+    assert generate_listing("123456a", documents=6, empty_rate=0) == listing
+    for entry in xml_entries:
+        parsed = extract_bilanz_fields(generate_bilanz(entry["KEY"], entry["STICHTAG"]))
+        assert parsed["fiscal_year"]["end_date"] == entry["STICHTAG"]
+        assert parsed["assets"]["total_assets"] == pytest.approx(
+            parsed["liabilities_equity"]["total_liabilities_and_equity"], rel=1e-6
+        )
+
+
+def test_parse_latency():
+    rng = SimpleNamespace(uniform=lambda a, b: (a + b) / 2)
+    assert parse_latency("fixed:0.2")(rng) == 0.2
+    assert parse_latency("uniform:0.1,0.3")(rng) == pytest.approx(0.2)
+    with pytest.raises(ValueError):
+        parse_latency("normal:1")
+
+
+def test_zeep_client_against_standin(monkeypatch, standin):
+    _use_standin(monkeypatch, standin)
+    monkeypatch.setattr(client_module, "justiz_breaker", CircuitBreaker("test"))
+    client = client_module.get_shared_client()
+
+    listing = client.search_urkunde_by_fnr("123456a")
+    key = [entry.KEY for entry in listing if entry.KEY.endswith("XML")][-1]
+    document = client.get_urkunde(key)
+
+    assert extract_bilanz_fields(document.DOKUMENT.CONTENT.decode("utf-8"))["currency"] == "EUR"
+    # Unknown documents are answered with a SOAP fault
+    assert client.get_urkunde("123456a_1_XML") is None
+
+
+@pytest.mark.parametrize("standin", [StandinConfig(latency="fixed:0", error_rate=1.0, seed=1)], indirect=True)
+def test_standin_errors_open_the_circuit(monkeypatch, standin):
+    _use_standin(monkeypatch, standin)
+    breaker = CircuitBreaker("test", min_calls=3, failure_rate=0.5)
+    monkeypatch.setattr(client_module, "justiz_breaker", breaker)
+    client = client_module.get_shared_client()
+
+    assert [client.search_urkunde_by_fnr("123456a") for _ in range(3)] == [None] * 3
+    assert breaker.is_open()
+
+
+def _run_benchmark(companies: int, concurrency: int) -> list:
+    """Compute the risk data of `companies` generated companies; returns (duration, computed) of each."""
+    def detail(i: int) -> tuple:
+        company = SimpleNamespace(firmenbuchnummer=f"{100000 + i}a", registry_entries=[])
+        started = time.perf_counter()
+        risk = compute_company_risk(company)
+        return time.perf_counter() - started, risk is not None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(detail, range(companies)))
+
+
+def test_cold_detail_path_benchmark(monkeypatch, standin):
+    _use_standin(monkeypatch, standin)
+    _cold_store(monkeypatch)
+    monkeypatch.setattr(client_module, "justiz_breaker", CircuitBreaker("test"))
+
+    results = _run_benchmark(companies=10, concurrency=4)
+
+    # Apart from the few generated companies without documents, every company gets risk data
+    assert sum(computed for _, computed in results) >= 8
+
+
+if __name__ == "__main__":
+    from _pytest.monkeypatch import MonkeyPatch
+
+    parser = argparse.ArgumentParser(description="Cold company detail path against the Justiz stand-in")
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="lognormal:0.3,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config = StandinConfig(
+        latency=args.latency, error_rate=args.error_rate, timeout_rate=args.timeout_rate,
+        hang=client_module.SOAP_TIMEOUT * 2, seed=args.seed,
+    )
+    server, address = _start_standin(config)
+    monkeypatch = MonkeyPatch()
+    _use_standin(monkeypatch, address)
+    _cold_store(monkeypatch)
+
+    started = time.perf_counter()
+    results = _run_benchmark(args.companies, args.concurrency)
+    elapsed = time.perf_counter() - started
+    durations = sorted(duration for duration, _ in results)
+
+    quantiles = statistics.quantiles(durations, n=100)
+    print(f"{args.companies} cold detail computations in {elapsed:.2f}s "
+          f"({args.companies / elapsed:.1f}/s, concurrency {args.concurrency}, "
+          f"{'async' if client_module.async_client_available() else 'sync'} SOAP client)")
+    print(f"p50 {quantiles[49]:.3f}s  p95 {quantiles[94]:.3f}s  p99 {quantiles[98]:.3f}s  max {durations[-1]:.3f}s, "
+          f"{sum(computed for _, computed in results)} companies with risk data")
+
+    monkeypatch.undo()
+    server.should_exit = True
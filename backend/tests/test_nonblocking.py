@@ -0,0 +1,131 @@
+"""
+Load test: one hanging Justiz call must not stall the other requests of a worker.
+
+Runs as part of the test suite with a small load. For a longer run with a throughput report:
+    python -m tests.test_nonblocking --requests 2000 --concurrency 100 --hang 10
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+
+import api
+import src.cache as cache
+
+
+def _build_app(monkeypatch, hang_seconds: float, release: threading.Event) -> FastAPI:
+    def hanging_history(company_id, session=None):
+        # Stands in for a SOAP call that does not answer
+        release.wait(hang_seconds)
+        return {"firmenbuchnummer": company_id, "financials": []}
+
+    async def company(company_id, session=None, refresh=False):
+        return {"firmenbuchnummer": company_id, "name": f"Company {company_id}"}
+
+    monkeypatch.setattr(cache, "_redis_client", None)
+    monkeypatch.setattr(api, "get_company_financial_history", hanging_history)
+    monkeypatch.setattr(api, "get_company_by_id_async", company)
+    async def no_visit_tracking(company_id):
+        pass
+
+    monkeypatch.setattr(api, "_track_company_visit", no_visit_tracking)
+
+    app = FastAPI()
+    app.include_router(api.api_router)
+    return app
+
+
+async def _get(app: FastAPI, path: str) -> tuple:
+    """Send one GET request straight to the ASGI app and return (status, body)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status = next(m["status"] for m in messages if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return status, json.loads(body)
+
+
+async def _run_load(app: FastAPI, requests: int, concurrency: int) -> tuple:
+    """Start one hanging request, then measure the throughput of company detail requests."""
+    hanging = asyncio.ensure_future(_get(app, "/api/v1/company/000001a/history"))
+    await asyncio.sleep(0.05)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            status, body = await _get(app, f"/api/v1/company/{i}a")
+            assert status == 200
+            assert body["company"]["firmenbuchnummer"] == f"{i}a"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    assert not hanging.done()
+    return elapsed, hanging
+
+
+def test_throughput_while_soap_call_hangs(monkeypatch):
+    hang_seconds = 5.0
+    release = threading.Event()
+    app = _build_app(monkeypatch, hang_seconds, release)
+
+    async def scenario():
+        elapsed, hanging = await _run_load(app, requests=200, concurrency=20)
+        release.set()
+        status, _ = await hanging
+        return elapsed, status
+
+    elapsed, status = asyncio.run(scenario())
+
+    # Before, the hanging call blocked the event loop and every request waited for it
+    assert elapsed < hang_seconds / 2
+    assert status == 200
+
+
+if __name__ == "__main__":
+    from _pytest.monkeypatch import MonkeyPatch
+
+    parser = argparse.ArgumentParser(description="Throughput of company detail requests while a SOAP call hangs")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--hang", type=float, default=10.0)
+    args = parser.parse_args()
+
+    release = threading.Event()
+    monkeypatch = MonkeyPatch()
+    app = _build_app(monkeypatch, args.hang, release)
+
+    async def main():
+        elapsed, hanging = await _run_load(app, args.requests, args.concurrency)
+        release.set()
+        await hanging
+        print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s) "
+              f"while one request hung for up to {args.hang:.0f}s")
+
+    asyncio.run(main())
+    monkeypatch.undo()
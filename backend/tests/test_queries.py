@@ -0,0 +1,177 @@
+import threading
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import src.api.queries as queries
+import src.cache as cache
+from src.api.queries import order_urkunden, plan_urkunde_fetch
+from src.api.standin import generate_bilanz
+
+
+def _urkunde(key, **fields):
+    return SimpleNamespace(KEY=key, **fields)
+
+
+def test_order_urkunden_by_metadata_date():
+    newer = _urkunde("a_1_XML", STICHTAG=date(2023, 12, 31))
+    older = _urkunde("b_2_XML", STICHTAG="2022-12-31")
+    assert order_urkunden([newer, older]) == [older, newer]
+
+
+def test_order_urkunden_by_key_number_without_dates():
+    first = _urkunde("563319_0070752553502_000___000_30_36803752_XML")
+    second = _urkunde("563319_0070752553502_000___000_30_36887434_XML")
+    assert order_urkunden([second, first]) == [first, second]
+
+
+def test_order_urkunden_keeps_listing_order_as_fallback():
+    a = _urkunde("foo_XML")
+    b = _urkunde("bar_XML")
+    assert order_urkunden([a, b]) == [a, b]
+
+
+def test_plan_urkunde_fetch_takes_newest_periods():
+    docs = [_urkunde(f"x_{n}_XML") for n in (5, 1, 4, 2, 3)]
+    needed, remaining = plan_urkunde_fetch(docs, periods=2)
+    assert [u.KEY for u in needed] == ["x_4_XML", "x_5_XML"]
+    assert [u.KEY for u in remaining] == ["x_1_XML", "x_2_XML", "x_3_XML"]
+
+
+def test_get_latest_urkunde_contents_falls_back_to_older_documents(monkeypatch):
+    docs = [_urkunde(f"x_{n}_XML") for n in (1, 2, 3)]
+    # the newest document cannot be parsed
+    monkeypatch.setattr(
+        queries,
+        "get_all_urkunde_contents",
+        lambda urkunden, fnr=None: [{"key": u.KEY} for u in urkunden if u.KEY != "x_3_XML"],
+    )
+    result = queries.get_latest_urkunde_contents(docs, periods=2)
+    assert result == [{"key": "x_1_XML"}, {"key": "x_2_XML"}]
+
+
+def test_empty_listings_are_cached_but_failed_calls_are_not(monkeypatch):
+    cached = {}
+    monkeypatch.setattr(queries, "get_cache", lambda key, entity_type: cached.get(key))
+    monkeypatch.setattr(queries, "set_cache", lambda key, value, entity_type, ttl: cached.setdefault(key, value))
+    monkeypatch.setattr(queries, "async_client_available", lambda: False)
+    listings = {"1a": [], "2b": None}
+    calls = []
+
+    def search_urkunde_by_fnr(fnr):
+        calls.append(fnr)
+        return listings[fnr]
+    monkeypatch.setattr(queries, "get_shared_client", lambda: SimpleNamespace(search_urkunde_by_fnr=search_urkunde_by_fnr))
+
+    for _ in range(2):
+        assert queries.get_company_urkunde("1a") is None
+        assert queries.get_company_urkunde("2b") is None
+
+    assert calls == ["1a", "2b", "2b"]
+    assert cache.is_not_found(cached[queries.URKUNDE_LISTING.key("1a")])
+
+
+def _bilanz_response(key, stichtag):
+    return SimpleNamespace(DOKUMENT=SimpleNamespace(CONTENT=generate_bilanz(key, stichtag).encode("utf-8")))
+
+
+def _use_soap_stub(monkeypatch, get_urkunde):
+    """Nothing stored: every document is downloaded with get_urkunde on the fetch executor."""
+    monkeypatch.setattr(queries, "get_statements_by_keys", lambda keys: {})
+    monkeypatch.setattr(queries, "get_stored_documents", lambda keys: {})
+    monkeypatch.setattr(queries, "put_stored_documents", lambda documents: None)
+    monkeypatch.setattr(queries, "refresh_store_stats", lambda: None)
+    monkeypatch.setattr(queries, "save_financial_statements", lambda fnr, documents: None)
+    monkeypatch.setattr(queries, "async_client_available", lambda: False)
+    monkeypatch.setattr(queries, "get_shared_client", lambda: SimpleNamespace(get_urkunde=get_urkunde))
+    monkeypatch.setattr(queries, "_fetch_executor", None)
+
+
+def test_urkunde_downloads_run_in_parallel(monkeypatch):
+    keys = [f"1a_{n}_XML" for n in range(3)]
+    # Every download waits until all three are running at once
+    barrier = threading.Barrier(len(keys), timeout=5)
+
+    def get_urkunde(key):
+        barrier.wait()
+        return _bilanz_response(key, "2023-12-31")
+    _use_soap_stub(monkeypatch, get_urkunde)
+
+    documents = queries._get_urkunde_documents(keys, fnr="1a", deadline=10)
+
+    assert sorted(documents) == keys
+    assert all(parsed is not None for parsed in documents.values())
+
+
+def test_urkunde_deadline_skips_slow_downloads(monkeypatch):
+    release = threading.Event()
+
+    def get_urkunde(key):
+        if key == "1a_2_XML":
+            release.wait(5)
+        return _bilanz_response(key, "2023-12-31")
+    _use_soap_stub(monkeypatch, get_urkunde)
+
+    started = time.monotonic()
+    documents = queries._get_urkunde_documents(["1a_1_XML", "1a_2_XML"], fnr="1a", deadline=0.2)
+    release.set()
+
+    assert list(documents) == ["1a_1_XML"]
+    assert time.monotonic() - started < 2
+
+
+def test_urkunde_contents_keep_the_planned_order(monkeypatch):
+    listing = [_urkunde(f"1a_{n}_XML", STICHTAG=f"{2020 + n}-12-31") for n in (3, 1, 2)]
+
+    def get_urkunde(key):
+        # The newest document finishes first
+        time.sleep(0.1 * (4 - int(key.split("_")[1])))
+        return _bilanz_response(key, f"{2020 + int(key.split('_')[1])}-12-31")
+    _use_soap_stub(monkeypatch, get_urkunde)
+
+    needed, _ = plan_urkunde_fetch(listing, periods=3)
+    contents = queries.get_all_urkunde_contents(needed, fnr="1a")
+
+    assert [c["fiscal_year"]["end_date"] for c in contents] == ["2021-12-31", "2022-12-31", "2023-12-31"]
+
+
+def test_urkunde_documents_come_from_statements_then_store_then_soap(monkeypatch):
+    calls = []
+
+    def lookup(name, found):
+        def _lookup(keys):
+            calls.append((name, keys))
+            return {key: found[key] for key in keys if key in found}
+        return _lookup
+    monkeypatch.setattr(queries, "get_statements_by_keys", lookup("statements", {"1a_1_XML": {"from": "statements"}}))
+    monkeypatch.setattr(queries, "get_stored_documents", lookup("store", {"1a_2_XML": {"from": "store"}}))
+    monkeypatch.setattr(queries, "put_stored_documents", lambda documents: calls.append(("put", [d["key"] for d in documents])))
+    monkeypatch.setattr(queries, "refresh_store_stats", lambda: None)
+    monkeypatch.setattr(queries, "save_financial_statements", lambda fnr, documents: calls.append(("save", [key for key, _ in documents])))
+    monkeypatch.setattr(queries, "async_client_available", lambda: False)
+    monkeypatch.setattr(queries, "_fetch_executor", None)
+
+    def get_urkunde(key):
+        calls.append(("soap", key))
+        return _bilanz_response(key, "2023-12-31")
+    monkeypatch.setattr(queries, "get_shared_client", lambda: SimpleNamespace(get_urkunde=get_urkunde))
+
+    documents = queries._get_urkunde_documents(["1a_1_XML", "1a_2_XML", "1a_3_XML"], fnr="1a")
+
+    assert documents["1a_1_XML"] == {"from": "statements"}
+    assert documents["1a_2_XML"] == {"from": "store"}
+    assert documents["1a_3_XML"]["currency"] == "EUR"
+    assert calls == [
+        ("statements", ["1a_1_XML", "1a_2_XML", "1a_3_XML"]),
+        ("store", ["1a_2_XML", "1a_3_XML"]),
+        # Stored documents missing from the statements table are added to it
+        ("save", ["1a_2_XML"]),
+        ("soap", "1a_3_XML"),
+        ("put", ["1a_3_XML"]),
+        ("save", ["1a_3_XML"]),
+    ]
+
+    # Everything found before the SOAP service: no download
+    calls.clear()
+    queries._get_urkunde_documents(["1a_1_XML"], fnr="1a")
+    assert calls == [("statements", ["1a_1_XML"])]
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import src.cache as cache
+import src.risk_worker as risk_worker
+from src.db import Base, Company, RegistryEntry, RiskIndicator
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Risk worker on an in-memory SQLite database, with a controllable clock"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[
+        Company.__table__, RegistryEntry.__table__, RiskIndicator.__table__,
+    ])
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(risk_worker, "engine", engine)
+    monkeypatch.setattr(risk_worker, "SessionLocal", Session)
+    monkeypatch.setattr(cache, "_redis_client", None)
+    monkeypatch.setattr(risk_worker.justiz_breaker, "is_open", lambda: False)
+    monkeypatch.setattr(risk_worker, "RISK_MAX_AGE", 1000)
+    monkeypatch.setattr(risk_worker, "RISK_RETRY_AFTER", 100)
+
+    now = [datetime(2026, 1, 1, tzinfo=timezone.utc)]
+
+    class _Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+    monkeypatch.setattr(risk_worker, "datetime", _Clock)
+
+    session = Session()
+    session.add_all([Company(firmenbuchnummer=f"{i}a", name=f"Company {i}") for i in range(1, 4)])
+    session.commit()
+    session.close()
+    return Session, now
+
+
+def _indicators(Session, company_id):
+    session = Session()
+    try:
+        rows = session.execute(select(RiskIndicator).where(RiskIndicator.company_id == company_id)).scalars()
+        return {row.key: row.value for row in rows}
+    finally:
+        session.close()
+
+
+def _company(Session, company_id):
+    session = Session()
+    try:
+        return session.get(Company, company_id)
+    finally:
+        session.close()
+
+
+def _due_ids(after_id=0, limit=10):
+    return [company.id for company in risk_worker.select_due_companies(limit, after_id=after_id)]
+
+
+def test_stored_results_replace_indicators_that_disappeared(db):
+    Session, _ = db
+    risk_worker.store_risk_results([(1, ({"equity_ratio": 0.2, "debt_ratio": 0.8}, 0.4))])
+    risk_worker.store_risk_results([(1, ({"equity_ratio": 0.3, "debt_ratio": None}, 0.3))])
+
+    assert _indicators(Session, 1) == {"equity_ratio": 0.3}
+    assert _company(Session, 1).risk_score == 0.3
+    assert _due_ids() == [2, 3]
+
+
+def test_failed_company_keeps_its_score_and_is_retried_later(db):
+    Session, now = db
+    risk_worker.store_risk_results([(1, ({"equity_ratio": 0.2}, 0.4))])
+    now[0] += timedelta(seconds=2000)
+    assert _due_ids() == [1, 2, 3]
+
+    risk_worker.store_risk_results([(1, None)])
+
+    assert _company(Session, 1).risk_score == 0.4
+    assert _indicators(Session, 1) == {"equity_ratio": 0.2}
+    assert _due_ids() == [2, 3]
+    now[0] += timedelta(seconds=risk_worker.RISK_RETRY_AFTER + 1)
+    assert _due_ids() == [1, 2, 3]
+
+
+def test_due_companies_are_paged_by_id(db):
+    risk_worker.store_risk_results([(2, ({"equity_ratio": 0.2}, 0.4))])
+
+    assert _due_ids(limit=1) == [1]
+    assert _due_ids(after_id=1, limit=1) == [3]
+    assert _due_ids(after_id=3) == []
+
+
+def test_pass_stops_and_keeps_companies_due_while_the_breaker_is_open(db, monkeypatch):
+    computed = []
+    monkeypatch.setattr(risk_worker, "compute_company_risk", lambda company: computed.append(company.id))
+    monkeypatch.setattr(risk_worker.justiz_breaker, "is_open", lambda: True)
+
+    assert risk_worker.RiskWorker(concurrency=1, batch_size=1).run_once() == 1
+
+    assert computed == [1]
+    assert _due_ids() == [1, 2, 3]
+
+
+def test_refresh_company_risk_stores_one_company(db, monkeypatch):
+    Session, _ = db
+    monkeypatch.setattr(risk_worker, "compute_company_risk", lambda company: ({"equity_ratio": 0.5}, 0.1))
+
+    assert risk_worker.refresh_company_risk("2a") == ({"equity_ratio": 0.5}, 0.1)
+    assert risk_worker.refresh_company_risk("9z") is None
+    assert _indicators(Session, 2) == {"equity_ratio": 0.5}
+    assert _due_ids() == [1, 3]
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+import src.cache as cache
+import src.singleflight as singleflight
+from src.singleflight import coalesce_async
+
+
+def test_async_callers_share_one_computation(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", None)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"cities": []}
+
+    async def scenario():
+        return await asyncio.gather(*(coalesce_async("api_cities:None", compute) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [{"cities": []}] * 10
+    assert len(calls) == 1
+
+
+def test_leader_error_is_raised_in_waiters(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", None)
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(coalesce_async("company:1a", compute) for _ in range(3)), return_exceptions=True
+        )
+
+    errors = asyncio.run(scenario())
+    assert len(errors) == 3
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+class _LeasedRedis:
+    """Redis stand-in where another replica holds every lease"""
+
+    def set(self, key, value, nx=False, ex=None):
+        return None
+
+    def exists(self, key):
+        return 1
+
+
+def test_waits_for_result_of_other_replica(monkeypatch):
+    monkeypatch.setattr(cache, "_redis_client", _LeasedRedis())
+    monkeypatch.setattr(cache, "get_async_client", lambda: None)
+    monkeypatch.setattr(singleflight, "POLL_INTERVAL", 0.01)
+    lookups = iter([None, None, {"cities": []}])
+
+    async def compute():
+        pytest.fail("the other replica computes the value")
+
+    async def lookup():
+        return next(lookups)
+
+    assert asyncio.run(coalesce_async("api_cities:None", compute, cache_lookup=lookup)) == {"cities": []}
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from zeep.exceptions import Fault, TransportError
+
+import src.api.client as client_module
+from src.circuit_breaker import CircuitBreaker
+from src.api.client import AsyncZeepClient, _retry_delay, run_in_soap_loop
+
+
+def _client_with_operation(operation):
+    """AsyncZeepClient without WSDL loading, calling `operation` for URKUNDE"""
+    client = AsyncZeepClient.__new__(AsyncZeepClient)
+    client.client = SimpleNamespace(service=SimpleNamespace(URKUNDE=operation))
+    client._slots = asyncio.Semaphore(2)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(client_module, "_retry_delay", lambda attempt: 0)
+    monkeypatch.setattr(client_module, "SOAP_RETRIES", 2)
+    monkeypatch.setattr(client_module, "justiz_breaker", CircuitBreaker("test", min_calls=100))
+
+
+def test_transient_errors_are_retried():
+    calls = []
+
+    async def urkunde(KEY):
+        calls.append(KEY)
+        if len(calls) < 3:
+            raise TransportError(status_code=503)
+        return {"KEY": KEY}
+
+    client = _client_with_operation(urkunde)
+
+    assert asyncio.run(client.get_urkunde("1_XML")) == {"KEY": "1_XML"}
+    assert len(calls) == 3
+
+
+def test_faults_and_exhausted_retries_return_none(monkeypatch):
+    calls = []
+
+    async def fault(KEY):
+        calls.append(KEY)
+        raise Fault("unknown key")
+
+    async def slow(KEY):
+        calls.append(KEY)
+        await asyncio.sleep(1)
+
+    assert asyncio.run(_client_with_operation(fault).get_urkunde("1_XML")) is None
+    assert len(calls) == 1
+
+    calls.clear()
+    monkeypatch.setitem(client_module.SOAP_OPERATION_TIMEOUTS, "URKUNDE", 0.01)
+    assert asyncio.run(_client_with_operation(slow).get_urkunde("1_XML")) is None
+    assert len(calls) == 3
+
+
+def test_open_circuit_fails_fast(monkeypatch):
+    calls = []
+
+    async def urkunde(KEY):
+        calls.append(KEY)
+        raise TransportError(status_code=503)
+
+    breaker = CircuitBreaker("test", min_calls=2, failure_rate=0.5, open_seconds=60)
+    monkeypatch.setattr(client_module, "justiz_breaker", breaker)
+    client = _client_with_operation(urkunde)
+
+    assert asyncio.run(client.get_urkunde("1_XML")) is None
+    assert breaker.is_open()
+    assert len(calls) == 2
+
+    assert asyncio.run(client.get_urkunde("2_XML")) is None
+    assert len(calls) == 2
+
+
+def test_retry_delay_is_bounded(monkeypatch):
+    monkeypatch.setattr(client_module, "SOAP_RETRY_BACKOFF", 0.5)
+    monkeypatch.setattr(client_module, "SOAP_RETRY_MAX_BACKOFF", 2.0)
+
+    delays = [_retry_delay(attempt) for attempt in range(10) for _ in range(20)]
+
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert max(_retry_delay(0) for _ in range(50)) <= 0.5
+
+
+def test_run_in_soap_loop_returns_result_to_threads():
+    async def answer():
+        await asyncio.sleep(0)
+        return 42
+
+    assert run_in_soap_loop(answer()).result(timeout=5) == 42
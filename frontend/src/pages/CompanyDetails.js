@@ -304,7 +304,11 @@ export default function CompanyDetails() {
                 {Object.keys(riskIndicators).length === 0 ? (
                   <div className="no-data-message">
                     <AlertCircle size={20} />
-                    <p>No risk indicators available for this company.</p>
+                    <p>
+                      {company.riskStatus === "pending"
+                        ? "Risk analysis is pending for this company. Please check again later."
+                        : "No risk indicators available for this company."}
+                    </p>
                   </div>
                 ) : (
                   <RiskIndicators indicators={riskIndicators} riskScore={company.riskScore} />